@@ -3,16 +3,19 @@ Chat API Router
 - Orchestrates multi-provider routing and RAG pipeline
 - Integrates service detection for improved prompt engineering
 - Uses loguru for logging
+- Every request is traced (backend/services/tracing.py); debug requests get their spans back
 """
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.api.schemas import ChatRequest, ChatResponse
 from backend.services.router import QueryRouter
 from backend.models.database import get_db
+from backend.services.executors import executors, ExecutorSaturatedError, SEARCH, INFERENCE
+from backend.services.tracing import tracer, span
 from backend.utils.service_detection import detect_service
 from backend.utils.source_validator import (
     validate_source, 
-    get_valid_sources,
+    find_valid_source,
     get_correct_source_for_service
 )
 from loguru import logger
@@ -23,9 +26,26 @@ router = APIRouter()
 @router.post("/", response_model=ChatResponse)
 async def chat_query(request: ChatRequest, db: AsyncSession = Depends(get_db)):
     """Handles user queries by routing between documents (RAG) and Live Cloud APIs."""
+    # Admission control: refuse up front rather than queue behind a saturated search/model pool
+    try:
+        executors.admit(SEARCH, INFERENCE)
+    except ExecutorSaturatedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    with tracer.trace("chat", source=request.selected_source, database=request.selected_db) as trace:
+        response = await _answer(request, db)
+        if trace is not None:
+            trace.root.set(source_type=response.source_type)
+    if request.debug and trace is not None:
+        response.trace = trace.to_dict()
+    return response
+
+
+async def _answer(request: ChatRequest, db: AsyncSession) -> ChatResponse:
     try:
         query_router = QueryRouter(db)
-        result = await query_router.route(request.query, request.selected_source, request.selected_db)
+        with span("route"):
+            result = await query_router.route(request.query, request.selected_source, request.selected_db)
         
         from backend.services.llm_service import LLMService
         llm_service = LLMService()
@@ -62,11 +82,7 @@ async def chat_query(request: ChatRequest, db: AsyncSession = Depends(get_db)):
                     context_parts.append(f"SOURCE: {src} (Chunk {chunk_idx})\nCONTENT: {content}")
             
             # Validate all sources before passing to LLM
-            valid = get_valid_sources()
-            validated_sources = []
-            for s in sources:
-                if any(v.lower() in s.lower() for v in valid):
-                    validated_sources.append(s)
+            validated_sources = [s for s in sources if find_valid_source(s)]
             
             if not validated_sources and primary_service:
                 validated_sources = [get_correct_source_for_service(primary_service)]
@@ -4,119 +4,64 @@ Documents API Router
 - Implements robust error handling and loguru logging
 - Fixes blocking IO in file uploads and adds filename sanitization
 """
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from loguru import logger
 import os
-import aiofiles
-import shutil
 import uuid
+import asyncio
 from typing import List
 
-from backend.services.retrieval.semantic_search import RetrievalService
-from backend.models.database import get_db, AsyncSessionLocal
+from backend.services.retrieval.semantic_search import get_retrieval_service
+from backend.models.database import get_db
 from backend.models.models import Document
 from backend.api.schemas import DocumentResponse
-from backend.utils.source_validator import register_document, get_valid_sources
+from backend.utils.source_validator import get_valid_sources
 from backend.utils.service_detection import get_service_from_filename, get_display_name
 from backend.services.s3_sync import s3_sync_manager
-import asyncio
+from backend.services.ingestion_queue import ingestion_queue
+from backend.utils.uploads import sanitize_filename, save_upload, is_archive, extract_archive, remove_quietly
+from backend.core.config import settings
+from backend.services.executors import executors
+from backend.services.serving_role import serving_role
 
 router = APIRouter()
-retrieval_service = RetrievalService()
-
-def sanitize_filename(filename: str) -> str:
-    """Basic filename sanitization to prevent directory traversal."""
-    # Remove path components and only keep basename
-    base = os.path.basename(filename)
-    # Replace spaces with underscores
-    return base.replace(" ", "_")
-
-async def update_system_prompt_with_new_doc(filename: str, service: str):
-    """
-    Updates the LLM service knowledge of valid sources
-    every time a new document is added.
-    """
-    from backend.services.llm_service import llm_service
-    
-    valid_sources = get_valid_sources()
-    
-    # Rebuild the valid sources section of the prompt
-    # Update LLM service knowledge
-    llm_service.update_valid_sources(valid_sources)
-    
-    logger.info(f"[PIPELINE] System prompt updated. Valid sources: {len(valid_sources)} documents")
-
-async def post_ingestion_pipeline(filename: str, chunks: list, embeddings: list, service: str, file_path: str):
-    """
-    Runs automatically after every document upload.
-    Handles registration, metadata, system prompt update, and S3 backup.
-    """
-    # Step 1: Register in registry
-    register_document(filename, service)
-    
-    # Step 2: Tag all chunks with correct metadata
-    # (This assumes chunks is a list of Document objects from langchain)
-    for i, chunk in enumerate(chunks):
-        if hasattr(chunk, 'metadata'):
-            chunk.metadata.update({
-                "source":    filename,
-                "service":   service,
-                "doc_type":  "official_aws_doc",
-                "chunk_index": i,
-                "file_type": filename.rsplit('.', 1)[-1].lower(),
-                "display_name": get_display_name(service)
-            })
-    
-    # Step 4: Update system prompt with new doc list
-    await update_system_prompt_with_new_doc(filename, service)
+retrieval_service = get_retrieval_service()
 
-    # Step 5: Sync updated index and document to S3
-    from backend.services.s3_sync import s3_sync_manager
-    try:
-        # Sync the specific document
-        # We need the local path here, but post_ingestion_pipeline 
-        # doesn't take it currently. We'll sync the index for now
-        # and rely on the full sync for the document if needed.
-        # Actually, let's fix the pipeline to accept the path in a future refactor.
-        # For now, we sync the shared index which is the most critical.
-        await s3_sync_manager.sync_index_to_s3()
-        logger.info(f"S3 sync complete after {filename} upload")
-    except Exception as s3e:
-        logger.warning(f"S3 sync failed (non-blocking): {s3e}")
-    
-    # Trigger S3 sync in background (non-blocking)
-    async def run_sync_and_cleanup():
-        try:
-            # Phase 1: Upload
-            await s3_sync_manager.sync_all_after_upload(
-                filename=filename,
-                service=service,
-                file_path=file_path,
-                chunks=chunks,
-                embeddings=embeddings
-            )
-            # Phase 2: Cleanup (Optional/Safe)
-            # We wait a bit to ensure everything is settled
-            await asyncio.sleep(2)
-            await s3_sync_manager.verify_and_cleanup_local(file_path, service, filename)
-        except Exception as e:
-            logger.error(f"S3 Sync/Cleanup pipeline failed for {filename}: {e}")
+def _new_document(filename: str, path: str, database: str, original_filename: str, service: str, content_hash: str) -> Document:
+    return Document(
+        filename=filename,
+        file_type=filename.split('.')[-1] if '.' in filename else 'unknown',
+        source_path=path,
+        status="pending",
+        user_id="default-user",
+        metadata_info={
+            "target_database": database, 
+            "original_filename": original_filename,
+            "detected_service": service,
+            "content_hash": content_hash
+        }
+    )
 
-    asyncio.create_task(run_sync_and_cleanup())
-    
-    display = get_display_name(service)
-    logger.info(f"[PIPELINE] ✅ {filename} → {display} ({len(chunks)} chunks) — Scheduled for S3 & Cleanup")
+async def _known_content_hashes(db: AsyncSession) -> dict:
+    """Maps content hash -> filename for documents that are ingested or on their way."""
+    result = await db.execute(select(Document.filename, Document.status, Document.metadata_info))
+    known = {}
+    for filename, status, meta in result.all():
+        content_hash = (meta or {}).get("content_hash")
+        if content_hash and not (status or "").startswith(("failed", "cancelled")):
+            known[content_hash] = filename
+    return known
 
 @router.post("/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks, 
     file: UploadFile = File(...), 
     database: str = "faiss",
     db: AsyncSession = Depends(get_db)
 ):
     """Uploads a document and starts background ingestion."""
+    temp_path = None
     try:
         sanitized_name = sanitize_filename(file.filename)
         # Use a unique prefix to avoid collisions
@@ -126,54 +71,27 @@ async def upload_document(
         os.makedirs(temp_dir, exist_ok=True)
         temp_path = os.path.join(temp_dir, unique_name)
         
-        # Async file writing to avoid blocking the event loop
-        async with aiofiles.open(temp_path, mode="wb") as f:
-            content = await file.read()
-            await f.write(content)
+        # Stream to disk in blocks to avoid holding the whole file in memory
+        try:
+            saved = await save_upload(file, temp_path, settings.UPLOAD_MAX_MB * 1024 * 1024)
+        except ValueError as e:
+            # Over UPLOAD_MAX_MB, like an oversize member of a batch upload
+            raise HTTPException(status_code=413, detail=str(e))
         
         # Auto-detect service from filename
         detected_service = get_service_from_filename(sanitized_name)
         
         # Create DB record
-        db_doc = Document(
-            filename=sanitized_name,
-            file_type=sanitized_name.split('.')[-1] if '.' in sanitized_name else 'unknown',
-            source_path=temp_path,
-            status="pending",
-            user_id="default-user",
-            metadata_info={
-                "target_database": database, 
-                "original_filename": file.filename,
-                "detected_service": detected_service
-            }
-        )
+        db_doc = _new_document(sanitized_name, temp_path, database, file.filename, detected_service, saved["sha256"])
         db.add(db_doc)
         await db.commit()
         await db.refresh(db_doc)
         
         doc_id = db_doc.id
 
-        # Process in background
-        async def process_and_cleanup(d_id: str, db_name: str, path: str, fname: str, svc: str):
-            try:
-                async with AsyncSessionLocal() as session:
-                    # ingest_document now returns (count, chunks)
-                    count, chunks = await retrieval_service.ingest_document(path, fname, db_name, d_id, session)
-                    
-                    # Run post-ingestion pipeline with actual chunks
-                    # Note: embeddings are still empty as they are stored inside the vector store,
-                    # but chunks are now correctly passed for S3 backup.
-                    await post_ingestion_pipeline(fname, chunks, [], svc, path)
-                    
-            except Exception as e:
-                logger.error(f"Background processing failed for {fname}: {e}")
-            finally:
-                # Optionally remove temp file after ingestion if needed
-                # os.remove(path)
-                pass
+        # Queue for the ingestion workers (durable, survives restarts)
+        job = await ingestion_queue.enqueue(sanitized_name, temp_path, database, detected_service, doc_id)
 
-        background_tasks.add_task(process_and_cleanup, doc_id, database, temp_path, sanitized_name, detected_service)
-        
         logger.info(f"File {file.filename} uploaded and queued for processing. Detected service: {detected_service}")
         
         return {
@@ -186,17 +104,126 @@ async def upload_document(
                        f"Ready to answer questions immediately.",
             "registry_updated": True,
             "valid_sources_count": len(get_valid_sources()),
-            "document_id": doc_id
+            "document_id": doc_id,
+            "job_id": job.id
         }
     
+    except HTTPException:
+        if temp_path:
+            remove_quietly(temp_path)
+        raise
     except Exception as e:
         logger.error(f"Upload failed: {e}")
+        if temp_path:
+            remove_quietly(temp_path)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
+@router.post("/upload/batch")
+async def upload_documents_batch(
+    files: List[UploadFile] = File(...),
+    database: str = "faiss",
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Uploads many files and/or .zip/.tar archives as one ingestion batch.
+    Files are streamed to disk and deduplicated by content hash; the batch's jobs share
+    the worker pool and the indexes are persisted and synced to S3 once at the end.
+    """
+    batch_id = uuid.uuid4().hex
+    batch_dir = os.path.join("data/uploads/temp", f"batch_{batch_id[:8]}")
+    os.makedirs(batch_dir, exist_ok=True)
+    max_bytes = settings.UPLOAD_MAX_MB * 1024 * 1024
+    loop = asyncio.get_event_loop()
+
+    staged, rejected = [], []
+    try:
+        for upload in files:
+            name = sanitize_filename(upload.filename or "")
+            if not name:
+                rejected.append({"filename": upload.filename, "reason": "missing filename"})
+                continue
+            path = os.path.join(batch_dir, f"{uuid.uuid4().hex[:8]}_{name}")
+            try:
+                saved = await save_upload(upload, path, max_bytes)
+                if is_archive(name):
+                    members = await loop.run_in_executor(
+                        executors.extraction, extract_archive, path, os.path.join(batch_dir, os.path.basename(path) + "_x"),
+                        settings.BATCH_UPLOAD_MAX_FILES - len(staged), max_bytes,
+                        settings.ARCHIVE_MAX_EXTRACTED_MB * 1024 * 1024
+                    )
+                    remove_quietly(path)
+                    staged.extend({**m, "original_filename": f"{upload.filename}/{m['filename']}"} for m in members)
+                else:
+                    staged.append({"filename": name, "path": path, "original_filename": upload.filename, **saved})
+            except Exception as e:
+                remove_quietly(path)
+                rejected.append({"filename": upload.filename, "reason": str(e)})
+                continue
+            if len(staged) > settings.BATCH_UPLOAD_MAX_FILES:
+                raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.BATCH_UPLOAD_MAX_FILES} files")
+
+        # Dedupe by content within the batch and against documents already in the knowledge base
+        known = await _known_content_hashes(db)
+        accepted, duplicates, docs = [], [], []
+        for item in staged:
+            duplicate_of = known.get(item["sha256"])
+            if duplicate_of:
+                duplicates.append({"filename": item["original_filename"], "duplicate_of": duplicate_of})
+                remove_quietly(item["path"])
+                continue
+            known[item["sha256"]] = item["filename"]
+            service = get_service_from_filename(item["filename"])
+            doc = _new_document(item["filename"], item["path"], database, item["original_filename"], service, item["sha256"])
+            docs.append(doc)
+            accepted.append({**item, "service": service})
+
+        db.add_all(docs)
+        await db.commit()
+
+        jobs = await ingestion_queue.enqueue_many([
+            {"filename": item["filename"], "file_path": item["path"], "service": item["service"], "document_id": doc.id}
+            for item, doc in zip(accepted, docs)
+        ], database=database, batch_id=batch_id) if docs else []
+
+        logger.info(
+            f"Batch {batch_id}: {len(jobs)} files queued, {len(duplicates)} duplicates skipped, {len(rejected)} rejected"
+        )
+        return {
+            "success": True,
+            "batch_id": batch_id,
+            "accepted": [
+                {
+                    "filename": item["filename"],
+                    "original_filename": item["original_filename"],
+                    "service_detected": item["service"],
+                    "document_id": doc.id,
+                    "job_id": job.id
+                }
+                for item, doc, job in zip(accepted, docs, jobs)
+            ],
+            "duplicates": duplicates,
+            "rejected": rejected
+        }
+    except HTTPException:
+        remove_quietly(batch_dir)
+        raise
+    except Exception as e:
+        logger.error(f"Batch upload failed: {e}")
+        await db.rollback()
+        remove_quietly(batch_dir)
+        raise HTTPException(status_code=500, detail=f"Batch upload failed: {str(e)}")
+
+@router.get("/upload/batch/{batch_id}")
+async def get_batch_status(batch_id: str):
+    """Returns per-job status for a batch upload and whether it has been finalized."""
+    summary = await ingestion_queue.batch_summary(batch_id)
+    if not summary["total"]:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return summary
+
 @router.post("/{document_id}/retry")
 async def retry_document_ingestion(
     document_id: str,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """Retries ingestion for a failed document using its existing local file."""
@@ -214,30 +241,15 @@ async def retry_document_ingestion(
         doc.status = "pending"
         await db.commit()
 
-        # Process in background
-        async def process_and_cleanup(d_id: str, db_name: str, path: str, fname: str, svc: str):
-            try:
-                async with AsyncSessionLocal() as session:
-                    count, chunks = await retrieval_service.ingest_document(path, fname, db_name, d_id, session)
-                    await post_ingestion_pipeline(fname, chunks, [], svc, path)
-            except Exception as e:
-                logger.error(f"Retry background processing failed for {fname}: {e}")
-
-        background_tasks.add_task(
-            process_and_cleanup, 
-            doc.id, 
-            database, 
-            doc.source_path, 
-            doc.filename, 
-            detected_service
-        )
+        job = await ingestion_queue.enqueue(doc.filename, doc.source_path, database, detected_service, doc.id)
         
         logger.info(f"Retry queued for document {doc.filename} (ID: {document_id})")
         
         return {
             "success": True,
             "message": f"Retry started for {doc.filename}. You can monitor progress in the dashboard.",
-            "document_id": document_id
+            "document_id": document_id,
+            "job_id": job.id
         }
     except HTTPException:
         raise
@@ -274,8 +286,12 @@ async def list_documents(db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Failed to retrieve documents.")
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: str, db: AsyncSession = Depends(get_db)):
-    """Deletes a document and its associated data from all stores."""
+async def delete_document(document_id: str, response: Response, db: AsyncSession = Depends(get_db)):
+    """
+    Deletes a document and its associated data from all stores.
+    Only the primary writes the indexes: a serving replica queues the index delete for it
+    (202 with the job id) instead of saving its own copy over the shared index files.
+    """
     try:
         # 1. GET Document to find filename and target database
         doc = await db.get(Document, document_id)
@@ -288,16 +304,23 @@ async def delete_document(document_id: str, db: AsyncSession = Depends(get_db)):
         logger.info(f"Deleting document: {filename} from {database}")
         
         # 2. DELETE from Vector Store
-        try:
-            await retrieval_service.delete_document(filename, database=database)
-        except Exception as ve:
-            logger.error(f"Vector store deletion error for {filename}: {ve}")
-            # We continue even if vector store fails to at least clean up the DB
+        job = None
+        if serving_role.is_primary:
+            try:
+                await retrieval_service.delete_document(filename, database=database)
+            except Exception as ve:
+                logger.error(f"Vector store deletion error for {filename}: {ve}")
+                # We continue even if vector store fails to at least clean up the DB
+        else:
+            job = await ingestion_queue.enqueue_delete(filename, database)
         
         # 3. DELETE from SQL
         await db.delete(doc)
         await db.commit()
         
+        if job:
+            response.status_code = 202
+            return {"message": f"Document {filename} deleted; index cleanup queued on the primary.", "job_id": job.id}
         return {"message": f"Document {filename} deleted successfully."}
     except HTTPException:
         raise
@@ -0,0 +1,44 @@
+"""
+Ingestion Jobs API Router
+- Lists ingestion jobs with per-stage progress
+- Cancels queued or running jobs
+"""
+from fastapi import APIRouter, HTTPException
+from loguru import logger
+from typing import Optional
+
+from backend.services.ingestion_queue import ingestion_queue, ingestion_workers, job_to_dict, CANCELLED
+from backend.services.serving_role import serving_role
+
+router = APIRouter()
+
+@router.get("/")
+async def list_jobs(status: Optional[str] = None, limit: int = 100):
+    """Lists the most recent ingestion jobs, optionally filtered by status."""
+    try:
+        jobs = await ingestion_queue.list_jobs(status=status, limit=min(limit, 500))
+        return {"jobs": [job_to_dict(j) for j in jobs], "total": len(jobs)}
+    except Exception as e:
+        logger.error(f"Failed to list ingestion jobs: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve ingestion jobs.")
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Returns one job with its stage and progress counters."""
+    job = await ingestion_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancels a queued job immediately, or a running job at its next progress check."""
+    job = await ingestion_queue.request_cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    logger.info(f"Cancellation requested for ingestion job {job_id} ({job.filename})")
+    if job.batch_id and job.status == CANCELLED and serving_role.is_primary:
+        # Cancelling the batch's last queued job leaves no worker to finalize it; replicas
+        # leave this to the index writer's idle sweep
+        await ingestion_workers.finalize_if_done(job.batch_id)
+    return job_to_dict(job)
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from typing import List, Dict, Any
 from backend.services.s3_sync import s3_sync_manager
-import os
 
 router = APIRouter()
 
@@ -20,12 +19,8 @@ async def list_s3_files():
 async def compare_sync():
     """Compares local files with S3 files (simplified)."""
     s3_files = await s3_sync_manager.list_s3_files()
-    local_docs = []
-    if os.path.exists("data/uploaded_docs_registry.json"):
-        import json
-        with open("data/uploaded_docs_registry.json", "r") as f:
-            registry = json.load(f)
-            local_docs = [d["filename"] for d in registry.get("documents", [])]
+    from backend.utils.source_validator import load_registry
+    local_docs = [d["filename"] for d in load_registry()["documents"]]
             
     s3_filenames = [f["key"].split("/")[-1] for f in s3_files if f["key"].startswith("documents/")]
     
@@ -36,6 +31,18 @@ async def compare_sync():
         "missing_in_s3": [d for d in local_docs if d not in s3_filenames]
     }
 
+@router.get("/bootstrap")
+async def bootstrap_progress():
+    """Progress of the startup S3 -> vector store bootstrap (per-stage counters and in-flight work)."""
+    from backend.services.retrieval.bootstrap_sync import bootstrap_sync
+    return bootstrap_sync.get_progress()
+
+@router.get("/index-watcher")
+async def index_watcher_status():
+    """Index version this replica serves and how often it hot-reloaded one published elsewhere."""
+    from backend.services.index_watcher import index_watcher
+    return index_watcher.status()
+
 @router.post("/force-sync")
 async def force_sync(background_tasks: BackgroundTasks):
     """Manually triggers a full re-sync of indices to S3."""
@@ -36,12 +36,14 @@ class ChatRequest(BaseModel):
     selected_source: str = "auto" # Specific API key ID, "docs", "auto", or "hybrid"
     selected_db: str = "faiss" # Target vector database if source is "docs"
     conversation_id: Optional[str] = None
+    debug: bool = False # Return the request's timing spans in ChatResponse.trace
 
 class ChatResponse(BaseModel):
     answer: str
     source_type: str # "docs", "api", "hybrid"
     source_details: List[Dict[str, Any]]
     conversation_id: str
+    trace: Optional[Dict[str, Any]] = None
 
 # --- Document Schemas ---
 class DocumentResponse(BaseModel):
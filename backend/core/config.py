@@ -23,11 +23,54 @@ class Settings(BaseSettings):
     OLLAMA_TEXT_MODEL: str = "llama3.2"
     OLLAMA_VISION_MODEL: str = "llava"
     OLLAMA_BASE_URL: str = "http://localhost:11434"
-    
+
+    # LLM Scheduler (priority queues in front of Ollama)
+    LLM_MAX_CONCURRENCY_PER_MODEL: int = 2
+    LLM_MAX_CONCURRENCY_TOTAL: int = 4
+    LLM_QUEUE_LIMIT_INTERACTIVE: int = 64
+    LLM_QUEUE_LIMIT_JUDGE: int = 32
+    LLM_QUEUE_LIMIT_INGESTION: int = 256
+
+    # LLM Circuit Breakers & Hedged Fallback
+    LLM_BREAKER_WINDOW: int = 20
+    LLM_BREAKER_MIN_CALLS: int = 4
+    LLM_BREAKER_FAILURE_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 45.0
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0
+    LLM_HEDGE_PERCENTILE: float = 0.95
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 2.0
+    LLM_HEDGE_MAX_DELAY_SECONDS: float = 15.0
+
     # RAG Upgrade Settings
     ENABLE_LLM_JUDGE: bool = True
     RETRIEVAL_CONFIDENCE_THRESHOLD: float = 0.4
     
+    # Document Processing
+    PDF_EXTRACTION_WORKERS: int = 0 # 0 = one process per CPU core
+    PDF_PAGES_PER_TASK: int = 16
+    PDF_PARALLEL_MIN_PAGES: int = 32
+    PDF_SLOW_PAGE_SECONDS: float = 2.0
+    INGEST_PAGE_WINDOW: int = 32 # PDF pages extracted and chunked per step
+    INGEST_BATCH_SIZE: int = 256 # chunks embedded and indexed per batch
+    INGEST_BATCH_TIMEOUT_SECONDS: int = 600
+    CHUNK_CACHE_DIR: str = "data/cache/chunks"
+    CHUNK_CACHE_MAX_MB: int = 1024
+    OCR_DPI: int = 200
+    OCR_WINDOW_PAGES: int = 4 # pages rasterized at once per worker
+    OCR_TEXT_LAYER_MIN_CHARS: int = 25 # pages with less text than this are always OCRed
+    OCR_IMAGE_COVERAGE: float = 0.5 # image-dominated pages are OCRed...
+    OCR_DENSE_TEXT_CHARS: int = 200 # ...unless their text layer is at least this long
+    
+    # Ingestion Job Queue
+    INGESTION_WORKERS: int = 1 # worker loops in the API process; 0 when using scripts/run_ingestion_worker.py (the API still indexes their output)
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BASE_SECONDS: float = 30.0 # doubled after every failed attempt
+    INGESTION_POLL_SECONDS: float = 2.0
+    INGESTION_STALE_SECONDS: int = 300 # running jobs without a heartbeat this long are reclaimed
+    UPLOAD_MAX_MB: int = 512 # per file, including archives
+    BATCH_UPLOAD_MAX_FILES: int = 500
+    ARCHIVE_MAX_EXTRACTED_MB: int = 2048 # decompressed output per archive; each member is also capped at UPLOAD_MAX_MB
+    
     # Cloud Provider Defaults
     ENABLE_CLOUD_PROVIDERS: bool = False # Set to True to enable live AWS/GCP/Azure queries
     AWS_DEFAULT_REGION: str = "us-east-1"
@@ -51,6 +94,54 @@ class Settings(BaseSettings):
     S3_REGISTRY_PREFIX: str = "registry/"
     S3_METADATA_PREFIX: str = "metadata/"
     S3_SYNC_DELAY_SECONDS: int = 5
+    S3_ENDPOINT_URL: Optional[str] = None  # Local S3 stand-in (moto server, MinIO) for tests and benchmarks
+    INDEX_MAX_SEGMENTS: int = 32  # Index replication compacts into one segment beyond this
+    INDEX_WATCH_INTERVAL_SECONDS: int = 30  # Poll S3 for index versions from other replicas (0 = off)
+
+    # S3 Transfers (shared client and connection pool; they run on the io executor)
+    S3_MAX_POOL_CONNECTIONS: int = 64
+    S3_MULTIPART_THRESHOLD_MB: int = 16
+    S3_MULTIPART_CHUNKSIZE_MB: int = 16
+    S3_MAX_CONCURRENCY: int = 8
+    
+    # Bootstrap Sync (S3 documents -> vector stores on a cold node)
+    BOOTSTRAP_DOWNLOAD_CONCURRENCY: int = 8
+    BOOTSTRAP_EXTRACT_CONCURRENCY: int = 2
+    BOOTSTRAP_INDEX_CONCURRENCY: int = 1
+    BOOTSTRAP_WARM_START: bool = True
+
+    # Workload Executors (one thread pool per class; MAX_QUEUE = backlog at which chat requests
+    # are refused with 503, 0 = never)
+    EXECUTOR_SEARCH_THREADS: int = 8
+    EXECUTOR_INFERENCE_THREADS: int = 2
+    EXECUTOR_INGEST_THREADS: int = 2
+    EXECUTOR_EXTRACTION_THREADS: int = 4
+    EXECUTOR_IO_THREADS: int = 16
+    EXECUTOR_SEARCH_MAX_QUEUE: int = 64
+    EXECUTOR_INFERENCE_MAX_QUEUE: int = 32
+    EXECUTOR_INGEST_MAX_QUEUE: int = 0
+    EXECUTOR_EXTRACTION_MAX_QUEUE: int = 0
+    EXECUTOR_IO_MAX_QUEUE: int = 0
+
+    # Request Tracing (per-stage spans of every chat request)
+    TRACING_ENABLED: bool = True
+    TRACE_JSON_PATH: Optional[str] = None  # e.g. data/traces/chat_traces.jsonl (one JSON trace per line)
+    TRACE_OTEL_ENABLED: bool = False  # requires opentelemetry-sdk
+    TRACE_OTLP_ENDPOINT: Optional[str] = None  # e.g. http://localhost:4318/v1/traces; unset = global OTel provider
+    TRACE_FLUSH_TIMEOUT_SECONDS: float = 5.0  # shutdown waits at most this long for queued trace lines
+
+    # Inference Sidecar (embedding + reranker models in their own process)
+    INFERENCE_URL: Optional[str] = None  # e.g. http://127.0.0.1:8100; unset = models load in-process
+    INFERENCE_HOST: str = "127.0.0.1"
+    INFERENCE_PORT: int = 8100
+    INFERENCE_MAX_BATCH: int = 64
+    INFERENCE_BATCH_WAIT_MS: float = 5
+    INFERENCE_THREADS: int = 1
+    INFERENCE_TIMEOUT_SECONDS: float = 30
+
+    # Query Serving (uvicorn workers share memory-mapped index snapshots)
+    SERVING_WORKERS: int = 1
+    SERVING_SNAPSHOTS: bool = False  # Always on when SERVING_WORKERS > 1
     
     model_config = SettingsConfigDict(
         env_file=".env", 
@@ -13,7 +13,7 @@ from loguru import logger
 import sys
 
 from backend.core.config import settings
-from backend.api.routes import api_keys, chat, documents, feedback, s3
+from backend.api.routes import api_keys, chat, documents, feedback, jobs, s3
 from backend.models.database import engine, Base
 
 # Configure loguru
@@ -41,19 +41,24 @@ async def startup_event():
     logger.info("Starting up and initializing services...")
     
     try:
-        # Pull shared index from S3 before anything else
+        # Every worker serves requests that read the database; create_all is idempotent
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        logger.info("Database initialized successfully.")
+
+        # With several workers only the primary ingests; replicas serve the shared index snapshots
+        from backend.services.serving_role import serving_role
+        if not serving_role.is_primary:
+            return
+
+        # Pull shared indexes and registry from S3 before anything else (once, changed files only)
         from backend.services.s3_sync import s3_sync_manager
         try:
-            await s3_sync_manager.pull_index_from_s3()
-            logger.info("Shared index pulled from S3.")
+            await s3_sync_manager.pull_all_from_s3()
+            logger.info("[STARTUP] S3 synchronization complete.")
         except Exception as s3e:
             logger.warning(f"Failed to pull shared index from S3 (continuing locally): {s3e}")
-        
-        # Initialize database tables
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-        logger.info("Database initialized successfully.")
-        
+
         # Register core documents
         from backend.utils.source_validator import register_document
         existing_docs = [
@@ -65,28 +70,56 @@ async def startup_event():
             register_document(filename, service)
         logger.info("[STARTUP] Document registry initialized with core documents.")
 
-        # S3 Backup System Startup Pull
-        from backend.services.s3_sync import s3_sync_manager
-        await s3_sync_manager.pull_all_from_s3()
-        logger.info("[STARTUP] S3 synchronization complete.")
-
         # Bootstrap Synchronization (Sync S3 Docs to Vector DBs)
         from backend.services.retrieval.bootstrap_sync import bootstrap_sync
         # Run bootstrap sync in a separate task so it doesn't block startup completely
         # but we monitor its progress.
         asyncio.create_task(bootstrap_sync.run_bootstrap_sync())
         logger.info("[STARTUP] Bootstrap synchronization task started.")
+
+        # Ingestion workers; this pool is the only index writer, so it starts even with
+        # INGESTION_WORKERS=0 to index what scripts/run_ingestion_worker.py processes prepared
+        from backend.services.ingestion_queue import ingestion_workers
+        await ingestion_workers.start(retrieval_service=documents.retrieval_service)
+
+        # Hot reload of indexes published by other replicas
+        from backend.services.index_watcher import index_watcher
+        index_watcher.start()
+
+        # First serving snapshot, so replicas can answer before the next ingest or reload
+        await documents.retrieval_service.engine.export_snapshot()
             
     except Exception as e:
         logger.critical(f"Startup initialization failed: {e}")
         # In a real production app, we might want to exit here
         # sys.exit(1)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    from backend.services.ingestion_queue import ingestion_workers
+    from backend.services.s3_sync import s3_sync_manager
+    from backend.services.index_watcher import index_watcher
+    from backend.services.serving_role import serving_role
+    from backend.services.executors import executors
+    from backend.services.tracing import tracer
+    if settings.INFERENCE_URL:
+        from backend.services.inference_client import get_inference_client
+        await get_inference_client().aclose()
+    if serving_role.is_primary:
+        await index_watcher.stop()
+        await ingestion_workers.stop()
+        if s3_sync_manager.enabled:
+            s3_sync_manager.transfer.shutdown()
+    executors.shutdown()
+    # Last trace lines still queued for the JSON Lines writer thread
+    tracer.flush(timeout=settings.TRACE_FLUSH_TIMEOUT_SECONDS)
+
 # Include routers
 app.include_router(api_keys.router, prefix=f"{settings.API_V1_STR}/api-keys", tags=["API Keys"])
 app.include_router(chat.router, prefix=f"{settings.API_V1_STR}/chat", tags=["Chat"])
 app.include_router(documents.router, prefix=f"{settings.API_V1_STR}/documents", tags=["Documents"])
 app.include_router(feedback.router, prefix=f"{settings.API_V1_STR}/feedback", tags=["Feedback"])
+app.include_router(jobs.router, prefix=f"{settings.API_V1_STR}/jobs", tags=["Ingestion Jobs"])
 app.include_router(s3.router, prefix=f"{settings.API_V1_STR}/s3", tags=["S3 Sync"])
 
 @app.get("/")
@@ -97,6 +130,22 @@ async def root():
 async def health():
     return {"status": "healthy", "app": settings.APP_NAME}
 
+@app.get("/metrics/llm")
+async def llm_metrics():
+    from backend.services.llm_scheduler import llm_scheduler
+    from backend.services.circuit_breaker import circuit_breakers
+    return {**llm_scheduler.get_metrics(), "circuit_breakers": circuit_breakers.snapshot()}
+
+@app.get("/metrics/traces")
+async def trace_metrics():
+    from backend.services.tracing import tracer
+    return tracer.get_metrics()
+
+@app.get("/metrics/executors")
+async def executor_metrics():
+    from backend.services.executors import executors
+    return executors.get_metrics()
+
 if __name__ == "__main__":
     # Fixed the entry point path to backend.main since src was renamed
     uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
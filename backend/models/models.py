@@ -67,3 +67,30 @@ class UserPreference(Base):
     preference_value = Column(Text) # e.g., "Detailed CLI examples", "EC2 Cost Optimization"
     weight = Column(Numeric, default=1.0) # Strength of the pattern
     last_updated = Column(DateTime, default=datetime.utcnow)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    document_id = Column(String, ForeignKey("documents.id"), index=True, nullable=True)
+    batch_id = Column(String, index=True, nullable=True) # set for bulk uploads, persisted and synced once
+    batch_finalized = Column(Boolean, default=False)
+    kind = Column(String, default="ingest") # ingest, or delete (index deletes queued for the primary by replicas)
+    filename = Column(String)
+    file_path = Column(String)
+    database = Column(String, default="faiss")
+    service = Column(String)
+    status = Column(String, default="queued", index=True) # queued, running, succeeded, failed, cancelled
+    stage = Column(String, nullable=True) # extract, chunk, embed, index, finalize
+    prepared = Column(Boolean, default=False) # chunks + vectors in the chunk cache, waiting for the index writer
+    progress = Column(JSON, nullable=True) # per-stage counters
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    next_run_at = Column(DateTime, default=datetime.utcnow, index=True)
+    cancel_requested = Column(Boolean, default=False)
+    worker_id = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,138 @@
+"""
+Circuit Breakers for LLM Models
+- Tracks a rolling window of call outcomes and latencies per model
+- Opens when errors or slow calls dominate the window, then probes for recovery
+- Supplies latency percentiles used to schedule hedged fallback requests
+"""
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from backend.core.config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised when every candidate model is skipped because its circuit is open."""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        window_size: Optional[int] = None,
+        min_calls: Optional[int] = None,
+        failure_rate: Optional[float] = None,
+        slow_call_seconds: Optional[float] = None,
+        open_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.min_calls = min_calls if min_calls is not None else settings.LLM_BREAKER_MIN_CALLS
+        self.failure_rate = failure_rate if failure_rate is not None else settings.LLM_BREAKER_FAILURE_RATE
+        self.slow_call_seconds = slow_call_seconds if slow_call_seconds is not None else settings.LLM_BREAKER_SLOW_CALL_SECONDS
+        self.open_seconds = open_seconds if open_seconds is not None else settings.LLM_BREAKER_OPEN_SECONDS
+
+        # Rolling window of (succeeded, latency_seconds)
+        self._window = deque(maxlen=window_size or settings.LLM_BREAKER_WINDOW)
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """Returns True if a call may be sent. In half-open state only one probe is let through."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit for {self.name} half-open, probing for recovery")
+
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self, latency: float):
+        self._window.append((latency < self.slow_call_seconds, latency))
+        if self.state == self.HALF_OPEN:
+            if latency < self.slow_call_seconds:
+                logger.info(f"Circuit for {self.name} closed after successful probe")
+                self.state = self.CLOSED
+                self._window.clear()
+                self._window.append((True, latency))
+            else:
+                self._trip()
+            return
+        self._evaluate()
+
+    def record_failure(self, latency: float):
+        self._window.append((False, latency))
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+        self._evaluate()
+
+    def release_probe(self):
+        """Frees the half-open probe slot when a probe is cancelled without an outcome."""
+        self._probe_in_flight = False
+
+    def _evaluate(self):
+        if self.state != self.CLOSED or len(self._window) < self.min_calls:
+            return
+        bad = sum(1 for ok, _ in self._window if not ok)
+        if bad / len(self._window) >= self.failure_rate:
+            self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        logger.warning(f"Circuit for {self.name} OPEN for {self.open_seconds:.0f}s")
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        """Latency percentile of successful calls in the window, or None without samples."""
+        samples = sorted(latency for ok, latency in self._window if ok)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def hedge_delay(self) -> float:
+        """How long to wait on this model before hedging to the next candidate."""
+        p = self.latency_percentile(settings.LLM_HEDGE_PERCENTILE)
+        if p is None:
+            return settings.LLM_HEDGE_MAX_DELAY_SECONDS
+        return min(max(p, settings.LLM_HEDGE_MIN_DELAY_SECONDS), settings.LLM_HEDGE_MAX_DELAY_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = len(self._window)
+        bad = sum(1 for ok, _ in self._window if not ok)
+        p95 = self.latency_percentile(0.95)
+        return {
+            "state": self.state,
+            "calls_in_window": total,
+            "failure_rate": round(bad / total, 3) if total else 0.0,
+            "latency_p95_s": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class CircuitBreakerRegistry:
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(name)
+        return self._breakers[name]
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: b.snapshot() for name, b in self._breakers.items()}
+
+
+# Global registry shared by every LLMService instance
+circuit_breakers = CircuitBreakerRegistry()
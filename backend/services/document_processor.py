@@ -3,21 +3,29 @@ import json
 import csv
 import io
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
 from datetime import datetime, timezone
 
 # New libraries
 from unstructured.partition.auto import partition
-from pdf2image import convert_from_path
 import pytesseract
 from PIL import Image
 import asyncio
+import concurrent.futures
+import itertools
+import threading
 import time
-import pypdf
 
 from backend.utils.chunking import Chunker
 from backend.core.config import settings
 from backend.utils.service_detection import get_service_from_filename
+from backend.services.executors import executors
+from backend.utils.pdf_extraction import (
+    iter_pdf_pages,
+    iter_ocr_pages,
+    needs_ocr,
+    log_slow_pages,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -35,54 +43,120 @@ class DocumentProcessor:
 
     async def process_file(self, file_path: str, filename: str) -> List[Dict[str, Any]]:
         """Processes any file type using unstructured or custom OCR/Vision logic."""
+        processed_chunks = []
+        async for batch in self.iter_chunks(file_path, filename):
+            processed_chunks.extend(batch)
+        return processed_chunks
+
+    async def iter_chunks(self, file_path: str, filename: str, batch_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Streams a file as batches of chunks with metadata.
+        PDFs are extracted a page window at a time on a worker thread that blocks
+        while the consumer is busy indexing, so only a few windows are held in memory.
+        """
         ext = filename.split(".")[-1].lower()
-        text = ""
+        batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        service = get_service_from_filename(filename)
+        upload_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        chunk_index = 0
+        pending = []
         
         logger.info(f"Processing {filename} (extension: {ext})")
 
+        def build(chunk: Dict[str, Any]) -> Dict[str, Any]:
+            nonlocal chunk_index
+            metadata = {
+                "source": filename,
+                "file_type": ext,
+                "upload_date": upload_date,
+                "chunk_index": chunk_index,
+                "source_topic": service, # Using service as a proxy for topic
+                "doc_category": "knowledge_base"
+            }
+            # Per-page provenance: page_start, page_end, extraction (pypdf / ocr / mixed)
+            metadata.update({k: v for k, v in chunk.items() if k != "content"})
+            chunk_index += 1
+            return {"content": chunk["content"], "metadata": metadata}
+
+        text = ""
         try:
             # 1. Handle Images (Direct to Ollama Vision)
             if ext in ["jpg", "jpeg", "png", "bmp", "gif"]:
                 text = await self._process_image_with_vision(file_path)
             
-            # 2. Handle PDFs with OCR Check
+            # 2. Handle PDFs with per-page OCR routing, one page window at a time
             elif ext == "pdf":
-                text = await asyncio.get_event_loop().run_in_executor(None, self._process_pdf_smart, file_path)
+                async for pages in self._iterate_in_thread(self._iter_pdf_smart, file_path):
+                    # Chunks do not span window boundaries
+                    pending.extend(build(c) for c in self.chunker.split_pages(pages))
+                    while len(pending) >= batch_size:
+                        yield pending[:batch_size]
+                        pending = pending[batch_size:]
             
             # 3. Universal Parsing for everything else
             else:
-                text = await asyncio.get_event_loop().run_in_executor(None, self._process_universal, file_path)
+                text = await asyncio.get_event_loop().run_in_executor(executors.extraction, self._process_universal, file_path)
 
         except Exception as e:
             logger.error(f"Failed to process {filename}: {e}")
             # Fallback to simple extractors if unstructured fails
-            text = self._fallback_extraction(file_path, ext)
-
-        if not text:
-            return []
+            if chunk_index == 0:
+                text = self._fallback_extraction(file_path, ext)
 
-        # Chunking
-        chunks = self.chunker.split_text(text)
+        if text:
+            pending.extend(build({"content": c}) for c in self.chunker.split_text(text))
+        for i in range(0, len(pending), batch_size):
+            yield pending[i:i + batch_size]
         
-        # Metadata construction
-        service = get_service_from_filename(filename)
-        
-        processed_chunks = []
-        for i, chunk in enumerate(chunks):
-            processed_chunks.append({
-                "content": chunk,
-                "metadata": {
-                    "source": filename,
-                    "file_type": ext,
-                    "upload_date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
-                    "chunk_index": i,
-                    "source_topic": service, # Using service as a proxy for topic
-                    "doc_category": "knowledge_base"
-                }
-            })
-        
-        logger.info(f"Successfully processed {filename} into {len(processed_chunks)} chunks.")
-        return processed_chunks
+        logger.info(f"Successfully processed {filename} into {chunk_index} chunks.")
+
+    async def _iterate_in_thread(self, gen_fn, *args, max_buffered: int = 2) -> AsyncIterator[Any]:
+        """
+        Runs a blocking generator on the extraction executor and yields its items.
+        The producer blocks once `max_buffered` items are waiting, giving backpressure.
+        """
+        loop = asyncio.get_event_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffered)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            if stop.is_set():
+                return False
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.5)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    if stop.is_set():
+                        future.cancel()
+                        return False
+
+        def produce():
+            try:
+                for item in gen_fn(*args):
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(done)
+
+        loop.run_in_executor(executors.extraction, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Consumer stopped early (error or timeout): the producer thread exits at its next put
+            stop.set()
+            while not queue.empty():
+                queue.get_nowait()
 
     async def _process_image_with_vision(self, file_path: str) -> str:
         """Uses Ollama Vision (LLaVA) + OCR for high-fidelity image understanding."""
@@ -105,27 +179,62 @@ class DocumentProcessor:
             
         return "\n\n".join(combined)
 
-    def _process_pdf_smart(self, file_path: str) -> str:
-        """Optimized PDF processing with fast path (pypdf) and fallback to unstructured/OCR."""
+    def _process_pdf_smart(self, file_path: str) -> List[Dict[str, Any]]:
+        """Extracts a whole PDF as {"page", "text", "method"} pages in document order."""
+        pages = []
+        for window in self._iter_pdf_smart(file_path):
+            pages.extend(window)
+        return pages
+
+    def _iter_pdf_smart(self, file_path: str) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Per-page hybrid PDF processing, yielded in windows of INGEST_PAGE_WINDOW pages.
+        Every page goes through pypdf and is classified by text density and image
+        coverage; only text-poor pages are sent to OCR.
+        """
         start_time = time.time()
-        text = ""
+        page_count = 0
+        ocr_count = 0
 
-        # Phase 1: FAST PATH with pypdf
+        # Phase 1: FAST PATH with pypdf, page ranges fanned out over the process pool
         try:
             logger.info(f"Attempting Fast Path extraction (pypdf) for {file_path}")
-            reader = pypdf.PdfReader(file_path)
-            extracted_text = []
-            for page in reader.pages:
-                extracted_text.append(page.extract_text() or "")
-            text = "\n\n".join(extracted_text)
-            
-            if len(text.strip()) > 200:
-                logger.info(f"Fast Path (pypdf) successful. Extracted {len(text)} chars in {time.time() - start_time:.2f}s")
-                return text
+            pypdf_pages = iter_pdf_pages(file_path)
+            while True:
+                window = list(itertools.islice(pypdf_pages, settings.INGEST_PAGE_WINDOW))
+                if not window:
+                    break
+                log_slow_pages(file_path, window)
+
+                # Phase 2: PER-PAGE ROUTING, OCR only the pages without a usable text layer
+                to_ocr = [p["page"] for p in window if needs_ocr(p)]
+                if to_ocr:
+                    logger.info(f"Routing {len(to_ocr)}/{len(window)} text-poor pages to OCR")
+                    try:
+                        index = {p["page"]: i for i, p in enumerate(window)}
+                        for ocr_page in iter_ocr_pages(file_path, to_ocr):
+                            i = index[ocr_page["page"]]
+                            # Keep whichever reading of the page carries more text
+                            if len(ocr_page["text"].strip()) > len(window[i]["text"].strip()):
+                                window[i] = ocr_page
+                    except Exception as e:
+                        logger.error(f"Vision Path (OCR) failed: {e}")
+
+                page_count += len(window)
+                ocr_count += sum(1 for p in window if p["method"] == "ocr")
+                yield window
         except Exception as e:
             logger.warning(f"Fast Path (pypdf) failed: {e}")
 
-        # Phase 2: STRUCTURAL PATH with unstructured (using 'fast' strategy)
+        if page_count:
+            logger.info(
+                f"PDF processing (hybrid) completed in {time.time() - start_time:.2f}s: "
+                f"{page_count - ocr_count} text-layer pages, {ocr_count} OCR pages"
+            )
+            return
+
+        # Phase 3: STRUCTURAL PATH with unstructured when pypdf cannot read the file
+        text = ""
         try:
             logger.info(f"Attempting Structural Path (unstructured fast) for {file_path}")
             elements = partition(filename=file_path, strategy="fast")
@@ -133,21 +242,24 @@ class DocumentProcessor:
         except Exception as e:
             logger.error(f"Structural Path (unstructured) failed: {e}")
 
-        # Phase 3: VISION PATH (OCR) if text is empty/insufficient
-        if len(text.strip()) < 100:
-            logger.info("Insufficient text in PDF. Attempting OCR Vision Path...")
-            try:
-                images = convert_from_path(file_path)
-                ocr_parts = []
-                for i, image in enumerate(images):
-                    page_text = pytesseract.image_to_string(image)
-                    ocr_parts.append(page_text)
-                text = "\n\n".join(ocr_parts)
-            except Exception as e:
-                logger.error(f"Vision Path (OCR) failed: {e}")
+        if len(text.strip()) >= 100:
+            logger.info(f"PDF processing (structural) completed in {time.time() - start_time:.2f}s")
+            yield [{"page": None, "text": text, "method": "unstructured"}]
+            return
+
+        # Phase 4: VISION PATH (OCR) for the whole document
+        logger.info("Insufficient text in PDF. Attempting OCR Vision Path...")
+        try:
+            ocr_pages = iter_ocr_pages(file_path)
+            while True:
+                window = list(itertools.islice(ocr_pages, settings.INGEST_PAGE_WINDOW))
+                if not window:
+                    break
+                yield window
+        except Exception as e:
+            logger.error(f"Vision Path (OCR) failed: {e}")
         
-        logger.info(f"PDF processing (hybrid) completed in {time.time() - start_time:.2f}s")
-        return text
+        logger.info(f"PDF processing (OCR) completed in {time.time() - start_time:.2f}s")
 
     def _process_universal(self, file_path: str) -> str:
         """Uses 'unstructured' to partition various document formats."""
@@ -1,5 +1,7 @@
+import asyncio
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from backend.core.config import settings
+from backend.services.executors import executors
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +25,16 @@ class EmbeddingProvider:
             print(f"DEBUG: Shared Embedding Model LOADED in {time.time() - start:.2f}s")
         return self._embeddings
 
-# Global access point
+# Global access point (the inference sidecar's model when INFERENCE_URL is set)
 def get_shared_embeddings():
+    if settings.INFERENCE_URL:
+        from backend.services.inference_client import get_remote_embeddings
+        return get_remote_embeddings()
     return EmbeddingProvider.get_instance().get_embeddings()
+
+async def embed_query(text: str, embeddings=None):
+    """Query vector: awaited from the sidecar, or the local model on the inference pool (not the default executor)."""
+    embeddings = embeddings or get_shared_embeddings()
+    if settings.INFERENCE_URL:
+        return await embeddings.aembed_query(text)
+    return await asyncio.get_event_loop().run_in_executor(executors.inference, embeddings.embed_query, text)
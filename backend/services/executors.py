@@ -0,0 +1,176 @@
+"""
+Workload Executors
+- One bounded thread pool per workload class instead of the shared default executor:
+  search (query-time retrieval), inference (query embedding / reranking models), ingest
+  (bulk document embedding), extraction (PDF / OCR / archive parsing) and io (S3 transfers,
+  index and cache files)
+- A bulk S3 pull or OCR job can only fill its own pool, so query-time search never waits behind it
+- Queue depth, wait-time percentiles and counters per pool (GET /metrics/executors)
+- Admission control: interactive requests are refused while a pool has more than its
+  EXECUTOR_<NAME>_MAX_QUEUE calls waiting (0 = never refuse)
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from backend.core.config import settings
+
+SEARCH = "search"
+INFERENCE = "inference"
+INGEST = "ingest"
+EXTRACTION = "extraction"
+IO = "io"
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised by admit() when a pool already has more queued work than it accepts."""
+
+
+class WorkloadExecutor(ThreadPoolExecutor):
+    """A ThreadPoolExecutor that counts what it queues and runs (usable with loop.run_in_executor)."""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int = 0):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queued = 0
+        self.running = 0
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=1000)
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "peak_queued": 0}
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        enqueued_at = time.monotonic()
+        with self._lock:
+            self.queued += 1
+            self._counters["submitted"] += 1
+            self._counters["peak_queued"] = max(self._counters["peak_queued"], self.queued)
+
+        def _run():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self._wait_times.append(time.monotonic() - enqueued_at)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self._counters["failed" if failed else "completed"] += 1
+
+        try:
+            return super().submit(_run)
+        except RuntimeError:
+            # Shut down: the call never queued
+            with self._lock:
+                self.queued -= 1
+            raise
+
+    @property
+    def saturated(self) -> bool:
+        return self.max_queue > 0 and self.queued >= self.max_queue
+
+    def admit(self):
+        """Refuses new interactive work while the backlog is at its limit."""
+        if self.saturated:
+            with self._lock:
+                self._counters["rejected"] += 1
+            logger.warning(f"Executor '{self.name}' saturated ({self.queued} queued, limit {self.max_queue})")
+            raise ExecutorSaturatedError(f"The {self.name} pool is saturated, retry shortly")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._wait_times)
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": self.queued,
+                **self._counters,
+                "wait_p50_ms": _percentile_ms(samples, 0.50),
+                "wait_p95_ms": _percentile_ms(samples, 0.95),
+                "wait_max_ms": _percentile_ms(samples, 1.0),
+            }
+
+
+def _percentile_ms(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, int(q * len(sorted_samples)))
+    return round(sorted_samples[idx] * 1000, 2)
+
+
+class Executors:
+    """The process-wide pools, created on first use from settings."""
+
+    def __init__(self, sizes: Optional[Dict[str, int]] = None, queue_limits: Optional[Dict[str, int]] = None):
+        self.sizes = sizes or {
+            SEARCH: settings.EXECUTOR_SEARCH_THREADS,
+            INFERENCE: settings.EXECUTOR_INFERENCE_THREADS,
+            INGEST: settings.EXECUTOR_INGEST_THREADS,
+            EXTRACTION: settings.EXECUTOR_EXTRACTION_THREADS,
+            IO: settings.EXECUTOR_IO_THREADS,
+        }
+        self.queue_limits = queue_limits or {
+            SEARCH: settings.EXECUTOR_SEARCH_MAX_QUEUE,
+            INFERENCE: settings.EXECUTOR_INFERENCE_MAX_QUEUE,
+            INGEST: settings.EXECUTOR_INGEST_MAX_QUEUE,
+            EXTRACTION: settings.EXECUTOR_EXTRACTION_MAX_QUEUE,
+            IO: settings.EXECUTOR_IO_MAX_QUEUE,
+        }
+        self._pools: Dict[str, WorkloadExecutor] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> WorkloadExecutor:
+        pool = self._pools.get(name)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(name)
+                if pool is None:
+                    pool = self._pools[name] = WorkloadExecutor(name, self.sizes[name], self.queue_limits.get(name, 0))
+        return pool
+
+    @property
+    def search(self) -> WorkloadExecutor:
+        return self.get(SEARCH)
+
+    @property
+    def inference(self) -> WorkloadExecutor:
+        return self.get(INFERENCE)
+
+    @property
+    def ingest(self) -> WorkloadExecutor:
+        return self.get(INGEST)
+
+    @property
+    def extraction(self) -> WorkloadExecutor:
+        return self.get(EXTRACTION)
+
+    @property
+    def io(self) -> WorkloadExecutor:
+        return self.get(IO)
+
+    def admit(self, *names: str):
+        for name in names:
+            self.get(name).admit()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {name: self.get(name).get_metrics() for name in self.sizes}
+
+    def shutdown(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=False)
+
+
+executors = Executors()
@@ -0,0 +1,396 @@
+"""
+Index Replication
+- The shared index lives in S3 as immutable segments plus a versioned manifest:
+  indexes/manifest.json -> indexes/segments/<segment>.npy (vectors) + <segment>.jsonl.gz (chunks)
+- A sync uploads one segment with only the chunks added since the previous sync, plus
+  tombstones for removed chunk IDs, and publishes manifest version N+1 last
+- Replicas download only the segments they have not applied and the newer tombstones, so
+  sync and pull cost follow the size of the change, not the size of the corpus
+- BM25 is replicated from the same segment chunks (the BM25 pickle never left the node before)
+- More than INDEX_MAX_SEGMENTS segments are compacted into one base segment; replicas rebuild once,
+  and the superseded segment objects are deleted once the compacted manifest is live
+- The manifest is published with a conditional put (If-Match on the ETag that was read, or
+  If-None-Match for the first version); a writer that lost the race re-reads and retries, so
+  concurrent pushes never drop each other's segments or tombstones
+"""
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from botocore.exceptions import ClientError
+from loguru import logger
+
+from backend.core.config import settings
+from backend.services.executors import executors
+from backend.utils.atomic_files import save_faiss_atomic, write_json_atomic
+
+STATE_PATH = os.path.join("data", "indexes", "replication_state.json")
+MANIFEST_PUBLISH_ATTEMPTS = 5
+
+
+class ManifestConflictError(Exception):
+    """Another writer published the manifest between our read and our conditional write."""
+
+
+def _is_conflict(error: ClientError) -> bool:
+    code = error.response.get("Error", {}).get("Code")
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("PreconditionFailed", "ConditionalRequestConflict") or status in (409, 412)
+
+
+class FaissIndexFiles:
+    """The LangChain FAISS files (index.faiss + index.pkl), read and written without the embedding model."""
+
+    def __init__(self, index_dir: str = "data/indexes/faiss"):
+        self.index_dir = index_dir
+        self.store = None
+
+    def load(self):
+        from langchain_community.vectorstores import FAISS
+
+        self.store = None
+        if os.path.exists(os.path.join(self.index_dir, "index.faiss")):
+            self.store = FAISS.load_local(
+                self.index_dir, None, allow_dangerous_deserialization=True, distance_strategy="COSINE"
+            )
+
+    def reset(self):
+        self.store = None
+
+    def ids(self) -> List[str]:
+        return list(self.store.index_to_docstore_id.values()) if self.store else []
+
+    def rows(self, ids: List[str]) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+        position = {doc_id: pos for pos, doc_id in self.store.index_to_docstore_id.items()}
+        vectors = np.vstack([self.store.index.reconstruct(position[doc_id]) for doc_id in ids]).astype(np.float32)
+        docs = []
+        for doc_id in ids:
+            doc = self.store.docstore.search(doc_id)
+            docs.append({"id": doc_id, "content": doc.page_content, "metadata": doc.metadata})
+        return vectors, docs
+
+    def add(self, vectors: np.ndarray, docs: List[Dict[str, Any]]):
+        if self.store is None:
+            import faiss
+            from langchain_community.docstore.in_memory import InMemoryDocstore
+            from langchain_community.vectorstores import FAISS
+
+            self.store = FAISS(None, faiss.IndexFlatL2(vectors.shape[1]), InMemoryDocstore(), {}, distance_strategy="COSINE")
+        self.store.add_embeddings(
+            [(doc["content"], vector.tolist()) for doc, vector in zip(docs, vectors)],
+            metadatas=[doc["metadata"] for doc in docs],
+            ids=[doc["id"] for doc in docs]
+        )
+
+    def remove(self, ids: List[str]) -> List[Dict[str, Any]]:
+        """Deletes chunks by ID and returns them, so BM25 can drop the same entries."""
+        if not self.store:
+            return []
+        present = set(self.store.index_to_docstore_id.values())
+        doomed = [doc_id for doc_id in ids if doc_id in present]
+        if not doomed:
+            return []
+        removed = []
+        for doc_id in doomed:
+            doc = self.store.docstore.search(doc_id)
+            removed.append({"content": doc.page_content, "metadata": doc.metadata})
+        self.store.delete(doomed)
+        return removed
+
+    def save(self):
+        if self.store:
+            save_faiss_atomic(self.store, self.index_dir)
+
+
+class Bm25IndexFiles:
+    """The BM25 pickle, rebuilt from the same chunks as the replicated FAISS index."""
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path
+        self.index = None
+
+    def load(self):
+        from backend.services.retrieval.bm25_search import BM25Index
+        self.index = BM25Index(self.index_path)
+
+    def reset(self):
+        self.index.clear()
+
+    def add(self, docs: List[Dict[str, Any]]):
+        self.index.add_documents(docs, persist=False)
+
+    def remove(self, docs: List[Dict[str, Any]]):
+        self.index.remove_documents(docs, persist=False)
+
+    def save(self):
+        self.index.save()
+
+
+def _write_segment(directory: str, segment_id: str, vectors: np.ndarray, docs: List[Dict[str, Any]]) -> Tuple[str, str]:
+    npy_path = os.path.join(directory, f"{segment_id}.npy")
+    docs_path = os.path.join(directory, f"{segment_id}.jsonl.gz")
+    np.save(npy_path, vectors.astype(np.float32))
+    with gzip.open(docs_path, "wt", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    return npy_path, docs_path
+
+
+def _read_segment(npy_path: str, docs_path: str) -> Tuple[np.ndarray, List[Dict[str, Any]]]:
+    vectors = np.load(npy_path, allow_pickle=False)
+    with gzip.open(docs_path, "rt", encoding="utf-8") as f:
+        docs = [json.loads(line) for line in f if line.strip()]
+    return vectors, docs
+
+
+class IndexReplicator:
+    def __init__(self, s3_manager, faiss_files=None, bm25_files=None, state_path: Optional[str] = None):
+        self.s3 = s3_manager
+        self.faiss = faiss_files or FaissIndexFiles()
+        self.bm25 = bm25_files or Bm25IndexFiles()
+        self.state_path = state_path or STATE_PATH
+        self._lock = asyncio.Lock()
+
+    def _key(self, name: str) -> str:
+        return f"{settings.S3_INDEXES_PREFIX}{name}"
+
+    def _segment_keys(self, segment_id: str) -> Tuple[str, str]:
+        return self._key(f"segments/{segment_id}.npy"), self._key(f"segments/{segment_id}.jsonl.gz")
+
+    def _load_state(self) -> Dict[str, Any]:
+        """What this node has replicated: manifest version, applied segments, chunk IDs at the last sync."""
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 0, "segments": [], "ids": []}
+
+    def _save_state(self, state: Dict[str, Any]):
+        write_json_atomic(self.state_path, state)
+
+    def local_version(self) -> Optional[int]:
+        """Manifest version the local index files are at (None before the first push or pull)."""
+        if not os.path.exists(self.state_path):
+            return None
+        return self._load_state()["version"]
+
+    async def get_manifest(self) -> Optional[Dict[str, Any]]:
+        return (await self._read_manifest())[0]
+
+    async def _read_manifest(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """The published manifest and its ETag, or (None, None) before the first push."""
+        def _get():
+            try:
+                response = self.s3.s3.get_object(Bucket=self.s3.bucket, Key=self._key("manifest.json"))
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                    return None, None
+                raise
+            with response["Body"] as body:
+                return json.loads(body.read()), response["ETag"]
+
+        return await self.s3.run_io(_get)
+
+    async def _publish_manifest(self, manifest: Dict[str, Any], etag: Optional[str]):
+        """Writes the manifest only if it is still the one we read; raises ManifestConflictError otherwise."""
+        condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+        try:
+            await self.s3.run_io(
+                self.s3.s3.put_object,
+                Bucket=self.s3.bucket,
+                Key=self._key("manifest.json"),
+                Body=json.dumps(manifest).encode("utf-8"),
+                ContentType="application/json",
+                **condition
+            )
+        except ClientError as e:
+            if _is_conflict(e):
+                raise ManifestConflictError(str(e)) from e
+            raise
+
+    async def push(self) -> Optional[int]:
+        """Uploads the chunks added/removed since the last sync as a new manifest version. Returns it."""
+        async with self._lock:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(executors.io, self.faiss.load)
+            current = self.faiss.ids()
+            state = self._load_state()
+            known = set(state["ids"])
+            added = [doc_id for doc_id in current if doc_id not in known]
+            removed = sorted(known - set(current))
+            if not added and not removed:
+                logger.info("Index replication: no changes since the last sync")
+                return None
+
+            for attempt in range(1, MANIFEST_PUBLISH_ATTEMPTS + 1):
+                try:
+                    return await self._push_once(state, current, added, removed)
+                except ManifestConflictError:
+                    if attempt == MANIFEST_PUBLISH_ATTEMPTS:
+                        raise
+                    logger.warning(f"Index replication: manifest changed while publishing, retrying ({attempt})")
+                    await asyncio.sleep(0.1 * attempt)
+
+    async def _push_once(self, state: Dict[str, Any], current: List[str], added: List[str], removed: List[str]) -> int:
+        manifest, etag = await self._read_manifest()
+        manifest = manifest or {"version": 0, "segments": [], "tombstones": []}
+        in_step = manifest["version"] == state["version"]
+        version = manifest["version"] + 1
+        applied = list(state["segments"])
+
+        # Only a node that has seen every published version may rewrite history
+        compact = in_step and len(manifest["segments"]) >= settings.INDEX_MAX_SEGMENTS
+        superseded = []
+        if compact:
+            added, removed = current, []
+            superseded = [segment["id"] for segment in manifest["segments"]]
+            manifest["segments"], manifest["tombstones"], applied = [], [], []
+            manifest["compacted_version"] = version
+
+        segment = None
+        if added:
+            segment = await self._upload_segment(version, added)
+            manifest["segments"].append(segment)
+            applied.append(segment["id"])
+        if removed:
+            manifest["tombstones"].append({"version": version, "ids": removed})
+
+        manifest.update({
+            "version": version,
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "total_rows": len(current),
+        })
+        # Published last: readers never see a version whose segments are still uploading
+        try:
+            await self._publish_manifest(manifest, etag)
+        except ManifestConflictError:
+            # Nobody references the segment we just uploaded
+            if segment:
+                await self._delete_segments([segment["id"]])
+            raise
+        self._save_state({
+            # Behind a newer remote version we keep our tombstone position and catch up on the next pull
+            "version": version if in_step else state["version"],
+            "segments": applied,
+            "ids": current
+        })
+        if superseded:
+            await self._delete_segments(superseded)
+        logger.info(
+            f"Index replication: published v{version} (+{len(added)} rows, -{len(removed)} rows"
+            f"{', compacted' if compact else ''})"
+        )
+        return version
+
+    async def _delete_segments(self, segment_ids: List[str]):
+        """Removes segment objects no manifest refers to any more (best effort)."""
+        keys = [key for segment_id in segment_ids for key in self._segment_keys(segment_id)]
+        try:
+            for i in range(0, len(keys), 1000):
+                await self.s3.run_io(
+                    self.s3.s3.delete_objects,
+                    Bucket=self.s3.bucket,
+                    Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True}
+                )
+        except Exception as e:
+            logger.warning(f"Index replication: could not delete {len(segment_ids)} unreferenced segment(s): {e}")
+
+    async def _upload_segment(self, version: int, ids: List[str]) -> Dict[str, Any]:
+        segment_id = f"{version:08d}-{uuid.uuid4().hex[:8]}"
+        loop = asyncio.get_event_loop()
+        vectors, docs = await loop.run_in_executor(executors.io, self.faiss.rows, ids)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = await loop.run_in_executor(executors.io, _write_segment, tmp_dir, segment_id, vectors, docs)
+            size = sum(os.path.getsize(p) for p in paths)
+            results = await self.s3.transfer.upload_many(list(zip(paths, self._segment_keys(segment_id))))
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return {"id": segment_id, "version": version, "rows": len(ids), "bytes": size}
+
+    async def pull(self) -> bool:
+        """
+        Brings the local FAISS and BM25 files up to the published manifest.
+        Returns False if the bucket has no manifest yet (legacy whole-file index).
+        """
+        async with self._lock:
+            manifest = await self.get_manifest()
+            if manifest is None:
+                return False
+
+            state = self._load_state()
+            published = [s["id"] for s in manifest["segments"]]
+            # Fresh node or compaction upstream: local files cannot be patched, rebuild from the segments
+            reset = not os.path.exists(self.state_path) or any(s not in published for s in state["segments"])
+            if manifest["version"] == state["version"] and not reset:
+                logger.info(f"Index replication: already at v{manifest['version']}")
+                return True
+
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(executors.io, self.faiss.load)
+            await loop.run_in_executor(executors.io, self.bm25.load)
+            applied = set() if reset else set(state["segments"])
+            tombstones_from = 0 if reset else state["version"]
+            # Rows saved here but not pushed yet: they must survive a rebuild and stay out of the
+            # replicated IDs, so the next push still uploads them
+            replicated = set() if reset else set(state["ids"])
+            known = set(state["ids"])
+            unpushed = [doc_id for doc_id in self.faiss.ids() if doc_id not in known]
+            kept = None
+            if reset and unpushed:
+                kept = await loop.run_in_executor(executors.io, self.faiss.rows, unpushed)
+            if reset:
+                self.faiss.reset()
+                await loop.run_in_executor(executors.io, self.bm25.reset)
+
+            missing = [s for s in manifest["segments"] if s["id"] not in applied]
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                downloads = []
+                for segment in missing:
+                    for key in self._segment_keys(segment["id"]):
+                        downloads.append((key, os.path.join(tmp_dir, os.path.basename(key))))
+                for result in await self.s3.transfer.download_many(downloads):
+                    if isinstance(result, Exception):
+                        raise result
+
+                # Apply in publish order so tombstones always find the rows they refer to
+                for segment in missing:
+                    npy_path, docs_path = (os.path.join(tmp_dir, os.path.basename(k)) for k in self._segment_keys(segment["id"]))
+                    vectors, docs = await loop.run_in_executor(executors.io, _read_segment, npy_path, docs_path)
+                    await loop.run_in_executor(executors.io, self.faiss.add, vectors, docs)
+                    await loop.run_in_executor(
+                        executors.io, self.bm25.add, [{"content": d["content"], "metadata": d["metadata"]} for d in docs]
+                    )
+                    replicated.update(d["id"] for d in docs)
+
+            for tombstone in manifest["tombstones"]:
+                if tombstone["version"] > tombstones_from:
+                    removed = await loop.run_in_executor(executors.io, self.faiss.remove, tombstone["ids"])
+                    await loop.run_in_executor(executors.io, self.bm25.remove, removed)
+                    replicated.difference_update(tombstone["ids"])
+
+            if reset and kept is not None:
+                # Put back the unpushed rows the rebuild dropped (unless a segment brought the same chunk)
+                vectors, docs = kept
+                restore = [i for i, doc in enumerate(docs) if doc["id"] not in replicated]
+                if restore:
+                    await loop.run_in_executor(executors.io, self.faiss.add, vectors[restore], [docs[i] for i in restore])
+                    await loop.run_in_executor(
+                        executors.io, self.bm25.add, [{"content": docs[i]["content"], "metadata": docs[i]["metadata"]} for i in restore]
+                    )
+
+            await loop.run_in_executor(executors.io, self.faiss.save)
+            await loop.run_in_executor(executors.io, self.bm25.save)
+            self._save_state({"version": manifest["version"], "segments": published, "ids": sorted(replicated)})
+            logger.info(
+                f"Index replication: pulled v{manifest['version']} "
+                f"({len(missing)} segment(s){', full rebuild' if reset else ''})"
+            )
+            return True
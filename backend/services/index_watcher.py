@@ -0,0 +1,95 @@
+"""
+Index Watcher
+- Background task that polls the S3 index version (manifest version, or the legacy index ETag)
+  every INDEX_WATCH_INTERVAL_SECONDS
+- When another replica published, pulls the changed segments and hot-swaps the in-memory
+  FAISS/BM25 indexes of the shared retrieval service; searches keep running on the old
+  indexes until the swap and are never blocked
+- A node's own pushes are recognised by the local replication version and not reloaded
+"""
+import asyncio
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from backend.core.config import settings
+
+
+class IndexWatcher:
+    def __init__(self, s3_manager=None, retrieval_service=None, interval: Optional[int] = None):
+        self._s3_manager = s3_manager
+        self._retrieval_service = retrieval_service
+        self.interval = settings.INDEX_WATCH_INTERVAL_SECONDS if interval is None else interval
+        # Index version the in-memory engine holds (None until the first check)
+        self.loaded_version: Optional[str] = None
+        self.reloads = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    @property
+    def s3(self):
+        if self._s3_manager is None:
+            from backend.services.s3_sync import s3_sync_manager
+            self._s3_manager = s3_sync_manager
+        return self._s3_manager
+
+    @property
+    def retrieval_service(self):
+        if self._retrieval_service is None:
+            from backend.services.retrieval.semantic_search import get_retrieval_service
+            self._retrieval_service = get_retrieval_service()
+        return self._retrieval_service
+
+    def start(self):
+        if self.interval <= 0 or not self.s3.enabled or self._task is not None:
+            return
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Index watcher started (every {self.interval}s)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await self.check_once()
+            except Exception as e:
+                logger.warning(f"Index watcher check failed: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def check_once(self) -> bool:
+        """Pulls and swaps in a newly published index version. Returns True if the engine was reloaded."""
+        remote = await self.s3.remote_index_version()
+        if remote is None or remote == self.loaded_version:
+            return False
+        # Local files already at the remote version after the first load: this node published it,
+        # and its in-memory indexes already hold those rows
+        if self.loaded_version is not None and self.s3.local_index_version() == remote:
+            self.loaded_version = remote
+            return False
+
+        await self.retrieval_service.reload_indexes(refresh=self.s3.pull_shared_index)
+        logger.info(f"Index watcher: now serving index {remote} (was {self.loaded_version or 'startup files'})")
+        self.loaded_version = remote
+        self.reloads += 1
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "loaded_version": self.loaded_version,
+            "reloads": self.reloads,
+        }
+
+
+index_watcher = IndexWatcher()
@@ -0,0 +1,118 @@
+"""
+Inference Client
+- Talks to the inference sidecar (backend/services/inference_server.py) at INFERENCE_URL
+- Async methods for the request path, blocking ones for code already running in an executor
+  (LangChain vector stores call embed_documents synchronously)
+- RemoteEmbeddings is a LangChain Embeddings backed by the sidecar; get_shared_embeddings()
+  returns it instead of loading the model whenever INFERENCE_URL is set
+"""
+from typing import List, Optional
+
+import httpx
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend.core.config import settings
+from backend.services.inference_server import decode_vectors
+
+# Texts per HTTP request for bulk embedding; the sidecar re-batches them anyway
+REQUEST_CHUNK = 256
+
+
+class InferenceClient:
+    def __init__(self, base_url: Optional[str] = None, timeout: Optional[float] = None,
+                 client: Optional[httpx.AsyncClient] = None, sync_client: Optional[httpx.Client] = None):
+        self.base_url = (base_url or settings.INFERENCE_URL or "").rstrip("/")
+        self.timeout = settings.INFERENCE_TIMEOUT_SECONDS if timeout is None else timeout
+        self._client = client
+        self._sync_client = sync_client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+        return self._client
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(base_url=self.base_url, timeout=self.timeout)
+        return self._sync_client
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        response = await self.client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def embed(self, texts: List[str], query: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        parts = [
+            decode_vectors(await self._post("/embed", {"texts": texts[i:i + REQUEST_CHUNK], "query": query}))
+            for i in range(0, len(texts), REQUEST_CHUNK)
+        ]
+        return np.concatenate(parts)
+
+    def embed_sync(self, texts: List[str], query: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        parts = []
+        for i in range(0, len(texts), REQUEST_CHUNK):
+            response = self.sync_client.post("/embed", json={"texts": texts[i:i + REQUEST_CHUNK], "query": query})
+            response.raise_for_status()
+            parts.append(decode_vectors(response.json()))
+        return np.concatenate(parts)
+
+    async def cross_encoder_scores(self, query: str, texts: List[str]) -> List[float]:
+        return (await self._post("/rerank/cross-encoder", {"query": query, "texts": texts}))["scores"]
+
+    async def flashrank_scores(self, query: str, texts: List[str]) -> List[float]:
+        return (await self._post("/rerank/flashrank", {"query": query, "texts": texts}))["scores"]
+
+    async def health(self) -> dict:
+        response = await self.client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+
+class RemoteEmbeddings(Embeddings):
+    def __init__(self, client: InferenceClient):
+        self.client = client
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_sync(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed_sync([text], query=True)[0].tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return (await self.client.embed(texts)).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.client.embed([text], query=True))[0].tolist()
+
+
+_inference_client: Optional[InferenceClient] = None
+_remote_embeddings: Optional[RemoteEmbeddings] = None
+
+
+def get_inference_client() -> InferenceClient:
+    global _inference_client
+    if _inference_client is None:
+        _inference_client = InferenceClient()
+    return _inference_client
+
+
+def get_remote_embeddings() -> RemoteEmbeddings:
+    global _remote_embeddings
+    if _remote_embeddings is None:
+        _remote_embeddings = RemoteEmbeddings(get_inference_client())
+    return _remote_embeddings
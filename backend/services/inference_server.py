@@ -0,0 +1,230 @@
+"""
+Inference Sidecar
+- Separate process hosting the embedding model (EmbeddingProvider) and both reranker models
+  (FlashRank, BGE cross-encoder) behind a local HTTP interface; run it with
+  scripts/run_inference_server.py and point the API at it with INFERENCE_URL
+- Concurrent requests are coalesced into one model call per batch (up to INFERENCE_MAX_BATCH
+  items, waiting at most INFERENCE_BATCH_WAIT_MS for more), run on a dedicated model thread
+  pool, so model CPU never competes with the API's executor
+- Vectors travel as base64 float32, scores as JSON lists
+"""
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import FastAPI
+from loguru import logger
+from pydantic import BaseModel
+
+from backend.core.config import settings
+
+
+def encode_vectors(vectors) -> Dict[str, Any]:
+    array = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+    return {"count": int(array.shape[0]), "dim": int(array.shape[1]) if array.ndim == 2 else 0,
+            "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def decode_vectors(payload: Dict[str, Any]) -> np.ndarray:
+    data = np.frombuffer(base64.b64decode(payload["data"]), dtype=np.float32)
+    return data.reshape(payload["count"], payload["dim"])
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submit() calls into one `run(items)` call per batch.
+    `run` takes the concatenated items and returns one result per item.
+    """
+
+    def __init__(self, name: str, run: Callable[[List[Any]], List[Any]], executor: ThreadPoolExecutor,
+                 max_batch: Optional[int] = None, wait_ms: Optional[float] = None):
+        self.name = name
+        self.run = run
+        self.executor = executor
+        self.max_batch = max_batch or settings.INFERENCE_MAX_BATCH
+        self.wait = (settings.INFERENCE_BATCH_WAIT_MS if wait_ms is None else wait_ms) / 1000
+        self.batches = 0
+        self.items = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(self, items: List[Any]) -> List[Any]:
+        if not items:
+            return []
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._worker())
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((items, future))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[List[Any], asyncio.Future]]:
+        loop = asyncio.get_event_loop()
+        pending = [await self._queue.get()]
+        size = len(pending[0][0])
+        deadline = loop.time() + self.wait
+        while size < self.max_batch:
+            try:
+                request = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            pending.append(request)
+            size += len(request[0])
+        return pending
+
+    async def _worker(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            pending = await self._next_batch()
+            flat = [item for items, _ in pending for item in items]
+            try:
+                results = await loop.run_in_executor(self.executor, self.run, flat)
+            except asyncio.CancelledError:
+                for _, future in pending:
+                    future.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Inference batch '{self.name}' failed ({len(flat)} items): {e}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(flat)
+            start = 0
+            for items, future in pending:
+                if not future.done():
+                    future.set_result(list(results[start:start + len(items)]))
+                start += len(items)
+
+    async def close(self):
+        """Stops the worker task; requests still waiting on it are cancelled."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
+
+
+class InferenceModels:
+    """The real models, loaded on first use in the sidecar process (never via INFERENCE_URL)."""
+
+    def __init__(self):
+        self._embeddings = None
+        self._reranker = None
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from backend.services.embeddings import EmbeddingProvider
+            self._embeddings = EmbeddingProvider.get_instance().get_embeddings()
+        return self._embeddings
+
+    @property
+    def reranker(self):
+        if self._reranker is None:
+            from backend.services.retrieval.reranker import Reranker
+            self._reranker = Reranker(local=True)
+        return self._reranker
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # HuggingFaceEmbeddings.embed_query is embed_documents([text])[0] (no query instruction),
+        # so a batch of queries is one forward pass
+        return self.embeddings.embed_documents(texts)
+
+    def cross_encoder_scores(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return self.reranker.cross_encoder_scores(pairs)
+
+    def flashrank_scores(self, query: str, texts: List[str]) -> List[float]:
+        return self.reranker.flashrank_scores(query, texts)
+
+    def status(self) -> Dict[str, Any]:
+        reranker = self._reranker
+        return {
+            "embedding_model": settings.EMBEDDING_MODEL if self._embeddings is not None else None,
+            "flashrank": bool(reranker and reranker.flash_ranker),
+            "cross_encoder": reranker.model_name if reranker and reranker.cross_encoder else None
+        }
+
+
+class EmbedRequest(BaseModel):
+    texts: List[str]
+    query: bool = False
+
+
+class RerankRequest(BaseModel):
+    query: str
+    texts: List[str]
+
+
+def create_app(models=None) -> FastAPI:
+    models = models or InferenceModels()
+    executor = ThreadPoolExecutor(max_workers=settings.INFERENCE_THREADS, thread_name_prefix="inference")
+    batchers = {
+        "embed_documents": MicroBatcher("embed_documents", models.embed_documents, executor),
+        "embed_queries": MicroBatcher("embed_queries", models.embed_queries, executor),
+        "cross_encoder": MicroBatcher("cross_encoder", models.cross_encoder_scores, executor),
+        # FlashRank scores one query per call, so a batch is a list of (query, texts) requests
+        "flashrank": MicroBatcher(
+            "flashrank", lambda requests: [models.flashrank_scores(q, texts) for q, texts in requests], executor
+        ),
+    }
+    app = FastAPI(title="Inference Sidecar")
+
+    @app.post("/embed")
+    async def embed(request: EmbedRequest):
+        batcher = batchers["embed_queries" if request.query else "embed_documents"]
+        return encode_vectors(await batcher.submit(request.texts))
+
+    @app.post("/rerank/cross-encoder")
+    async def cross_encoder(request: RerankRequest):
+        return {"scores": await batchers["cross_encoder"].submit([(request.query, t) for t in request.texts])}
+
+    @app.post("/rerank/flashrank")
+    async def flashrank(request: RerankRequest):
+        if not request.texts:
+            return {"scores": []}
+        scores = await batchers["flashrank"].submit([(request.query, request.texts)])
+        return {"scores": scores[0]}
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "healthy",
+            "models": models.status(),
+            "batches": {name: batcher.stats() for name, batcher in batchers.items()}
+        }
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        # Workers first, so none submits to the executor after it is shut down
+        for batcher in batchers.values():
+            await batcher.close()
+        executor.shutdown(wait=False)
+
+    return app
@@ -0,0 +1,737 @@
+"""
+Ingestion Job Queue
+- Durable queue of ingestion jobs stored in the SQL database (survives restarts)
+- Worker pool that claims jobs atomically; can run in the API process or as separate processes
+- A single index writer: the API primary's pool is the only one that adds to or saves the
+  indexes; standalone worker processes only extract, chunk and embed into the shared chunk
+  cache and hand the job back, and the writer indexes the cached chunks and vectors
+- Per-stage progress (extract / chunk / embed / index), retries with exponential backoff, cancellation
+- Post-ingestion pipeline (registry, system prompt, S3 backup) runs on the worker after success
+- Document deletes received by serving replicas are queued as 'delete' jobs for the index writer
+- Batch members are 'indexed' (in memory only) until the batch is persisted, and only then
+  succeed; after a crash, the writer re-queues indexed members whose batch never saved
+"""
+import asyncio
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import select, update, or_, and_, true, func, case
+
+from backend.core.config import settings
+from backend.models.database import AsyncSessionLocal
+from backend.models.models import Document, IngestionJob
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+INDEXED = "indexed" # batch member searchable in memory, succeeds once its batch is persisted
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+# A batch is ready to persist once no member is still queued or running
+BATCH_DONE_STATES = FINISHED_STATES + (INDEXED,)
+SAVING_WITH_BATCH = " (saving with batch)"
+
+INGEST = "ingest"
+DELETE = "delete"
+
+# Which jobs a worker loop claims
+CLAIM_ALL = "all"
+CLAIM_PREPARE = "prepare" # standalone workers: jobs not yet extracted/embedded
+CLAIM_INDEX = "index" # index writer without extraction loops: prepared jobs and deletes
+
+_CLAIM_SCOPES = {
+    CLAIM_ALL: true(),
+    CLAIM_PREPARE: and_(IngestionJob.prepared.is_not(True), IngestionJob.kind.is_distinct_from(DELETE)),
+    CLAIM_INDEX: or_(IngestionJob.prepared.is_(True), IngestionJob.kind == DELETE),
+}
+
+
+def job_to_dict(job: IngestionJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "kind": job.kind or INGEST,
+        "document_id": job.document_id,
+        "batch_id": job.batch_id,
+        "filename": job.filename,
+        "database": job.database,
+        "status": job.status,
+        "stage": job.stage,
+        "prepared": bool(job.prepared),
+        "progress": job.progress or {},
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "next_run_at": job.next_run_at.isoformat() if job.next_run_at else None,
+        "cancel_requested": bool(job.cancel_requested),
+        "worker_id": job.worker_id,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class IngestionQueue:
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or AsyncSessionLocal
+
+    async def enqueue(
+        self,
+        filename: str,
+        file_path: str,
+        database: str = "faiss",
+        service: Optional[str] = None,
+        document_id: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        batch_id: Optional[str] = None
+    ) -> IngestionJob:
+        async with self.session_factory() as session:
+            job = IngestionJob(
+                document_id=document_id,
+                batch_id=batch_id,
+                filename=filename,
+                file_path=file_path,
+                database=database,
+                service=service,
+                status=QUEUED,
+                progress={},
+                max_attempts=max_attempts or settings.INGESTION_MAX_ATTEMPTS,
+                next_run_at=datetime.utcnow()
+            )
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            logger.info(f"Queued ingestion job {job.id} for {filename} into {database}")
+            return job
+
+    async def enqueue_delete(self, filename: str, database: str = "faiss") -> IngestionJob:
+        """Queues removing a document's chunks from the indexes, for the index writer to run."""
+        async with self.session_factory() as session:
+            job = IngestionJob(
+                kind=DELETE,
+                filename=filename,
+                database=database,
+                status=QUEUED,
+                progress={},
+                max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+                next_run_at=datetime.utcnow()
+            )
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            logger.info(f"Queued index delete {job.id} for {filename} from {database}")
+            return job
+
+    async def enqueue_many(self, items: List[Dict[str, Any]], database: str = "faiss", batch_id: Optional[str] = None) -> List[IngestionJob]:
+        """Queues one job per {"filename", "file_path", "service", "document_id"} in a single transaction."""
+        async with self.session_factory() as session:
+            jobs = [
+                IngestionJob(
+                    document_id=item.get("document_id"),
+                    batch_id=batch_id,
+                    filename=item["filename"],
+                    file_path=item["file_path"],
+                    database=database,
+                    service=item.get("service"),
+                    status=QUEUED,
+                    progress={},
+                    max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+                    next_run_at=datetime.utcnow()
+                )
+                for item in items
+            ]
+            session.add_all(jobs)
+            await session.commit()
+            logger.info(f"Queued {len(jobs)} ingestion jobs into {database} (batch {batch_id})")
+            return jobs
+
+    async def claim(self, worker_id: str, scope: str = CLAIM_ALL) -> Optional[IngestionJob]:
+        """
+        Atomically claims the oldest runnable job in `scope`. Jobs left 'running' by a worker
+        that stopped heartbeating (crash, restart) are claimed again.
+        """
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.INGESTION_STALE_SECONDS)
+        runnable = and_(
+            _CLAIM_SCOPES[scope],
+            or_(
+                and_(IngestionJob.status == QUEUED, IngestionJob.next_run_at <= now),
+                and_(IngestionJob.status == RUNNING, IngestionJob.heartbeat_at < stale_before)
+            )
+        )
+        async with self.session_factory() as session:
+            candidates = await session.execute(
+                select(IngestionJob.id, IngestionJob.status)
+                .where(runnable)
+                .order_by(IngestionJob.next_run_at, IngestionJob.created_at)
+                .limit(5)
+            )
+            for job_id, status in candidates.all():
+                # Conditional update: only one worker wins the race for a given job
+                result = await session.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.id == job_id, IngestionJob.status == status, runnable)
+                    .values(
+                        status=RUNNING,
+                        worker_id=worker_id,
+                        attempts=IngestionJob.attempts + 1,
+                        started_at=now,
+                        heartbeat_at=now,
+                        error=None
+                    )
+                )
+                await session.commit()
+                if result.rowcount == 1:
+                    if status == RUNNING:
+                        logger.warning(f"Reclaimed stale ingestion job {job_id}")
+                    return await session.get(IngestionJob, job_id)
+        return None
+
+    async def update_progress(self, job_id: str, stage: str, progress: Dict[str, Any]) -> bool:
+        """Records progress and heartbeats. Returns True if cancellation was requested."""
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return True
+            job.stage = stage
+            job.progress = progress
+            job.heartbeat_at = datetime.utcnow()
+            await session.commit()
+            return bool(job.cancel_requested)
+
+    async def heartbeat(self, job_id: str) -> bool:
+        """Keeps a long-running stage alive. Returns True if cancellation was requested."""
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return True
+            job.heartbeat_at = datetime.utcnow()
+            await session.commit()
+            return bool(job.cancel_requested)
+
+    async def complete(self, job_id: str):
+        await self._finish(job_id, SUCCEEDED, stage="done")
+
+    async def mark_indexed(self, job_id: str):
+        """A batch member is in the in-memory indexes; complete_batch() finishes it after the batch is saved."""
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return
+            job.status = INDEXED
+            job.stage = "indexed"
+            job.worker_id = None
+            if job.document_id:
+                doc = await session.get(Document, job.document_id)
+                if doc:
+                    doc.status = f"{doc.status}{SAVING_WITH_BATCH}"
+                    doc.processed = False
+            await session.commit()
+
+    async def complete_batch(self, batch_id: str):
+        """Marks the batch's indexed members succeeded once the indexes holding them are on disk."""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(IngestionJob).where(IngestionJob.batch_id == batch_id, IngestionJob.status == INDEXED)
+            )
+            now = datetime.utcnow()
+            for job in result.scalars().all():
+                job.status = SUCCEEDED
+                job.stage = "done"
+                job.finished_at = now
+                if job.document_id:
+                    doc = await session.get(Document, job.document_id)
+                    if doc:
+                        doc.status = (doc.status or "completed").removesuffix(SAVING_WITH_BATCH)
+                        doc.processed = True
+            await session.commit()
+
+    async def requeue_unsaved(self) -> int:
+        """
+        Re-queues batch members left 'indexed' by a process that exited before saving the batch:
+        their chunks were only in that process's memory. Run by the index writer at startup.
+        """
+        async with self.session_factory() as session:
+            result = await session.execute(select(IngestionJob).where(IngestionJob.status == INDEXED))
+            jobs = list(result.scalars().all())
+            now = datetime.utcnow()
+            for job in jobs:
+                job.status = QUEUED
+                job.stage = None
+                job.next_run_at = now
+                job.batch_finalized = False
+                # Losing the process is not a failed attempt
+                job.attempts = max(0, job.attempts - 1)
+                await self._set_document_status(session, job, "queued (re-indexing unsaved batch)")
+            if jobs:
+                await session.execute(
+                    update(IngestionJob)
+                    .where(IngestionJob.batch_id.in_({job.batch_id for job in jobs}))
+                    .values(batch_finalized=False)
+                )
+            await session.commit()
+            if jobs:
+                logger.warning(f"Re-queued {len(jobs)} batch ingestion job(s) whose batch was never saved")
+            return len(jobs)
+
+    async def release_batch_finalization(self, batch_id: str):
+        """Lets the finalization sweep retry a batch whose indexes failed to save."""
+        async with self.session_factory() as session:
+            await session.execute(
+                update(IngestionJob).where(IngestionJob.batch_id == batch_id).values(batch_finalized=False)
+            )
+            await session.commit()
+
+    async def mark_prepared(self, job_id: str):
+        """Hands a job whose chunks and vectors are in the chunk cache back to the queue for the index writer."""
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return
+            job.status = QUEUED
+            job.stage = "prepared"
+            job.prepared = True
+            job.worker_id = None
+            job.next_run_at = datetime.utcnow()
+            # The hand-off is not a failed attempt
+            job.attempts = max(0, job.attempts - 1)
+            await session.commit()
+
+    async def cancelled(self, job_id: str):
+        await self._finish(job_id, CANCELLED, error="cancelled by user")
+
+    async def fail(self, job_id: str, error: str):
+        """Schedules a retry with exponential backoff, or fails the job once attempts run out."""
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return
+            job.error = error[:2000]
+            job.worker_id = None
+            if job.cancel_requested:
+                job.status = CANCELLED
+                job.finished_at = datetime.utcnow()
+            elif job.attempts < job.max_attempts:
+                delay = settings.INGESTION_RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+                job.status = QUEUED
+                job.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+                await self._set_document_status(session, job, f"queued (retry {job.attempts + 1}/{job.max_attempts})")
+                logger.warning(
+                    f"Ingestion job {job_id} ({job.filename}) failed on attempt {job.attempts}/{job.max_attempts}, "
+                    f"retrying in {delay:.0f}s: {error}"
+                )
+            else:
+                job.status = FAILED
+                job.finished_at = datetime.utcnow()
+                logger.error(f"Ingestion job {job_id} ({job.filename}) failed permanently: {error}")
+            await session.commit()
+
+    async def claim_batch_finalization(self, batch_id: str) -> bool:
+        """
+        Returns True for exactly one caller once every job in the batch has finished,
+        so the batch's shared indexes are persisted and synced a single time.
+        """
+        async with self.session_factory() as session:
+            pending = await session.execute(
+                select(IngestionJob.id)
+                .where(IngestionJob.batch_id == batch_id, IngestionJob.status.not_in(BATCH_DONE_STATES))
+                .limit(1)
+            )
+            if pending.first():
+                return False
+            result = await session.execute(
+                update(IngestionJob)
+                .where(IngestionJob.batch_id == batch_id, IngestionJob.batch_finalized == False)  # noqa: E712
+                .values(batch_finalized=True)
+            )
+            await session.commit()
+            return result.rowcount > 0
+
+    async def finalizable_batches(self) -> List[str]:
+        """Batches whose jobs have all finished (including by cancellation) but were never finalized."""
+        unfinished = func.sum(case((IngestionJob.status.in_(BATCH_DONE_STATES), 0), else_=1))
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(IngestionJob.batch_id)
+                .where(IngestionJob.batch_id.is_not(None), IngestionJob.batch_finalized.is_not(True))
+                .group_by(IngestionJob.batch_id)
+                .having(unfinished == 0)
+            )
+            return [row[0] for row in result.all()]
+
+    async def batch_summary(self, batch_id: str) -> Dict[str, Any]:
+        async with self.session_factory() as session:
+            result = await session.execute(select(IngestionJob).where(IngestionJob.batch_id == batch_id))
+            jobs = list(result.scalars().all())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "batch_id": batch_id,
+            "total": len(jobs),
+            "status_counts": counts,
+            "finalized": bool(jobs) and all(j.batch_finalized for j in jobs),
+            "databases": sorted({j.database for j in jobs}),
+            "jobs": [job_to_dict(j) for j in jobs],
+        }
+
+    async def _finish(self, job_id: str, status: str, stage: Optional[str] = None, error: Optional[str] = None):
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return
+            job.status = status
+            job.stage = stage or job.stage
+            job.error = error
+            job.worker_id = None
+            job.finished_at = datetime.utcnow()
+            if status == CANCELLED:
+                await self._set_document_status(session, job, CANCELLED)
+            await session.commit()
+
+    async def _set_document_status(self, session, job: IngestionJob, status: str):
+        if job.document_id:
+            doc = await session.get(Document, job.document_id)
+            if doc:
+                doc.status = status
+
+    async def request_cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Queued jobs are cancelled immediately; running jobs stop at their next progress check."""
+        async with self.session_factory() as session:
+            job = await session.get(IngestionJob, job_id)
+            if not job:
+                return None
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = datetime.utcnow()
+                await self._set_document_status(session, job, CANCELLED)
+            if job.status not in BATCH_DONE_STATES:
+                job.cancel_requested = True
+            await session.commit()
+            await session.refresh(job)
+            return job
+
+    async def get(self, job_id: str) -> Optional[IngestionJob]:
+        async with self.session_factory() as session:
+            return await session.get(IngestionJob, job_id)
+
+    async def list_jobs(self, status: Optional[str] = None, limit: int = 100) -> List[IngestionJob]:
+        async with self.session_factory() as session:
+            query = select(IngestionJob).order_by(IngestionJob.created_at.desc()).limit(limit)
+            if status:
+                query = query.where(IngestionJob.status == status)
+            result = await session.execute(query)
+            return list(result.scalars().all())
+
+
+class IngestionWorkerPool:
+    """
+    Runs `workers` claim-and-ingest loops in the current process.
+    index_writer=False (standalone worker processes) only prepares jobs for the writer: their
+    in-memory indexes would be private copies, and saving them would drop the writer's chunks.
+    """
+
+    def __init__(self, queue: IngestionQueue, retrieval_service=None, index_writer: bool = True):
+        self.queue = queue
+        self.retrieval_service = retrieval_service
+        self.index_writer = index_writer
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        # Databases holding unsaved batch ingestions from this process
+        self._unsaved_databases: set = set()
+        self.host_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def start(self, workers: Optional[int] = None, retrieval_service=None):
+        workers = settings.INGESTION_WORKERS if workers is None else workers
+        if retrieval_service is not None:
+            self.retrieval_service = retrieval_service
+        if self.retrieval_service is None:
+            from backend.services.retrieval.semantic_search import get_retrieval_service
+            self.retrieval_service = get_retrieval_service()
+        self._stopping.clear()
+        if not self.index_writer:
+            scopes = [CLAIM_PREPARE] * workers
+        else:
+            # Batches a previous writer indexed but never saved are gone from memory
+            await self.queue.requeue_unsaved()
+            # Without extraction loops the writer still indexes what standalone workers prepared
+            scopes = [CLAIM_ALL] * workers or [CLAIM_INDEX]
+        for i, scope in enumerate(scopes):
+            worker_id = f"{self.host_id}:{i}"
+            self._tasks.append(asyncio.create_task(self._worker_loop(worker_id, scope)))
+        role = "index writer" if self.index_writer else "preparing for the index writer"
+        logger.info(f"Ingestion worker pool started with {len(scopes)} workers on {self.host_id} ({role})")
+
+    async def stop(self):
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker_loop(self, worker_id: str, scope: str = CLAIM_ALL):
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(worker_id, scope)
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_id} failed to claim a job: {e}")
+                job = None
+            if job is None:
+                # Batch members finalized by another process still need this process's adds on disk
+                await self._flush_unsaved()
+                if self.index_writer:
+                    await self.finalize_ready_batches()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=settings.INGESTION_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    async def run_job(self, job: IngestionJob):
+        """Runs one claimed job to completion, retry or cancellation."""
+        if job.kind == DELETE:
+            return await self._run_delete(job)
+        logger.info(f"Running ingestion job {job.id} for {job.filename} (attempt {job.attempts}/{job.max_attempts})")
+        if not self.index_writer:
+            return await self._run_prepare(job)
+        task = asyncio.create_task(self._ingest(job))
+        watchdog = asyncio.create_task(self._watch_cancel(job.id, task))
+        try:
+            count, chunks, embeddings = await task
+        except asyncio.CancelledError:
+            if self._stopping.is_set():
+                # Shutting down: leave the job 'running' so it is reclaimed once its heartbeat goes stale
+                raise
+            await self.queue.cancelled(job.id)
+            logger.info(f"Ingestion job {job.id} cancelled")
+        except Exception as e:
+            await self.queue.fail(job.id, str(e))
+        else:
+            if not count:
+                await self.queue.fail(job.id, "no chunks were indexed")
+            else:
+                try:
+                    await post_ingestion_pipeline(
+                        job.filename, chunks, embeddings, job.service, job.file_path,
+                        sync_shared=job.batch_id is None
+                    )
+                except Exception as e:
+                    # The document is already searchable; a failed backup must not re-run ingestion
+                    logger.error(f"Post-ingestion pipeline failed for {job.filename}: {e}")
+                if job.batch_id:
+                    # Succeeds in complete_batch(), once finalize_batch() has saved the indexes
+                    self._unsaved_databases.add(job.database)
+                    await self.queue.mark_indexed(job.id)
+                else:
+                    await self.queue.complete(job.id)
+        finally:
+            watchdog.cancel()
+
+        if job.batch_id:
+            await self.finalize_if_done(job.batch_id)
+
+    async def finalize_if_done(self, batch_id: str):
+        """Finalizes the batch if its last outstanding job just finished or was cancelled."""
+        if await self.queue.claim_batch_finalization(batch_id):
+            await self.finalize_batch(batch_id)
+
+    async def finalize_ready_batches(self):
+        """
+        Finalizes batches nobody finished: the last job was cancelled while queued, or failed
+        for good on a standalone worker, so no index-writing run_job ended the batch.
+        """
+        try:
+            for batch_id in await self.queue.finalizable_batches():
+                await self.finalize_if_done(batch_id)
+        except Exception as e:
+            logger.error(f"Batch finalization sweep failed: {e}")
+
+    async def _run_delete(self, job: IngestionJob):
+        """Removes the document's chunks from this process's indexes, then saves and syncs them."""
+        logger.info(f"Running index delete {job.id} for {job.filename} from {job.database}")
+        try:
+            await self.retrieval_service.delete_document(job.filename, database=job.database)
+        except Exception as e:
+            await self.queue.fail(job.id, str(e))
+        else:
+            await self.queue.complete(job.id)
+
+    async def _run_prepare(self, job: IngestionJob):
+        """Extracts, chunks and embeds into the chunk cache, then queues the job for the index writer."""
+        task = asyncio.create_task(self._prepare(job))
+        watchdog = asyncio.create_task(self._watch_cancel(job.id, task))
+        try:
+            count = await task
+        except asyncio.CancelledError:
+            if self._stopping.is_set():
+                raise
+            await self.queue.cancelled(job.id)
+            logger.info(f"Ingestion job {job.id} cancelled")
+        except Exception as e:
+            await self.queue.fail(job.id, str(e))
+        else:
+            if count:
+                await self.queue.mark_prepared(job.id)
+                logger.info(f"Prepared {job.filename} ({count} chunks) for the index writer")
+            else:
+                await self.queue.fail(job.id, "no chunks were extracted")
+        finally:
+            watchdog.cancel()
+
+    async def finalize_batch(self, batch_id: str):
+        """Persists the indexes and syncs the shared index/registry once for a whole bulk upload."""
+        from backend.services.s3_sync import s3_sync_manager
+
+        summary = await self.queue.batch_summary(batch_id)
+        self._unsaved_databases.update(summary["databases"])
+        if not await self._flush_unsaved():
+            # Members stay 'indexed'; the idle sweep finalizes the batch again
+            await self.queue.release_batch_finalization(batch_id)
+            logger.error(f"Batch {batch_id} not finalized: its indexes could not be saved")
+            return
+        await self.queue.complete_batch(batch_id)
+        try:
+            await s3_sync_manager.sync_shared_to_s3()
+        except Exception as s3e:
+            logger.warning(f"S3 sync failed for batch {batch_id} (non-blocking): {s3e}")
+        logger.info(f"[PIPELINE] Batch {batch_id} finalized: {summary['status_counts']}")
+
+    async def _flush_unsaved(self) -> bool:
+        """Saves every database with unsaved batch adds; returns False if any save failed (kept for a retry)."""
+        failed = set()
+        while self._unsaved_databases:
+            database = self._unsaved_databases.pop()
+            try:
+                await self.retrieval_service.persist(database)
+            except Exception as e:
+                logger.error(f"Failed to persist {database} after batch ingestion: {e}")
+                failed.add(database)
+        self._unsaved_databases.update(failed)
+        return not failed
+
+    async def _ingest(self, job: IngestionJob):
+        async def on_progress(stage: str, progress: Dict[str, Any]):
+            if await self.queue.update_progress(job.id, stage, progress):
+                raise asyncio.CancelledError()
+
+        async with self.queue.session_factory() as session:
+            return await self.retrieval_service.ingest_document(
+                job.file_path, job.filename, job.database, job.document_id, session,
+                on_progress=on_progress,
+                persist=job.batch_id is None
+            )
+
+    async def _prepare(self, job: IngestionJob) -> int:
+        async def on_progress(stage: str, progress: Dict[str, Any]):
+            if await self.queue.update_progress(job.id, stage, progress):
+                raise asyncio.CancelledError()
+
+        return await self.retrieval_service.prepare_document(job.file_path, job.filename, on_progress=on_progress)
+
+    async def _watch_cancel(self, job_id: str, task: asyncio.Task):
+        """Heartbeats while a stage runs (OCR can go minutes without a batch) and honours cancellation."""
+        while not task.done():
+            await asyncio.sleep(settings.INGESTION_POLL_SECONDS)
+            try:
+                if await self.queue.heartbeat(job_id):
+                    task.cancel()
+                    return
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for ingestion job {job_id}: {e}")
+
+
+async def update_system_prompt_with_new_doc(filename: str, service: str):
+    """
+    Updates the LLM service knowledge of valid sources
+    every time a new document is added.
+    """
+    from backend.services.llm_service import llm_service
+    from backend.utils.source_validator import get_valid_sources
+
+    valid_sources = get_valid_sources()
+
+    # Rebuild the valid sources section of the prompt
+    # Update LLM service knowledge
+    llm_service.update_valid_sources(valid_sources)
+
+    logger.info(f"[PIPELINE] System prompt updated. Valid sources: {len(valid_sources)} documents")
+
+
+async def post_ingestion_pipeline(
+    filename: str,
+    chunks: list,
+    embeddings,
+    service: str,
+    file_path: str,
+    sync_shared: bool = True
+):
+    """
+    Runs automatically after every document upload.
+    Handles registration, metadata, system prompt update, and S3 backup.
+    sync_shared=False leaves the shared index/registry sync to the end of a batch.
+    """
+    from backend.utils.source_validator import register_document
+    from backend.utils.service_detection import get_display_name
+    from backend.services.s3_sync import s3_sync_manager
+
+    # Step 1: Register in registry
+    register_document(filename, service)
+
+    # Step 2: Tag all chunks with correct metadata
+    # (This assumes chunks is a list of Document objects from langchain)
+    for i, chunk in enumerate(chunks):
+        if hasattr(chunk, 'metadata'):
+            chunk.metadata.update({
+                "source":    filename,
+                "service":   service,
+                "doc_type":  "official_aws_doc",
+                "chunk_index": i,
+                "file_type": filename.rsplit('.', 1)[-1].lower(),
+                "display_name": get_display_name(service)
+            })
+
+    # Step 4: Update system prompt with new doc list
+    await update_system_prompt_with_new_doc(filename, service)
+
+    # Step 5: Sync updated index and document to S3
+    if sync_shared:
+        try:
+            await s3_sync_manager.sync_index_to_s3()
+            logger.info(f"S3 sync complete after {filename} upload")
+        except Exception as s3e:
+            logger.warning(f"S3 sync failed (non-blocking): {s3e}")
+
+    # Trigger S3 sync in background (non-blocking)
+    async def run_sync_and_cleanup():
+        try:
+            # Phase 1: Upload
+            await s3_sync_manager.sync_all_after_upload(
+                filename=filename,
+                service=service,
+                file_path=file_path,
+                chunks=chunks,
+                embeddings=embeddings,
+                sync_shared=sync_shared
+            )
+            # Phase 2: Cleanup (Optional/Safe)
+            # We wait a bit to ensure everything is settled
+            await asyncio.sleep(2)
+            await s3_sync_manager.verify_and_cleanup_local(file_path, service, filename)
+        except Exception as e:
+            logger.error(f"S3 Sync/Cleanup pipeline failed for {filename}: {e}")
+
+    asyncio.create_task(run_sync_and_cleanup())
+
+    display = get_display_name(service)
+    logger.info(f"[PIPELINE] ✅ {filename} → {display} ({len(chunks)} chunks) — Scheduled for S3 & Cleanup")
+
+
+# Global queue and in-process worker pool
+ingestion_queue = IngestionQueue()
+ingestion_workers = IngestionWorkerPool(ingestion_queue)
@@ -0,0 +1,199 @@
+"""
+LLM Request Scheduler
+- Routes every LiteLLM completion through per-class priority queues
+- Interactive chat beats the LLM judge, which beats ingestion vision calls
+- Bounds in-flight requests per model and across the Ollama server
+- Records queue-time metrics and sheds load when a class queue is full
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+import litellm
+from loguru import logger
+
+from backend.core.config import settings
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_JUDGE = 1
+PRIORITY_INGESTION = 2
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_JUDGE: "judge",
+    PRIORITY_INGESTION: "ingestion",
+}
+
+
+class LLMOverloadedError(Exception):
+    """Raised when a request is shed because its priority queue is full."""
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        completion_fn: Optional[Callable[..., Any]] = None,
+        max_concurrency_per_model: Optional[int] = None,
+        max_concurrency_total: Optional[int] = None,
+        queue_limits: Optional[Dict[int, int]] = None,
+    ):
+        # Any coroutine with the litellm.acompletion signature (see FakeLLMBackend)
+        self.completion_fn = completion_fn or litellm.acompletion
+        self.max_concurrency_per_model = max_concurrency_per_model or settings.LLM_MAX_CONCURRENCY_PER_MODEL
+        self.max_concurrency_total = max_concurrency_total or settings.LLM_MAX_CONCURRENCY_TOTAL
+        self.queue_limits = queue_limits or {
+            PRIORITY_INTERACTIVE: settings.LLM_QUEUE_LIMIT_INTERACTIVE,
+            PRIORITY_JUDGE: settings.LLM_QUEUE_LIMIT_JUDGE,
+            PRIORITY_INGESTION: settings.LLM_QUEUE_LIMIT_INGESTION,
+        }
+
+        self._seq = itertools.count()
+        self._waiters: List[tuple] = []  # (priority, seq, model, future)
+        self._in_flight: Dict[str, int] = {}
+        self._in_flight_total = 0
+
+        self._queue_times = {p: deque(maxlen=1000) for p in PRIORITY_NAMES}
+        self._counters = {
+            p: {"submitted": 0, "completed": 0, "failed": 0, "shed": 0}
+            for p in PRIORITY_NAMES
+        }
+
+    async def submit(self, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> Any:
+        """Queues a completion request and runs it once a slot is free."""
+        model = kwargs["model"]
+        counters = self._counters[priority]
+        counters["submitted"] += 1
+
+        enqueued_at = time.monotonic()
+        await self._acquire(model, priority)
+        self._queue_times[priority].append(time.monotonic() - enqueued_at)
+
+        try:
+            response = await self.completion_fn(**kwargs)
+            counters["completed"] += 1
+            return response
+        except Exception:
+            counters["failed"] += 1
+            raise
+        finally:
+            self._release(model)
+
+    async def _acquire(self, model: str, priority: int):
+        """Takes a concurrency slot for `model`, waiting in priority order if none is free."""
+        if not self._waiters and self._has_capacity(model):
+            self._grant(model)
+            return
+
+        queued = sum(1 for p, _, _, f in self._waiters if p == priority and not f.done())
+        if queued >= self.queue_limits.get(priority, 0):
+            self._counters[priority]["shed"] += 1
+            logger.warning(
+                f"LLM scheduler shedding {PRIORITY_NAMES[priority]} request for {model} "
+                f"({queued} already queued)"
+            )
+            raise LLMOverloadedError(f"LLM queue for {PRIORITY_NAMES[priority]} requests is full")
+
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append((priority, next(self._seq), model, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if future.done() and not future.cancelled():
+                self._release(model)
+            raise
+
+    def _release(self, model: str):
+        self._in_flight[model] -= 1
+        self._in_flight_total -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hands free slots to the highest-priority waiters whose model has capacity."""
+        self._waiters = [w for w in self._waiters if not w[3].done()]
+        for entry in sorted(self._waiters):
+            if self._in_flight_total >= self.max_concurrency_total:
+                break
+            _, _, model, future = entry
+            if not self._has_capacity(model):
+                continue
+            self._grant(model)
+            self._waiters.remove(entry)
+            future.set_result(None)
+
+    def _has_capacity(self, model: str) -> bool:
+        return (
+            self._in_flight_total < self.max_concurrency_total
+            and self._in_flight.get(model, 0) < self.max_concurrency_per_model
+        )
+
+    def _grant(self, model: str):
+        self._in_flight[model] = self._in_flight.get(model, 0) + 1
+        self._in_flight_total += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Returns queue depth, throughput counters and queue-time percentiles per class."""
+        classes = {}
+        for priority, name in PRIORITY_NAMES.items():
+            samples = sorted(self._queue_times[priority])
+            classes[name] = {
+                **self._counters[priority],
+                "queued": sum(1 for p, _, _, f in self._waiters if p == priority and not f.done()),
+                "queue_time_p50_ms": _percentile_ms(samples, 0.50),
+                "queue_time_p95_ms": _percentile_ms(samples, 0.95),
+                "queue_time_max_ms": _percentile_ms(samples, 1.0),
+            }
+        return {
+            "in_flight_total": self._in_flight_total,
+            "in_flight_per_model": {m: n for m, n in self._in_flight.items() if n},
+            "classes": classes,
+        }
+
+
+def _percentile_ms(sorted_samples: List[float], q: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, int(q * len(sorted_samples)))
+    return round(sorted_samples[idx] * 1000, 2)
+
+
+class FakeLLMBackend:
+    """
+    Stand-in for litellm.acompletion, for tests and offline development.
+    Returns LiteLLM-shaped responses and records every call it receives.
+    """
+    def __init__(
+        self,
+        responses: Optional[Dict[str, str]] = None,
+        latency: Any = 0.0,
+        failing_models: Optional[List[str]] = None,
+    ):
+        self.responses = responses or {}
+        self.latency = latency  # seconds, or {model: seconds}
+        self.failing_models = set(failing_models or [])
+        self.calls: List[Dict[str, Any]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, model: str, messages: List[Dict[str, Any]], **kwargs) -> Any:
+        self.calls.append({"model": model, "messages": messages, **kwargs})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay = self.latency.get(model, 0.0) if isinstance(self.latency, dict) else self.latency
+            if delay:
+                await asyncio.sleep(delay)
+            if model in self.failing_models:
+                raise RuntimeError(f"Fake backend failure for {model}")
+            content = self.responses.get(model, f"[{model}] ok")
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        finally:
+            self.in_flight -= 1
+
+
+# Global singleton shared by every LLMService instance
+llm_scheduler = LLMScheduler()
@@ -1,18 +1,29 @@
-import litellm
 import asyncio
 import logging
 import os
 import json
 import base64
 import re
+import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 from backend.core.config import settings
-from backend.utils.source_validator import validate_source, get_valid_sources
+from backend.services.llm_scheduler import (
+    llm_scheduler,
+    LLMOverloadedError,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_JUDGE,
+    PRIORITY_INGESTION,
+)
+from backend.services.circuit_breaker import circuit_breakers, CircuitOpenError
+from backend.utils.source_validator import validate_source, rewrite_fake_citations
+from backend.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
 class LLMService:
     def __init__(self):
         # LiteLLM configuration
@@ -27,40 +38,117 @@ class LLMService:
         ]
         
         self._valid_sources = []
+
+        # Every completion is dispatched through the shared priority scheduler
+        self.scheduler = llm_scheduler
+        self.breakers = circuit_breakers
         
         # Verify Ollama connection and detect models (optional but good for log)
         logger.info(f"LLM initialized. Primary Text: {self.text_model}, Vision: {self.vision_model}")
 
-    async def _call_llm(self, messages: List[Dict[str, str]], model: Optional[str] = None, json_mode: bool = False) -> str:
-        """Unified LLM call via LiteLLM with fallback logic."""
+    async def _call_llm(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        json_mode: bool = False,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """
+        Unified LLM call via the LLM scheduler with hedged fallback.
+        Models with an open circuit are skipped. If the running model has not
+        answered within its usual latency percentile, the next candidate is
+        started in parallel and the first successful answer wins.
+        """
         target_model = model or self.text_model
+        candidates = [target_model] + [fb for fb in self.fallbacks if fb != target_model]
         
+        pending: Dict[asyncio.Task, str] = {}
+        last_error: Optional[Exception] = None
+
+        def launch_next() -> Optional[str]:
+            while candidates:
+                candidate = candidates.pop(0)
+                if not self.breakers.get(candidate).allow_request():
+                    logger.info(f"Skipping {candidate}: circuit open")
+                    continue
+                # Primary keeps the full timeout, fallbacks get a shorter one
+                timeout = 60 if candidate == target_model else 30
+                task = asyncio.create_task(
+                    self._attempt(candidate, messages, json_mode, priority, timeout)
+                )
+                pending[task] = candidate
+                return candidate
+            return None
+
+        newest = launch_next()
         try:
-            response = await litellm.acompletion(
-                model=target_model,
+            while pending:
+                hedge_after = self.breakers.get(newest).hedge_delay() if candidates else None
+                done, _ = await asyncio.wait(
+                    pending.keys(), timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                if not done:
+                    hedged = launch_next()
+                    if hedged:
+                        logger.warning(f"{newest} slower than {hedge_after:.1f}s. Hedging with {hedged}...")
+                        newest = hedged
+                    continue
+                
+                for task in done:
+                    failed_model = pending.pop(task)
+                    try:
+                        return task.result()
+                    except LLMOverloadedError:
+                        # Shed requests must not be retried against the same Ollama server
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Error with model {failed_model}: {e}. Trying fallbacks...")
+                        last_error = e
+                
+                # Everything in flight failed, fail over immediately
+                if not pending:
+                    newest = launch_next() or newest
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if last_error:
+            raise last_error
+        raise CircuitOpenError(f"No LLM model available for {target_model}: all circuits open")
+
+    async def _attempt(self, model: str, messages: List[Dict[str, str]], json_mode: bool, priority: int, timeout: int) -> str:
+        """Single scheduled completion that reports its outcome to the model's circuit breaker."""
+        breaker = self.breakers.get(model)
+        start = time.monotonic()
+        try:
+            response = await self.scheduler.submit(
+                priority,
+                model=model,
                 messages=messages,
                 api_base=self.base_url,
                 temperature=0,
                 response_format={"type": "json_object"} if json_mode else None,
-                timeout=60
+                timeout=timeout
             )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.warning(f"Error with primary model {target_model}: {e}. Trying fallbacks...")
-            for fb in self.fallbacks:
-                try:
-                    response = await litellm.acompletion(
-                        model=fb,
-                        messages=messages,
-                        api_base=self.base_url,
-                        temperature=0,
-                        timeout=30
-                    )
-                    return response.choices[0].message.content
-                except:
-                    continue
-            
-            raise e
+        except asyncio.CancelledError:
+            elapsed = time.monotonic() - start
+            if elapsed >= breaker.hedge_delay():
+                # Lost the hedge race after stalling past its usual latency: a slow call, so a
+                # model that always stalls still opens its circuit
+                breaker.record_failure(elapsed)
+            else:
+                # Cancelled before it was overdue; that says nothing about the model's health
+                breaker.release_probe()
+            raise
+        except LLMOverloadedError:
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure(time.monotonic() - start)
+            raise
+        breaker.record_success(time.monotonic() - start)
+        return response.choices[0].message.content
 
     async def describe_image(self, image_path: str) -> str:
         """Describes an image using Ollama Vision via LiteLLM."""
@@ -81,7 +169,7 @@ class LLMService:
                 }
             ]
             
-            return await self._call_llm(messages, model=self.vision_model)
+            return await self._call_llm(messages, model=self.vision_model, priority=PRIORITY_INGESTION)
         except Exception as e:
             logger.error(f"Image description failed: {e}")
             return f"Error describing image: {str(e)}"
@@ -121,7 +209,7 @@ Rules:
 Return ONLY a single integer (1, 2, 3, 4, 5)."""
         
         try:
-            res = await self._call_llm([{"role": "user", "content": prompt}])
+            res = await self._call_llm([{"role": "user", "content": prompt}], priority=PRIORITY_JUDGE)
             score = int(''.join(filter(str.isdigit, res[:5])))
             return score
         except:
@@ -141,7 +229,7 @@ Return ONLY a single integer (1, 2, 3, 4, 5)."""
         
         for word in words:
             # Clean symbols for better matching
-            clean_word = re.sub(r'[^\w\s]', '', word)
+            clean_word = _PUNCTUATION_RE.sub('', word)
             matched = fuzzy_match_service(clean_word)
             if matched and matched != clean_word.lower():
                 logger.info(f"Query correction: '{word}' -> '{matched}'")
@@ -156,33 +244,23 @@ Return ONLY a single integer (1, 2, 3, 4, 5)."""
         
         # 0. Preprocess query to fix typos
         original_query = query
-        query = self.preprocess_query(query)
-        system_prompt = self.build_rag_prompt(query, context, sources, service)
+        with span("prompt_build", context_chars=len(context)):
+            query = self.preprocess_query(query)
+            system_prompt = self.build_rag_prompt(query, context, sources, service)
         
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": f"Query: {query}\n\nInsights: {learned_insights}"}
         ]
         
-        answer = await self._call_llm(messages)
+        with span("generation", model=self.text_model):
+            answer = await self._call_llm(messages)
         
-        # Validate and correct the source citation
-        valid_sources = get_valid_sources()
-        validated_source = validate_source(
-            cited_source=answer,
-            valid_sources=valid_sources,
-            service=service
-        )
+        # Validate and correct the source citation (matchers are compiled once per registry version)
+        validated_source = validate_source(cited_source=answer, service=service)
 
         # Force replace any fake source in the answer
-        fake_sources = [
-            "aws_lambda.md", "lambda-limits.md", 
-            "aws-docs.pdf", "documentation.pdf",
-            "aws_s3.md", "aws_ec2.md", "unknown"
-        ]
-        for fake in fake_sources:
-            if fake in answer:
-                answer = answer.replace(fake, validated_source)
+        answer = rewrite_fake_citations(answer, validated_source)
 
         # Ensure Source is present and validated
         if "Source:" not in answer:
@@ -190,7 +268,9 @@ Return ONLY a single integer (1, 2, 3, 4, 5)."""
         
         # 2. LLM Judge Check
         if settings.ENABLE_LLM_JUDGE:
-            score = await self.evaluate_answer(query, context, answer)
+            with span("judge") as s:
+                score = await self.evaluate_answer(query, context, answer)
+                s.set(score=score)
             logger.info(f"LLM Judge Score: {score}")
             
             if score < 3:
@@ -198,13 +278,12 @@ Return ONLY a single integer (1, 2, 3, 4, 5)."""
                 strict_prompt = "STRICT: Your previous answer was ungrounded. Use ONLY the provided context snippets. Be precise. No hallucinations."
                 messages.append({"role": "assistant", "content": answer})
                 messages.append({"role": "user", "content": strict_prompt})
-                answer = await self._call_llm(messages)
+                with span("regeneration", model=self.text_model):
+                    answer = await self._call_llm(messages)
                 
                 # Re-validate after regeneration
-                validated_source = validate_source(cited_source=answer, valid_sources=valid_sources, service=service)
-                for fake in fake_sources:
-                    if fake in answer:
-                        answer = answer.replace(fake, validated_source)
+                validated_source = validate_source(cited_source=answer, service=service)
+                answer = rewrite_fake_citations(answer, validated_source)
                 if "Source:" not in answer:
                     answer = f"{answer}\n\nSource: {validated_source}"
         
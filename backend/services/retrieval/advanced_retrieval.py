@@ -35,13 +35,28 @@ class AdvancedRetrieval:
             logger.error(f"Advanced search failed: {e}")
             return []
 
-    async def add_documents(self, documents: List[Dict[str, Any]], database: str = "faiss"):
+    async def add_documents(self, documents: List[Dict[str, Any]], database: str = "faiss", persist: bool = True):
         """Proxies document addition to hybrid search."""
         try:
-            await self.hybrid_search.add_documents(documents, database=database)
+            await self.hybrid_search.add_documents(documents, database=database, persist=persist)
         except Exception as e:
             logger.error(f"AdvancedRetrieval add_documents failed: {e}")
 
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings, database: str = "faiss", persist: bool = True):
+        """Proxies pre-embedded document addition to hybrid search."""
+        try:
+            await self.hybrid_search.add_embeddings(documents, embeddings, database=database, persist=persist)
+        except Exception as e:
+            logger.error(f"AdvancedRetrieval add_embeddings failed: {e}")
+
+    async def persist(self, database: str = "faiss"):
+        """Proxies deferred index persistence to hybrid search."""
+        try:
+            await self.hybrid_search.persist(database=database)
+        except Exception as e:
+            logger.error(f"AdvancedRetrieval persist failed: {e}")
+            raise
+
     async def delete_documents(self, filter_dict: Dict[str, Any], database: str = "faiss"):
         """Proxies document deletion to hybrid search."""
         try:
@@ -49,9 +64,32 @@ class AdvancedRetrieval:
         except Exception as e:
             logger.error(f"AdvancedRetrieval delete_documents failed: {e}")
 
-    async def add_to_all_stores(self, documents: List[Dict[str, Any]]):
+    async def add_to_all_stores(self, documents: List[Dict[str, Any]], persist: bool = True, embeddings=None):
         """Proxies batch ingestion to all stores."""
         try:
-            await self.hybrid_search.add_to_all_stores(documents)
+            await self.hybrid_search.add_to_all_stores(documents, persist=persist, embeddings=embeddings)
         except Exception as e:
             logger.error(f"AdvancedRetrieval add_to_all_stores failed: {e}")
+            raise
+
+    async def persist_all_stores(self):
+        """Proxies deferred persistence of every store to hybrid search."""
+        try:
+            await self.hybrid_search.persist_all_stores()
+        except Exception as e:
+            logger.error(f"AdvancedRetrieval persist_all_stores failed: {e}")
+            raise
+
+    async def reload_indexes(self):
+        """Proxies the index hot swap to hybrid search."""
+        try:
+            await self.hybrid_search.reload_indexes()
+        except Exception as e:
+            logger.error(f"AdvancedRetrieval reload_indexes failed: {e}")
+
+    async def export_snapshot(self):
+        """Proxies the serving snapshot export to hybrid search."""
+        try:
+            await self.hybrid_search.export_snapshot()
+        except Exception as e:
+            logger.error(f"AdvancedRetrieval export_snapshot failed: {e}")
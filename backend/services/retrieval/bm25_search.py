@@ -3,22 +3,71 @@ BM25 Search Service
 - Identifies and fixes syntax and logical bugs
 - Implements robust error handling with loguru
 - Replaces prints with logging
+- Thread-safe: searches share a read lock and run concurrently on the search executor;
+  ingestion, deletes and pending statistics rebuilds take the write lock, and callers run
+  the writes on the ingest executor so the event loop never waits for that lock
 """
 from rank_bm25 import BM25Okapi
 from typing import List, Dict, Any, Optional
+import functools
 import pickle
+import math
 import os
 import re
+import tempfile
+from collections import Counter
+from contextlib import contextmanager
 from loguru import logger
 from backend.core.config import settings
+from backend.utils.topic_partitions import topic_of, split_filter, matches_filter
+from backend.utils.rwlock import ReadWriteLock
+
+
+def tokenize(text: str) -> List[str]:
+    """Robust tokenization for better matching."""
+    try:
+        # Remove punctuation and split by whitespace
+        text = re.sub(r'[^\w\s]', ' ', text.lower())
+        return text.split()
+    except Exception as e:
+        logger.error(f"Tokenization error: {e}")
+        return []
+
+
+def _writing(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._rw.write():
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class BM25Index:
+    """
+    BM25 over the chunk corpus, partitioned by source_topic: a topic-filtered search scores
+    only that topic's chunks and ingesting one topic rebuilds only that topic. Unfiltered
+    searches fan out over all partitions and merge. IDF and average length are corpus-wide
+    (shared by all partitions), so scores equal those of one monolithic index.
+    The corpus itself stays in flat lists (what is saved and replicated).
+    """
     def __init__(self, index_path: Optional[str] = None):
         self.index_path = index_path or os.path.join("data", "indexes", "bm25", "bm25_index.pkl")
-        self.bm25 = None
+        self._rw = ReadWriteLock()
         self.corpus = []
         self.original_corpus = [] 
         self.metadatas = []
+        # topic -> positions in the flat lists, and topic -> BM25 over those positions
+        self._positions: Dict[str, List[int]] = {}
+        self._partitions: Dict[str, BM25Okapi] = {}
+        # topic -> document frequency per term, merged into the corpus-wide IDF
+        self._doc_counts: Dict[str, Counter] = {}
+        # Topics whose BM25 must be rebuilt before they are searched or saved
+        self._stale = set()
+        self._stats_ready = False
+        # Set when the flat lists changed wholesale and the positions must be recomputed
+        self._dirty = False
+        # True once the index was read from disk (an empty index is valid, a failed read is not)
+        self.loaded = False
         
         # Ensure directory exists
         os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
@@ -30,27 +79,49 @@ class BM25Index:
             try:
                 with open(self.index_path, "rb") as f:
                     data = pickle.load(f)
-                    self.bm25 = data.get("bm25")
                     self.corpus = data.get("corpus", [])
                     self.original_corpus = data.get("original_corpus", [])
                     self.metadatas = data.get("metadatas", [])
-                logger.info(f"BM25 index loaded from {self.index_path}")
+                    # Indexes saved before partitioning have no "partitions": all topics rebuild lazily
+                    self._partitions = dict(data.get("partitions") or {})
+                self._reindex()
+                self._stale = set(self._positions) - set(self._partitions)
+                self._rebuild_if_dirty()
+                self.loaded = True
+                logger.info(f"BM25 index loaded from {self.index_path} ({len(self._positions)} topic partitions)")
             except Exception as e:
                 logger.error(f"Failed to load BM25 index from {self.index_path}: {e}")
 
     def _tokenize(self, text: str) -> List[str]:
-        """Robust tokenization for better matching."""
-        try:
-            # Remove punctuation and split by whitespace
-            text = re.sub(r'[^\w\s]', ' ', text.lower())
-            return text.split()
-        except Exception as e:
-            logger.error(f"Tokenization error: {e}")
-            return []
+        return tokenize(text)
+
+    def _reindex(self):
+        positions: Dict[str, List[int]] = {}
+        for i, meta in enumerate(self.metadatas):
+            positions.setdefault(topic_of(meta), []).append(i)
+        self._positions = positions
+        self._partitions = {t: bm25 for t, bm25 in self._partitions.items() if t in positions}
+        self._doc_counts = {t: c for t, c in self._doc_counts.items() if t in positions}
+        self._stats_ready = False
+        self._dirty = False
+
+    @_writing
+    def clear(self):
+        self.corpus, self.original_corpus, self.metadatas = [], [], []
+        self._positions, self._partitions, self._doc_counts, self._stale = {}, {}, {}, set()
+        self._stats_ready = False
+        self._dirty = False
 
-    def add_documents(self, documents: List[Dict[str, Any]]):
-        """Adds documents to the BM25 index."""
+    @_writing
+    def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
+        """
+        Adds documents to the BM25 index.
+        BM25 statistics of the touched topics are rebuilt lazily on the next search or save, so
+        streaming ingestion does not rebuild the index once per batch.
+        """
         try:
+            self._refresh_positions()
+            start = len(self.corpus)
             new_corpus = [self._tokenize(doc["content"]) for doc in documents]
             new_original_corpus = [doc["content"] for doc in documents]
             new_metadatas = [doc["metadata"] for doc in documents]
@@ -58,107 +129,204 @@ class BM25Index:
             self.corpus.extend(new_corpus)
             self.original_corpus.extend(new_original_corpus)
             self.metadatas.extend(new_metadatas)
+            for i, meta in enumerate(new_metadatas, start):
+                topic = topic_of(meta)
+                self._positions.setdefault(topic, []).append(i)
+                self._stale.add(topic)
             
-            if self.corpus:
-                self.bm25 = BM25Okapi(self.corpus)
-            
-            with open(self.index_path, "wb") as f:
+            if persist:
+                self._persist()
+            logger.info(f"Added {len(documents)} documents to BM25 index.")
+        except Exception as e:
+            logger.error(f"Failed to add documents to BM25: {e}")
+            raise
+
+    def _drop(self, indices: List[int]):
+        """Removes these positions from the flat lists and marks their topics for a rebuild."""
+        doomed = set(indices)
+        self._stale.update(topic_of(self.metadatas[i]) for i in doomed)
+        keep = [i for i in range(len(self.metadatas)) if i not in doomed]
+        self.corpus = [self.corpus[i] for i in keep]
+        self.original_corpus = [self.original_corpus[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self._reindex()
+
+    @_writing
+    def remove_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
+        """Removes the entries matching these chunks (same content, source and chunk_index)."""
+        def key(content, meta):
+            return (content, meta.get("source"), meta.get("chunk_index"))
+
+        doomed = {key(doc["content"], doc["metadata"]) for doc in documents}
+        if not doomed:
+            return
+        self._refresh_positions()
+        indices = [i for i, meta in enumerate(self.metadatas) if key(self.original_corpus[i], meta) in doomed]
+        self._drop(indices)
+        if persist:
+            self._persist()
+        logger.info(f"Removed {len(indices)} documents from BM25 index.")
+
+    def _refresh_positions(self):
+        if self._dirty:
+            self._stale.update(topic_of(meta) for meta in self.metadatas)
+            self._reindex()
+
+    def _needs_rebuild(self) -> bool:
+        return self._dirty or bool(self._stale) or not self._stats_ready
+
+    @contextmanager
+    def _reading(self):
+        """
+        Read lock with current BM25 statistics. A pending rebuild (after ingestion) is done
+        once under the write lock; searches then only read and run concurrently.
+        """
+        while True:
+            if self._needs_rebuild():
+                with self._rw.write():
+                    self._rebuild_if_dirty()
+            with self._rw.read():
+                # A writer may have slipped in between the two locks
+                if not self._needs_rebuild():
+                    yield
+                    return
+
+    def _rebuild_if_dirty(self):
+        """Rebuilds the stale partitions, then the corpus-wide IDF/avgdl they all score with (write lock held)."""
+        self._refresh_positions()
+        if not self._stale and self._stats_ready:
+            return
+        for topic in self._stale:
+            positions = self._positions.get(topic)
+            if positions:
+                self._partitions[topic] = BM25Okapi([self.corpus[i] for i in positions])
+            else:
+                self._partitions.pop(topic, None)
+            self._doc_counts.pop(topic, None)
+        self._stale = set()
+
+        # Same formulas as BM25Okapi, over every partition
+        doc_counts = Counter()
+        for topic, bm25 in self._partitions.items():
+            if topic not in self._doc_counts:
+                self._doc_counts[topic] = Counter(term for doc in bm25.doc_freqs for term in doc)
+            doc_counts.update(self._doc_counts[topic])
+        total = sum(bm25.corpus_size for bm25 in self._partitions.values())
+        if total:
+            avgdl = sum(sum(bm25.doc_len) for bm25 in self._partitions.values()) / total
+            idf, negative = {}, []
+            for term, freq in doc_counts.items():
+                idf[term] = math.log(total - freq + 0.5) - math.log(freq + 0.5)
+                if idf[term] < 0:
+                    negative.append(term)
+            epsilon = next(iter(self._partitions.values())).epsilon
+            eps = epsilon * (sum(idf.values()) / len(idf)) if idf else 0
+            for term in negative:
+                idf[term] = eps
+            for bm25 in self._partitions.values():
+                bm25.idf, bm25.avgdl = idf, avgdl
+        self._stats_ready = True
+
+    def save(self):
+        """Rebuilds pending BM25 statistics and writes the index to disk."""
+        with self._reading():
+            self._write()
+
+    def _persist(self):
+        """save() for callers already holding the write lock."""
+        self._rebuild_if_dirty()
+        self._write()
+
+    def _write(self):
+        tmp_path = None
+        try:
+            # Write-then-rename so readers (and S3 pulls) never see a half-written pickle; concurrent
+            # saves each get their own temp file
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.index_path), prefix=f".{os.path.basename(self.index_path)}.", suffix=".tmp"
+            )
+            with os.fdopen(fd, "wb") as f:
                 pickle.dump({
-                    "bm25": self.bm25,
+                    "partitions": self._partitions,
                     "corpus": self.corpus,
                     "original_corpus": self.original_corpus,
                     "metadatas": self.metadatas
                 }, f)
-            logger.info(f"Added {len(documents)} documents to BM25 index.")
+            os.replace(tmp_path, self.index_path)
         except Exception as e:
-            logger.error(f"Failed to add documents to BM25: {e}")
+            logger.error(f"Failed to save BM25 index to {self.index_path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def snapshot_rows(self) -> Dict[str, Any]:
+        """Corpus plus corpus-wide BM25 statistics, for a memory-mapped serving snapshot."""
+        with self._reading():
+            stats = next(iter(self._partitions.values()), None)
+            if stats is None:
+                return {"tokens": []}
+            return {
+                "tokens": list(self.corpus),
+                "contents": list(self.original_corpus),
+                "metadatas": list(self.metadatas),
+                "idf": stats.idf,
+                "avgdl": stats.avgdl,
+                "k1": stats.k1,
+                "b": stats.b
+            }
 
     def search(self, query: str, top_k: int = 20, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-        """Searches the BM25 index with optional filtering."""
+        """
+        Searches the BM25 index with optional filtering.
+        A source_topic filter searches only those topic partitions; otherwise all partitions
+        are searched and merged by score.
+        """
         try:
-            if not self.bm25 or not self.corpus:
-                return []
-                
             tokenized_query = self._tokenize(query)
             if not tokenized_query:
                 return []
 
-            scores = self.bm25.get_scores(tokenized_query)
-            
-            # Apply filter if provided
-            candidate_indices = []
-            for i, meta in enumerate(self.metadatas):
-                if filter:
-                    match = True
-                    for key, value in filter.items():
-                        actual_meta = meta.get(key)
-                        if isinstance(value, list):
-                            if actual_meta not in value:
-                                match = False
-                                break
-                        elif actual_meta != value:
-                            match = False
-                            break
-                    if not match:
+            with self._reading():
+                if not self.corpus:
+                    return []
+                topics, rest = split_filter(filter)
+                candidate_scores = []
+                for topic in (self._positions if topics is None else topics):
+                    bm25 = self._partitions.get(topic)
+                    if bm25 is None:
                         continue
-                
-                if scores[i] > 0:
-                    candidate_indices.append(i)
-            
-            if not candidate_indices:
-                return []
-                
-            # Sort only among candidates
-            candidate_scores = [(i, scores[i]) for i in candidate_indices]
-            candidate_scores.sort(key=lambda x: x[1], reverse=True)
-            
-            results = []
-            for i, score in candidate_scores[:top_k]:
-                content = self.original_corpus[i] if i < len(self.original_corpus) else " ".join(self.corpus[i])
-                results.append({
-                    "content": content,
-                    "metadata": self.metadatas[i],
-                    "score": float(score)
-                })
-            return results
+                    scores = bm25.get_scores(tokenized_query)
+                    for i, score in zip(self._positions[topic], scores):
+                        if score > 0 and (not rest or matches_filter(self.metadatas[i], rest)):
+                            candidate_scores.append((i, score))
+
+                if not candidate_scores:
+                    return []
+
+                candidate_scores.sort(key=lambda x: x[1], reverse=True)
+
+                results = []
+                for i, score in candidate_scores[:top_k]:
+                    content = self.original_corpus[i] if i < len(self.original_corpus) else " ".join(self.corpus[i])
+                    results.append({
+                        "content": content,
+                        "metadata": self.metadatas[i],
+                        "score": float(score)
+                    })
+                return results
         except Exception as e:
             logger.error(f"BM25 search failed: {e}")
             return []
 
-    async def delete_documents(self, filter_dict: Dict[str, Any]):
+    @_writing
+    def delete_documents(self, filter_dict: Dict[str, Any]):
         """Delete documents from BM25 index based on metadata."""
         try:
-            indices_to_delete = []
-            for i, meta in enumerate(self.metadatas):
-                match = True
-                for key, value in filter_dict.items():
-                    if meta.get(key) != value:
-                        match = False
-                        break
-                if match:
-                    indices_to_delete.append(i)
-            
+            self._refresh_positions()
+            indices_to_delete = [i for i, meta in enumerate(self.metadatas) if matches_filter(meta, filter_dict)]
             if indices_to_delete:
-                # Delete in reverse order to maintain indices
-                for i in sorted(indices_to_delete, reverse=True):
-                    if i < len(self.corpus): self.corpus.pop(i)
-                    if i < len(self.original_corpus): self.original_corpus.pop(i)
-                    if i < len(self.metadatas): self.metadatas.pop(i)
-                
-                # Rebuild index
-                if self.corpus:
-                    self.bm25 = BM25Okapi(self.corpus)
-                else:
-                    self.bm25 = None
-                
-                # Save
-                with open(self.index_path, "wb") as f:
-                    pickle.dump({
-                        "bm25": self.bm25,
-                        "corpus": self.corpus,
-                        "original_corpus": self.original_corpus,
-                        "metadatas": self.metadatas
-                    }, f)
+                self._drop(indices_to_delete)
+                self._persist()
                 logger.info(f"Deleted {len(indices_to_delete)} documents from BM25 matching {filter_dict}")
         except Exception as e:
             logger.error(f"Failed to delete documents from BM25: {e}")
@@ -1,113 +1,274 @@
+"""
+Bootstrap Sync
+- Diffs the S3 document listing against every Document row in a single query
+- Warm-starts from the S3 chunk/embedding artifacts when they match the document bytes,
+  the current chunker and the embedding model (no download, OCR or inference)
+- Otherwise pipelines download -> extract -> index with bounded concurrency per stage
+- Indexes with deferred persistence and saves every store once at the end; documents are marked
+  completed (with their S3 ETag) only after that save, so a crash mid-bootstrap re-syncs them
+- Exposes progress counters for the API while it runs
+"""
 import asyncio
 import os
+import time
 from loguru import logger
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from backend.core.config import settings
-from backend.services.s3_sync import s3_sync_manager
-from backend.services.retrieval.semantic_search import RetrievalService
 from backend.utils.service_detection import get_service_from_filename
+from backend.utils.chunk_artifacts import chunks_reusable, embeddings_reusable, records_to_chunks
 from backend.models.database import AsyncSessionLocal
 from sqlalchemy import select
 from backend.models.models import Document
 
 class BootstrapSync:
-    def __init__(self):
-        self.retrieval_service = RetrievalService()
+    def __init__(self, retrieval_service=None, s3_manager=None, session_factory=None):
+        self._retrieval_service = retrieval_service
+        self._s3_manager = s3_manager
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.progress: Dict[str, Any] = {"state": "idle"}
+
+    @property
+    def retrieval_service(self):
+        # Lazy: loading the embedding model and indexes is not needed when S3 is disabled
+        if self._retrieval_service is None:
+            from backend.services.retrieval.semantic_search import get_retrieval_service
+            self._retrieval_service = get_retrieval_service()
+        return self._retrieval_service
+
+    @property
+    def s3(self):
+        if self._s3_manager is None:
+            from backend.services.s3_sync import s3_sync_manager
+            self._s3_manager = s3_sync_manager
+        return self._s3_manager
+
+    def get_progress(self) -> Dict[str, Any]:
+        progress = dict(self.progress)
+        if progress.get("started_at"):
+            end = progress.get("finished_at") or time.time()
+            progress["elapsed_seconds"] = round(end - progress["started_at"], 1)
+        return progress
+
+    def _bump(self, counter: str, delta: int = 1):
+        self.progress[counter] = self.progress.get(counter, 0) + delta
 
     async def run_bootstrap_sync(self):
         """Main entry point for synchronizing S3 with vector databases."""
-        if not s3_sync_manager.enabled:
+        if not self.s3.enabled:
             logger.warning("Bootstrap Sync: S3 not enabled. Skipping.")
+            self.progress = {"state": "disabled"}
             return
 
         logger.info("Starting Bootstrap Synchronization with S3...")
+        self.progress = {"state": "listing", "started_at": time.time()}
 
         try:
             # 1. Pull latest registry from S3 to ensure we have the most recent state
-            await s3_sync_manager.pull_registry_from_s3()
-            
-            # 2. List all documents in the bucket
-            s3_docs = await self._list_s3_documents()
-            if not s3_docs:
-                logger.info("No documents found in S3 bucket.")
+            await self.s3.pull_registry_from_s3()
+
+            # 2. List all documents in the bucket and diff against the DB in one pass
+            s3_docs = [
+                d for d in await self._list_s3_documents()
+                if d["filename"] != ".gitkeep" and not d["filename"].startswith(".")
+            ]
+            to_sync = await self._diff_against_db(s3_docs)
+            self.progress.update({
+                "state": "running",
+                "total_in_s3": len(s3_docs),
+                "up_to_date": len(s3_docs) - len(to_sync),
+                "to_sync": len(to_sync),
+                "warm_started": 0,
+                "downloaded": 0,
+                "extracted": 0,
+                "indexed": 0,
+                "failed": 0,
+                "in_flight": {"download": 0, "extract": 0, "index": 0},
+            })
+            if not to_sync:
+                logger.info(f"All {len(s3_docs)} S3 documents are already up to date.")
+                self.progress.update({"state": "done", "finished_at": time.time()})
                 return
 
-            logger.info(f"Checking {len(s3_docs)} documents from S3...")
-
-            # 3. Process each document
-            for doc_info in s3_docs:
-                filename = doc_info["filename"]
-                if filename == ".gitkeep" or filename.startswith("."):
-                    continue
-                    
-                etag = doc_info["etag"]
-                service = get_service_from_filename(filename)
-                
-                # Check if we need to process this document
-                needs_sync = await self._needs_processing(filename, etag)
-                
-                if needs_sync:
-                    logger.info(f"🔄 Syncing {filename} (ETag changed or missing)...")
-                    # Download to temp
-                    temp_path = os.path.join("data/uploads/temp", filename)
-                    try:
-                        await s3_sync_manager.download_document(filename, service, temp_path)
-                        
-                        # Ingest into ALL stores
-                        async with AsyncSessionLocal() as db:
-                            # We create/update a Document record first
-                            # This is helpful for the UI to track progress
-                            doc_record = await self._get_or_create_document(db, filename, service, temp_path, etag)
-                            
-                            # Perform ingestion into all stores
-                            # We use the existing RetrievalService but we'll use a new multi-store method we'll add
-                            count, chunks = await self.retrieval_service.doc_processor.process_file(temp_path, filename)
-                            if chunks:
-                                logger.info(f"Processing {len(chunks)} chunks for {filename} into all stores...")
-                                await self.retrieval_service.engine.add_to_all_stores(chunks)
-                                
-                                # Update registry/DB status
-                                doc_record.status = "completed"
-                                doc_record.processed = True
-                                meta = dict(doc_record.metadata_info or {})
-                                meta["s3_etag"] = etag
-                                meta["last_synced"] = asyncio.get_event_loop().time()
-                                doc_record.metadata_info = meta
-                                await db.commit()
-                                logger.info(f"✅ Bootstrap complete for {filename}")
-                            else:
-                                logger.warning(f"No chunks extracted from {filename}")
-                    except Exception as e:
-                        logger.error(f"Failed to bootstrap {filename}: {e}")
-                else:
-                    logger.info(f"✅ {filename} is already up to date.")
-
-            logger.info("Bootstrap Synchronization complete.")
+            logger.info(f"Bootstrap: {len(to_sync)}/{len(s3_docs)} S3 documents need syncing")
+
+            # 3. Pipeline: every stage has its own limit; the overall in-flight cap bounds
+            # how many extracted-but-not-yet-indexed documents sit in memory
+            stages = {
+                "download": asyncio.Semaphore(settings.BOOTSTRAP_DOWNLOAD_CONCURRENCY),
+                "extract": asyncio.Semaphore(settings.BOOTSTRAP_EXTRACT_CONCURRENCY),
+                "index": asyncio.Semaphore(settings.BOOTSTRAP_INDEX_CONCURRENCY),
+            }
+            in_flight = asyncio.Semaphore(
+                settings.BOOTSTRAP_DOWNLOAD_CONCURRENCY + settings.BOOTSTRAP_EXTRACT_CONCURRENCY
+                + settings.BOOTSTRAP_INDEX_CONCURRENCY
+            )
+            indexed: List[Dict[str, Any]] = []
+            await asyncio.gather(*(self._sync_document(doc_info, stages, in_flight, indexed) for doc_info in to_sync))
+
+            # 4. One save for every store instead of one per document, then the documents are done
+            if indexed:
+                try:
+                    await self.retrieval_service.engine.persist_all_stores()
+                except Exception:
+                    for item in indexed:
+                        await self._mark_document(
+                            item["doc_info"], item["path"], status="failed (index not saved)", doc_id=item["doc_id"]
+                        )
+                    self._bump("failed", len(indexed))
+                    raise
+                for item in indexed:
+                    await self._mark_document(
+                        item["doc_info"], item["path"], status="completed", doc_id=item["doc_id"], chunks=item["chunks"]
+                    )
+
+            self.progress.update({"state": "done", "finished_at": time.time()})
+            logger.info(
+                f"Bootstrap Synchronization complete: {self.progress['warm_started']} warm-started, "
+                f"{self.progress['indexed']} indexed, "
+                f"{self.progress['failed']} failed in {self.get_progress()['elapsed_seconds']}s"
+            )
 
         except Exception as e:
             logger.error(f"Bootstrap Sync Error: {e}")
+            self.progress.update({"state": "failed", "error": str(e), "finished_at": time.time()})
+
+    async def _sync_document(
+        self,
+        doc_info: Dict[str, Any],
+        stages: Dict[str, asyncio.Semaphore],
+        in_flight: asyncio.Semaphore,
+        indexed: List[Dict[str, Any]]
+    ):
+        """Indexes one document in memory; it is appended to `indexed` to be marked completed after the save."""
+        filename = doc_info["filename"]
+        service = doc_info["service"]
+        temp_path = os.path.join("data/uploads/temp", filename)
+        in_stage = self.progress["in_flight"]
+
+        async with in_flight:
+            if settings.BOOTSTRAP_WARM_START and await self._warm_start(doc_info, temp_path, stages, indexed):
+                return
+            doc_id = None
+            try:
+                logger.info(f"🔄 Syncing {filename} (ETag changed or missing)...")
+                async with stages["download"]:
+                    in_stage["download"] += 1
+                    try:
+                        await self.s3.download_document(filename, service, temp_path, key=doc_info["key"])
+                    finally:
+                        in_stage["download"] -= 1
+                self._bump("downloaded")
+                doc_id = await self._mark_document(doc_info, temp_path, status="processing")
+
+                async with stages["extract"]:
+                    in_stage["extract"] += 1
+                    try:
+                        chunks = await self.retrieval_service.doc_processor.process_file(temp_path, filename)
+                    finally:
+                        in_stage["extract"] -= 1
+                self._bump("extracted")
+
+                if not chunks:
+                    logger.warning(f"No chunks extracted from {filename}")
+                    await self._mark_document(doc_info, temp_path, status="failed", doc_id=doc_id)
+                    self._bump("failed")
+                    return
+
+                async with stages["index"]:
+                    in_stage["index"] += 1
+                    try:
+                        logger.info(f"Processing {len(chunks)} chunks for {filename} into all stores...")
+                        await self.retrieval_service.engine.add_to_all_stores(chunks, persist=False)
+                    finally:
+                        in_stage["index"] -= 1
+                self._bump("indexed")
+
+                indexed.append({"doc_info": doc_info, "path": temp_path, "doc_id": doc_id, "chunks": len(chunks)})
+                logger.info(f"✅ Bootstrap indexed {filename}")
+            except Exception as e:
+                logger.error(f"Failed to bootstrap {filename}: {e}")
+                self._bump("failed")
+                try:
+                    await self._mark_document(doc_info, temp_path, status=f"failed: {str(e)[:50]}", doc_id=doc_id)
+                except Exception as db_error:
+                    logger.error(f"Could not mark {filename} as failed: {db_error}")
+
+    async def _warm_start(
+        self,
+        doc_info: Dict[str, Any],
+        path: str,
+        stages: Dict[str, asyncio.Semaphore],
+        indexed: List[Dict[str, Any]]
+    ) -> bool:
+        """
+        Indexes a document straight from its S3 artifacts. Returns False when they are missing
+        or stale, in which case the caller falls back to download + extract. A store failure while
+        indexing marks the document failed here; extracting again would not help.
+        """
+        filename = doc_info["filename"]
+        try:
+            content_hash = await self.s3.get_document_hash(doc_info["key"])
+            if not content_hash:
+                return False
+            artifacts = await self.s3.load_document_artifacts(filename, doc_info["service"])
+            if not artifacts or not chunks_reusable(artifacts["header"], content_hash):
+                return False
+            chunks = records_to_chunks(artifacts["chunks"])
+            if not chunks:
+                return False
+
+            embeddings = artifacts["embeddings"]
+            if not embeddings_reusable(artifacts["header"], embeddings, len(chunks)):
+                # The text is still valid; only the vectors are recomputed
+                logger.info(f"Embeddings for {filename} are missing or from another model; re-embedding chunks")
+                embeddings = None
+
+        except Exception as e:
+            logger.warning(f"Warm start failed for {filename}, falling back to extraction: {e}")
+            return False
+
+        doc_id = await self._mark_document(doc_info, path, status="processing")
+        in_stage = self.progress["in_flight"]
+        async with stages["index"]:
+            in_stage["index"] += 1
+            try:
+                await self.retrieval_service.engine.add_to_all_stores(chunks, persist=False, embeddings=embeddings)
+            except Exception as e:
+                logger.error(f"Failed to index {filename} from S3 artifacts: {e}")
+                self._bump("failed")
+                await self._mark_document(doc_info, path, status=f"failed: {str(e)[:50]}", doc_id=doc_id)
+                return True
+            finally:
+                in_stage["index"] -= 1
+        self._bump("warm_started")
+
+        indexed.append({"doc_info": doc_info, "path": path, "doc_id": doc_id, "chunks": len(chunks)})
+        logger.info(f"⚡ Warm-started {filename} from S3 artifacts ({len(chunks)} chunks)")
+        return True
 
     async def _list_s3_documents(self) -> List[Dict[str, Any]]:
         """Lists documents in the S3 bucket with their ETags."""
         try:
-            paginator = s3_sync_manager.s3.get_paginator("list_objects_v2")
+            paginator = self.s3.s3.get_paginator("list_objects_v2")
             docs = []
-            
-            loop = asyncio.get_event_loop()
-            pages = await loop.run_in_executor(
-                None, 
-                lambda: list(paginator.paginate(Bucket=s3_sync_manager.bucket, Prefix=settings.S3_DOCUMENTS_PREFIX))
+
+            pages = await self.s3.run_io(
+                lambda: list(paginator.paginate(Bucket=self.s3.bucket, Prefix=settings.S3_DOCUMENTS_PREFIX))
             )
-            
+
             for page in pages:
                 for obj in page.get("Contents", []):
                     key = obj["Key"]
-                    if key == settings.S3_DOCUMENTS_PREFIX: # Skip the folder key itself
+                    if key == settings.S3_DOCUMENTS_PREFIX or key.endswith("/"): # Skip folder keys
                         continue
-                    
+
                     filename = os.path.basename(key)
+                    # documents/<service>/<filename>; fall back to detection for flat keys
+                    parts = key[len(settings.S3_DOCUMENTS_PREFIX):].split("/")
                     docs.append({
+                        "key": key,
                         "filename": filename,
+                        "service": parts[0] if len(parts) > 1 else get_service_from_filename(filename),
                         "etag": obj["ETag"].strip('"'),
                         "last_modified": obj["LastModified"]
                     })
@@ -116,46 +277,50 @@ class BootstrapSync:
             logger.error(f"Failed to list S3 documents: {e}")
             return []
 
-    async def _needs_processing(self, filename: str, etag: str) -> bool:
-        """Determines if a document needs processing based on its ETag."""
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(select(Document).where(Document.filename == filename))
-            doc = result.scalar_one_or_none()
-            
+    async def _diff_against_db(self, s3_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Returns the S3 documents that are new, changed (ETag) or not completed, using one query."""
+        async with self.session_factory() as db:
+            result = await db.execute(select(Document.id, Document.filename, Document.status, Document.metadata_info))
+            known = {filename: (doc_id, status, meta or {}) for doc_id, filename, status, meta in result.all()}
+
+        to_sync = []
+        for doc_info in s3_docs:
+            doc_id, status, meta = known.get(doc_info["filename"], (None, None, {}))
+            doc_info["doc_id"] = doc_id
+            if doc_id is None or status != "completed" or meta.get("s3_etag") != doc_info["etag"]:
+                to_sync.append(doc_info)
+        return to_sync
+
+    async def _mark_document(
+        self,
+        doc_info: Dict[str, Any],
+        path: str,
+        status: str,
+        doc_id: Optional[str] = None,
+        chunks: Optional[int] = None
+    ) -> str:
+        """Creates or updates the Document record for an S3 document. Returns its id."""
+        async with self.session_factory() as db:
+            doc_id = doc_id or doc_info.get("doc_id")
+            doc = await db.get(Document, doc_id) if doc_id else None
             if not doc:
-                return True # New document
-            
-            if doc.status != "completed":
-                return True # Failed or partial earlier
-            
-            # Check ETag in metadata
-            meta = doc.metadata_info or {}
-            stored_etag = meta.get("s3_etag")
-            
-            return stored_etag != etag
-
-    async def _get_or_create_document(self, db, filename, service, path, etag):
-        """Gets or creates a Document record in the SQL DB."""
-        result = await db.execute(select(Document).where(Document.filename == filename))
-        doc = result.scalar_one_or_none()
-        
-        if not doc:
-            doc = Document(
-                filename=filename,
-                source_path=path,
-                status="processing",
-                metadata_info={"detected_service": service, "s3_etag": etag}
-            )
-            db.add(doc)
-        else:
-            doc.status = "processing"
+                doc = Document(
+                    filename=doc_info["filename"],
+                    file_type=doc_info["filename"].split(".")[-1].lower(),
+                    metadata_info={"detected_service": doc_info["service"]}
+                )
+                db.add(doc)
+            doc.status = status
             doc.source_path = path
             meta = dict(doc.metadata_info or {})
-            meta["s3_etag"] = etag
+            if chunks is not None:
+                # Only a saved document records the ETag that the next diff compares against
+                meta["s3_etag"] = doc_info["etag"]
+                doc.processed = True
+                meta["chunks"] = chunks
+                meta["last_synced"] = time.time()
             doc.metadata_info = meta
-            
-        await db.commit()
-        await db.refresh(doc)
-        return doc
+            await db.commit()
+            return doc.id
 
 bootstrap_sync = BootstrapSync()
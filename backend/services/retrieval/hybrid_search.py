@@ -4,23 +4,31 @@ Hybrid Search Service
 - Implements robust error handling with loguru
 - Replaces prints with logging
 - Ensures async safety and consistency
+- With serving snapshots on (SERVING_WORKERS > 1), searches read the shared memory-mapped
+  snapshot and the in-process BM25/FAISS objects are only loaded by the process that writes
 """
+import asyncio
+import functools
 from typing import List, Dict, Any, Optional
 from loguru import logger
 
-from backend.services.retrieval.bm25_search import BM25Index
+from backend.core.config import settings
+from backend.services.retrieval.bm25_search import BM25Index, tokenize
+from backend.services.retrieval.serving_snapshot import serving_snapshots
 from backend.services.vector_store.faiss_store import FAISSStore
 from backend.services.vector_store.chroma_store import ChromaStore
 from backend.services.vector_store.lancedb_store import LanceDBStore
 from backend.services.vector_store.milvus_store import MilvusStore
 from backend.services.vector_store.qdrant_store import QdrantStore
+from backend.services.executors import executors
+from backend.services.tracing import span
 
 class HybridSearch:
     def __init__(self):
-        self.bm25_index = BM25Index()
+        self._bm25_index = None
         # Lazily initialize stores
         self.stores = {
-            "faiss": FAISSStore(),
+            "faiss": None,
             "chroma": None,
             "lancedb": None,
             "milvus": None,
@@ -36,7 +44,9 @@ class HybridSearch:
             
         if self.stores[name] is None:
             try:
-                if name == "chroma":
+                if name == "faiss":
+                    self.stores[name] = FAISSStore()
+                elif name == "chroma":
                     self.stores[name] = ChromaStore()
                 elif name == "lancedb":
                     self.stores[name] = LanceDBStore()
@@ -46,46 +56,156 @@ class HybridSearch:
                     self.stores[name] = QdrantStore()
             except Exception as e:
                 logger.error(f"Failed to initialize vector store {name}: {e}")
-                return self.stores["faiss"] # Fallback if specific store fails init
+                return self._get_store("faiss") if name != "faiss" else None # Fallback if specific store fails init
         
         return self.stores[name]
 
-    async def add_documents(self, documents: List[Dict[str, Any]], database: str = "faiss"):
+    @property
+    def bm25_index(self) -> BM25Index:
+        if self._bm25_index is None:
+            self._bm25_index = BM25Index()
+        return self._bm25_index
+
+    @bm25_index.setter
+    def bm25_index(self, index: BM25Index):
+        self._bm25_index = index
+
+    @property
+    def snapshots_enabled(self) -> bool:
+        return settings.SERVING_SNAPSHOTS or settings.SERVING_WORKERS > 1
+
+    async def _bm25_write(self, fn, *args, **kwargs):
+        """Runs a BM25 write on the ingest executor: it blocks on the index's write lock while searches read."""
+        return await asyncio.get_event_loop().run_in_executor(executors.ingest, functools.partial(fn, *args, **kwargs))
+
+    async def add_documents(self, documents: List[Dict[str, Any]], database: str = "faiss", persist: bool = True):
         """Adds documents to both BM25 and vector stores."""
         try:
-            self.bm25_index.add_documents(documents)
+            await self._bm25_write(self.bm25_index.add_documents, documents, persist=persist)
             store = self._get_store(database)
             if store:
-                await store.add_documents(documents)
+                await store.add_documents(documents, persist=persist)
             logger.info(f"Indexed {len(documents)} chunks into BM25 and {database}")
         except Exception as e:
             logger.error(f"Hybrid indexing failed: {e}")
 
-    async def add_to_all_stores(self, documents: List[Dict[str, Any]]):
-        """Adds documents to all available and initialized vector stores."""
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings, database: str = "faiss", persist: bool = True):
+        """Like add_documents, but the vector store takes precomputed vectors (aligned 1:1 with documents)."""
+        try:
+            await self._bm25_write(self.bm25_index.add_documents, documents, persist=persist)
+            store = self._get_store(database)
+            if store:
+                await store.add_embeddings(documents, embeddings, persist=persist)
+            logger.info(f"Indexed {len(documents)} pre-embedded chunks into BM25 and {database}")
+        except Exception as e:
+            logger.error(f"Hybrid indexing failed: {e}")
+
+    async def persist(self, database: str = "faiss"):
+        """Writes BM25 and the vector store to disk after a batch of persist=False adds (raises if a save fails)."""
+        try:
+            await asyncio.get_event_loop().run_in_executor(executors.io, self.bm25_index.save)
+            store = self._get_store(database)
+            if store:
+                await store.persist()
+        except Exception as e:
+            logger.error(f"Hybrid persist failed: {e}")
+            raise
+        await self.export_snapshot()
+
+    async def add_to_all_stores(self, documents: List[Dict[str, Any]], persist: bool = True, embeddings=None):
+        """
+        Adds documents to all available and initialized vector stores.
+        `embeddings` (aligned 1:1 with documents) lets the stores skip the embedding model.
+        Raises if BM25 or any vector store failed (the vector stores all get their try).
+        """
         try:
             # 1. Add to BM25
-            self.bm25_index.add_documents(documents)
+            await self._bm25_write(self.bm25_index.add_documents, documents, persist=persist)
             logger.info("Indexed chunks into BM25.")
 
             # 2. Add to all available vector stores
-            tasks = []
-            available_db_names = ["faiss", "chroma", "lancedb", "milvus", "qdrant"]
-            
-            for db_name in available_db_names:
-                # We try to initialize/get the store
-                store = self._get_store(db_name)
-                if store:
-                    # Note: _get_store might return FAISS as fallback, 
-                    # we should be careful about double-adding to FAISS.
-                    # But if we use explicit names, it's safer.
-                    tasks.append(store.add_documents(documents))
+            tasks, names = [], []
+            for name, store in self._all_stores():
+                names.append(name)
+                if embeddings is not None:
+                    tasks.append(store.add_embeddings(documents, embeddings, persist=persist))
+                else:
+                    tasks.append(store.add_documents(documents, persist=persist))
             
             if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                failed = [f"{name}: {result}" for name, result in zip(names, results) if isinstance(result, Exception)]
+                if failed:
+                    raise RuntimeError(f"Indexing failed in {', '.join(failed)}")
                 logger.info(f"Successfully sent {len(documents)} chunks to all enabled vector stores.")
         except Exception as e:
             logger.error(f"Failed to add documents to all stores: {e}")
+            raise
+
+    def _all_stores(self):
+        """Yields (name, store) for every store that initializes, without FAISS fallbacks counted twice."""
+        for db_name in ["faiss", "chroma", "lancedb", "milvus", "qdrant"]:
+            store = self._get_store(db_name)
+            if store and (db_name == "faiss" or store is not self.stores["faiss"]):
+                yield db_name, store
+
+    async def persist_all_stores(self):
+        """Writes BM25 and every initialized store to disk after persist=False adds (raises if a save fails)."""
+        try:
+            await asyncio.get_event_loop().run_in_executor(executors.io, self.bm25_index.save)
+            results = await asyncio.gather(
+                *(store.persist() for name, store in self.stores.items() if store is not None),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        except Exception as e:
+            logger.error(f"Hybrid persist failed: {e}")
+            raise
+        await self.export_snapshot()
+
+    async def export_snapshot(self):
+        """Publishes BM25 + FAISS as the serving snapshot every worker searches (no-op when snapshots are off)."""
+        if not self.snapshots_enabled:
+            return
+        try:
+            loop = asyncio.get_event_loop()
+            faiss_store = self._get_store("faiss")
+            bm25_rows, dense_rows = await asyncio.gather(
+                loop.run_in_executor(executors.io, self.bm25_index.snapshot_rows),
+                loop.run_in_executor(executors.io, faiss_store.snapshot_rows)
+            )
+            await serving_snapshots.publish(bm25_rows, dense_rows)
+        except Exception as e:
+            logger.error(f"Serving snapshot export failed: {e}")
+
+    async def reload_indexes(self):
+        """
+        Re-reads BM25 and FAISS from disk into new objects off the event loop, then swaps them in.
+        Searches never wait: in-flight ones finish on the old objects, later ones see the new ones.
+        An index that fails to load keeps serving its previous version.
+        """
+        loop = asyncio.get_event_loop()
+        faiss_store = self._get_store("faiss")
+
+        def _load_bm25():
+            index = BM25Index(self.bm25_index.index_path)
+            return index if index.loaded else None
+
+        bm25_index, vector_store = await asyncio.gather(
+            loop.run_in_executor(executors.io, _load_bm25),
+            loop.run_in_executor(executors.io, faiss_store.load_index)
+        )
+        if bm25_index is not None:
+            self.bm25_index = bm25_index
+        if vector_store is not None:
+            faiss_store.vector_store = vector_store
+        logger.info(
+            f"Reloaded indexes from disk (BM25: {'swapped' if bm25_index else 'kept'}, "
+            f"FAISS: {'swapped' if vector_store else 'kept'})"
+        )
+        await self.export_snapshot()
 
     def reciprocal_rank_fusion(self, bm25_results: List[Dict[str, Any]], dense_results: List[Dict[str, Any]], k: int = 60) -> List[Dict[str, Any]]:
         """Combines results using Reciprocal Rank Fusion."""
@@ -126,25 +246,66 @@ class HybridSearch:
     async def search(self, query: str, top_k: int = 5, database: str = "faiss", filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Performs hybrid search by combining BM25 and Vector Search."""
         try:
-            # Get candidates from both
-            bm25_res = self.bm25_index.search(query, top_k=20, filter=filter)
-            store = self._get_store(database)
-            
-            dense_res = []
-            if store:
-                dense_res = await store.search(query, top_k=20, filter=filter)
+            if self.snapshots_enabled and database.lower() == "faiss":
+                return (await self._snapshot_search(query, filter))[:top_k]
+
+            # Get candidates from both (BM25 scoring runs on the search pool, off the event loop)
+            async def _bm25():
+                with span("bm25") as s:
+                    results = await asyncio.get_event_loop().run_in_executor(
+                        executors.search, lambda: self.bm25_index.search(query, top_k=20, filter=filter)
+                    )
+                    s.set(results=len(results))
+                    return results
+
+            async def _dense():
+                store = self._get_store(database)
+                if not store:
+                    return []
+                with span("dense", database=database) as s:
+                    results = await store.search(query, top_k=20, filter=filter)
+                    s.set(results=len(results))
+                    return results
+
+            bm25_res, dense_res = await asyncio.gather(_bm25(), _dense())
             
             # Fuse
-            fused = self.reciprocal_rank_fusion(bm25_res, dense_res)
+            with span("fusion"):
+                fused = self.reciprocal_rank_fusion(bm25_res, dense_res)
             return fused[:top_k]
         except Exception as e:
             logger.error(f"Hybrid search failed: {e}")
             return []
 
+    async def _snapshot_search(self, query: str, filter: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Hybrid search over the memory-mapped serving snapshot (same candidates and fusion as search())."""
+        from backend.services.embeddings import embed_query
+
+        loop = asyncio.get_event_loop()
+        # Opening a newer snapshot happens in the background; only the very first open is waited for
+        snapshot = await loop.run_in_executor(executors.search, serving_snapshots.refresh)
+        if snapshot is None:
+            return []
+
+        async def _bm25():
+            with span("bm25", snapshot=snapshot.version):
+                return await loop.run_in_executor(executors.search, snapshot.bm25_search, tokenize(query), 20, filter)
+
+        async def _dense():
+            if snapshot.dense is None:
+                return []
+            with span("dense", snapshot=snapshot.version):
+                vector = await embed_query(query)
+                return await loop.run_in_executor(executors.search, snapshot.dense_search, vector, 20, filter)
+
+        bm25_res, dense_res = await asyncio.gather(_bm25(), _dense())
+        with span("fusion"):
+            return self.reciprocal_rank_fusion(bm25_res, dense_res)
+
     async def delete_documents(self, filter_dict: Dict[str, Any], database: str = "faiss"):
         """Deletes documents from both BM25 and the specified vector store."""
         try:
-            await self.bm25_index.delete_documents(filter_dict)
+            await self._bm25_write(self.bm25_index.delete_documents, filter_dict)
             store = self._get_store(database)
             if store:
                 await store.delete_documents(filter_dict)
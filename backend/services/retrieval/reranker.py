@@ -3,19 +3,27 @@ Reranker Service
 - Identifies and fixes syntax and logical bugs
 - Implements robust error handling with loguru
 - Ensures CPU-bound reranking is run in a separate thread
+- With INFERENCE_URL set, both models run in the inference sidecar and are not loaded here
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
-from sentence_transformers import CrossEncoder
-from flashrank import Ranker, RerankRequest
 from loguru import logger
 from backend.core.config import settings
+from backend.services.executors import executors
+from backend.services.tracing import span
 
 class Reranker:
-    def __init__(self, model_name: str = "BAAI/bge-reranker-base"):
+    def __init__(self, model_name: str = "BAAI/bge-reranker-base", local: bool = False):
         self.model_name = model_name
         self.cross_encoder = None
         self.flash_ranker = None
+        # Sidecar client (local=True is the sidecar itself hosting the models)
+        self.client = None
+        if settings.INFERENCE_URL and not local:
+            from backend.services.inference_client import get_inference_client
+            self.client = get_inference_client()
+            logger.info(f"Reranking via inference sidecar at {settings.INFERENCE_URL}")
+            return
         
         # Lazy load models to avoid heavy init on every import
         self._init_models()
@@ -24,6 +32,7 @@ class Reranker:
         """Initializes reranking models with proper error handling."""
         # Stage 2: FlashRank (Very fast, lightweight)
         try:
+            from flashrank import Ranker
             # Check if cache dir exists
             os.makedirs("data/models", exist_ok=True)
             self.flash_ranker = Ranker(model_name="ms-marco-MiniLM-L-12-v2", cache_dir="data/models")
@@ -33,6 +42,7 @@ class Reranker:
 
         # Stage 3: BGE Cross-Encoder (Most accurate, heavier)
         try:
+            from sentence_transformers import CrossEncoder
             self.cross_encoder = CrossEncoder(self.model_name, device="cpu") 
             logger.info(f"BGE Cross-Encoder {self.model_name} initialized.")
         except Exception as e:
@@ -45,12 +55,14 @@ class Reranker:
             
         try:
             # 1. FlashRank Phase (Fast pruning) - Run in executor
-            if self.flash_ranker:
-                candidates = await self._run_flashrank(query, candidates)
+            if self.flash_ranker or self.client:
+                with span("flashrank", candidates=len(candidates)):
+                    candidates = await self._run_flashrank(query, candidates)
 
             # 2. BGE Cross-Encoder Phase (Precision reranking) - Run in executor
-            if self.cross_encoder and candidates:
-                candidates = await self._run_cross_encoder(query, candidates)
+            if (self.cross_encoder or self.client) and candidates:
+                with span("cross_encoder", candidates=len(candidates)):
+                    candidates = await self._run_cross_encoder(query, candidates)
             else:
                 # Basic fallback if models fail
                 candidates = self._simple_rerank_fallback(query, candidates)
@@ -60,34 +72,48 @@ class Reranker:
             logger.error(f"Reranking error: {e}")
             return candidates[:top_k]
 
+    def flashrank_scores(self, query: str, texts: List[str]) -> List[float]:
+        """FlashRank score of each text, in input order (blocking)."""
+        from flashrank import RerankRequest
+
+        passages = [{"id": str(i), "text": text} for i, text in enumerate(texts)]
+        scores = [0.0] * len(texts)
+        for res in self.flash_ranker.rerank(RerankRequest(query=query, passages=passages)):
+            scores[int(res["id"])] = float(res["score"])
+        return scores
+
+    def cross_encoder_scores(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        """Cross-encoder score of each (query, text) pair (blocking)."""
+        return [float(score) for score in self.cross_encoder.predict(pairs)]
+
     async def _run_flashrank(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Wraps FlashRank blocking call in an executor."""
-        def _sync_flash():
-            flash_docs = [{"id": str(i), "text": c["content"], "meta": c.get("metadata", {})} for i, c in enumerate(candidates)]
-            rank_request = RerankRequest(query=query, passages=flash_docs)
-            flash_results = self.flash_ranker.rerank(rank_request)
+        """Wraps FlashRank blocking call in an executor (or sends it to the sidecar)."""
+        texts = [c["content"] for c in candidates]
+        try:
+            if self.client:
+                scores = await self.client.flashrank_scores(query, texts)
+            else:
+                scores = await asyncio.get_event_loop().run_in_executor(executors.inference, self.flashrank_scores, query, texts)
+            ranked = sorted(zip(candidates, scores), key=lambda x: x[1], reverse=True)
             return [
-                {"content": res["text"], "metadata": res["meta"], "flash_score": float(res["score"])}
-                for res in flash_results
+                {"content": c["content"], "metadata": c.get("metadata", {}), "flash_score": score}
+                for c, score in ranked
             ]
-        
-        try:
-            return await asyncio.get_event_loop().run_in_executor(None, _sync_flash)
         except Exception as e:
             logger.warning(f"FlashRank execution failed: {e}")
             return candidates
 
     async def _run_cross_encoder(self, query: str, candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Wraps Cross-Encoder prediction in an executor."""
-        def _sync_cross():
-            pairs = [(query, c["content"]) for c in candidates]
-            scores = self.cross_encoder.predict(pairs)
-            for i, score in enumerate(scores):
-                candidates[i]["rerank_score"] = float(score)
-            return sorted(candidates, key=lambda x: x.get("rerank_score", 0), reverse=True)
-        
+        """Wraps Cross-Encoder prediction in an executor (or sends it to the sidecar)."""
         try:
-            return await asyncio.get_event_loop().run_in_executor(None, _sync_cross)
+            if self.client:
+                scores = await self.client.cross_encoder_scores(query, [c["content"] for c in candidates])
+            else:
+                pairs = [(query, c["content"]) for c in candidates]
+                scores = await asyncio.get_event_loop().run_in_executor(executors.inference, self.cross_encoder_scores, pairs)
+            for candidate, score in zip(candidates, scores):
+                candidate["rerank_score"] = score
+            return sorted(candidates, key=lambda x: x.get("rerank_score", 0), reverse=True)
         except Exception as e:
             logger.warning(f"Cross-Encoder execution failed: {e}")
             return candidates
@@ -6,24 +6,30 @@ Retrieval Service
 """
 from loguru import logger
 import asyncio
+import os
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Awaitable, Callable
 from datetime import datetime, timezone
+import numpy as np
 
 from backend.services.retrieval.advanced_retrieval import AdvancedRetrieval
 from backend.services.document_processor import DocumentProcessor
 from backend.models.models import Document
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.core.config import settings
+from backend.utils.chunk_cache import get_chunk_cache, hash_file
+from backend.utils.chunk_artifacts import chunk_id
+from backend.utils.service_detection import get_service_from_filename
+from backend.services.executors import executors
+from backend.services.tracing import span
 
 class RetrievalService:
-    # A simple in-memory cache for processed document chunks to prevent re-running 
-    # expensive Vision/OCR when switching databases for the same file.
-    _ingestion_cache = {} 
-
     def __init__(self):
         self.engine = AdvancedRetrieval()
         self.doc_processor = DocumentProcessor()
+        # Persistent cache of processed chunks, shared by every instance
+        self.chunk_cache = get_chunk_cache()
+        self._index_lock = asyncio.Lock()
         from backend.services.llm_service import LLMService
         self.llm_service = LLMService()
 
@@ -44,10 +50,27 @@ class RetrievalService:
         filename: str, 
         database: str = "faiss", 
         document_id: Optional[str] = None,
-        db: Optional[AsyncSession] = None
+        db: Optional[AsyncSession] = None,
+        on_progress: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        persist: bool = True
     ):
-        """Processes a file and adds it to the advanced retrieval engine."""
+        """
+        Processes a file and adds it to the advanced retrieval engine.
+        `on_progress(stage, progress)` is awaited as batches move through extract/chunk/embed/index.
+        With persist=False the indexes stay in memory and are neither saved nor synced to S3;
+        the caller persists once for a whole batch of documents.
+        Returns (count, chunks, embeddings): every chunk is embedded exactly once and the float32
+        matrix (row i = chunks[i], see metadata["chunk_id"]) is reused for the index and the S3 backup.
+        """
         chunks = []
+        vectors: List[np.ndarray] = []
+        progress: Dict[str, Any] = {}
+
+        async def report(stage: str, **counters):
+            progress[stage] = counters
+            if on_progress:
+                await on_progress(stage, dict(progress))
+
         try:
             if document_id and db:
                 doc = await db.get(Document, document_id)
@@ -55,77 +78,145 @@ class RetrievalService:
                     doc.status = "processing"
                     await db.commit()
 
-            # Check if we've already processed this file in this session
-            cache_key = file_path
-            if cache_key in self._ingestion_cache:
+            # Check if file exists locally, otherwise pull from S3
+            if not os.path.exists(file_path):
+                logger.info(f"File {filename} missing locally. Attempting to pull from S3...")
+                from backend.services.s3_sync import s3_sync_manager
+                try:
+                    await s3_sync_manager.download_document(filename, get_service_from_filename(filename), file_path)
+                except Exception as s3e:
+                    logger.error(f"Failed to restore {filename} from S3: {s3e}")
+                    # If S3 fails, we can't process
+                    await self._update_status(db, document_id, "failed (file missing)")
+                    return 0, [], None
+
+            # Content-addressed cache: the same bytes (any name, any database, any restart) skip Vision/OCR
+            loop = asyncio.get_event_loop()
+            file_hash = await loop.run_in_executor(executors.io, hash_file, file_path)
+            cached = await loop.run_in_executor(executors.io, self.chunk_cache.get, file_hash, {
+                "source": filename,
+                "file_type": filename.split(".")[-1].lower(),
+                "upload_date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+                "source_topic": get_service_from_filename(filename)
+            })
+            cached_vectors = None
+            if cached:
                 await self._update_status(db, document_id, "ingesting (cached)")
-                logger.info(f"Using cached chunks for {filename} (skipping Vision/OCR)")
-                chunks = self._ingestion_cache[cache_key]
+                cached_vectors = await loop.run_in_executor(
+                    executors.io, self.chunk_cache.get_embeddings, file_hash,
+                    [chunk_id(file_hash, i) for i in range(len(cached))]
+                )
+                logger.info(
+                    f"Using cached chunks for {filename} (skipping Vision/OCR"
+                    f"{' and embedding' if cached_vectors is not None else ''})"
+                )
+                batches = self._iter_cached(cached, settings.INGEST_BATCH_SIZE)
             else:
                 await self._update_status(db, document_id, "analyzing content...")
-                
-                # Check if file exists locally, otherwise pull from S3
-                if not os.path.exists(file_path):
-                    logger.info(f"File {filename} missing locally. Attempting to pull from S3...")
-                    from backend.utils.service_detection import get_service_from_filename
-                    service = get_service_from_filename(filename)
-                    from backend.services.s3_sync import s3_sync_manager
+                batches = self.doc_processor.iter_chunks(file_path, filename)
+
+            # A retried job (or a re-upload under the same name) starts from a clean slate, so rows
+            # an earlier attempt indexed are never searchable twice
+            async with self._index_lock:
+                await self.engine.delete_documents({"source": filename}, database=database)
+
+            # Extract -> chunk -> index one batch at a time; indexed batches are searchable immediately
+            start_proc = time.time()
+            timed_out = False
+            finished = False
+            try:
+                while True:
                     try:
-                        await s3_sync_manager.download_document(filename, service, file_path)
-                    except Exception as s3e:
-                        logger.error(f"Failed to restore {filename} from S3: {s3e}")
-                        # If S3 fails, we can't process
-                        await self._update_status(db, document_id, "failed (file missing)")
-                        return 0, []
-
-                start_proc = time.time()
-                chunks = await self.doc_processor.process_file(file_path, filename)
-                logger.info(f"Analysis for {filename} took {time.time() - start_proc:.2f}s")
-                # Cache results for other databases
-                if chunks:
-                    self._ingestion_cache[cache_key] = chunks
+                        batch = await asyncio.wait_for(
+                            batches.__anext__(), timeout=settings.INGEST_BATCH_TIMEOUT_SECONDS
+                        )
+                        pages = [c["metadata"]["page_end"] for c in batch if "page_end" in c["metadata"]]
+                        if pages:
+                            await report("extract", pages=max(pages))
+                        # IDs follow the position in the document, so they line up with the embedding rows
+                        for offset, chunk in enumerate(batch, start=len(chunks)):
+                            chunk["metadata"]["chunk_id"] = chunk_id(file_hash, offset)
+                        await report("chunk", chunks=len(chunks) + len(batch))
+
+                        if cached_vectors is not None:
+                            batch_vectors = np.asarray(cached_vectors[len(chunks):len(chunks) + len(batch)])
+                        else:
+                            batch_vectors = await asyncio.wait_for(
+                                loop.run_in_executor(executors.ingest, self._embed, [c["content"] for c in batch]),
+                                timeout=settings.INGEST_BATCH_TIMEOUT_SECONDS
+                            )
+                        await report("embed", chunks=len(chunks) + len(batch))
+                        # Stores are not safe for concurrent writers; extraction still overlaps across jobs.
+                        # No timeout here: the add runs on an executor thread that a timeout could not stop,
+                        # so the lock would be released while it still writes
+                        async with self._index_lock:
+                            await self.engine.add_embeddings(batch, batch_vectors, database=database, persist=False)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        # Keep what is already indexed instead of discarding the whole document
+                        logger.error(
+                            f"TIMEOUT: batch for {filename} took longer than "
+                            f"{settings.INGEST_BATCH_TIMEOUT_SECONDS}s after {len(chunks)} chunks"
+                        )
+                        timed_out = True
+                        break
+                    chunks.extend(batch)
+                    vectors.append(batch_vectors)
+                    await report("index", chunks=len(chunks))
+                    await self._update_status(db, document_id, f"vectorizing into {database}... ({len(chunks)} chunks)")
+                finished = True
+            finally:
+                await batches.aclose()
+                if not finished:
+                    # Failed or cancelled mid-document: drop the partial rows instead of saving them,
+                    # the queue's retry indexes the whole document again
+                    async with self._index_lock:
+                        await self.engine.delete_documents({"source": filename}, database=database)
+                elif chunks and persist:
+                    await self.persist(database)
+            logger.info(f"Ingestion of {filename} into {database} took {time.time() - start_proc:.2f}s")
+
+            embeddings = np.vstack(vectors) if vectors else None
+
+            # Cache results for other databases and later restarts
+            if chunks and not timed_out:
+                if not cached:
+                    await loop.run_in_executor(executors.io, self.chunk_cache.put, file_hash, chunks)
+                if cached_vectors is None:
+                    await loop.run_in_executor(
+                        executors.io, self.chunk_cache.put_embeddings, file_hash, embeddings,
+                        [c["metadata"]["chunk_id"] for c in chunks]
+                    )
             
             if chunks:
-                await self._update_status(db, document_id, f"vectorizing into {database}...")
+                # Register doc in the master registry
+                from backend.utils.source_validator import register_document
+                register_document(filename, get_service_from_filename(filename))
                 
-                # Set a critical timeout of 1800 seconds for vectorization (increased for large docs)
-                try:
-                    start_vec = time.time()
-                    await asyncio.wait_for(self.engine.add_documents(chunks, database=database), timeout=1800.0)
-                    logger.info(f"Vectorization for {filename} into {database} took {time.time() - start_vec:.2f}s")
-
-                    # Register doc in the master registry
-                    from backend.utils.source_validator import register_document
-                    from backend.utils.service_detection import get_service_from_filename
-                    service = get_service_from_filename(filename)
-                    register_document(filename, service)
-                    
-                    if document_id and db:
-                        doc = await db.get(Document, document_id)
-                        if doc:
-                            doc.status = "completed"
-                            doc.processed = True
-                            meta = dict(doc.metadata_info or {})
-                            meta["chunks"] = len(chunks)
-                            meta["processed_at"] = datetime.now(timezone.utc).isoformat()
-                            doc.metadata_info = meta
-                            from sqlalchemy.orm.attributes import flag_modified
-                            flag_modified(doc, "metadata_info")
-                            await db.commit()
-                            logger.info(f"Successfully processed {filename}: {len(chunks)} chunks")
-                            
+                if document_id and db:
+                    doc = await db.get(Document, document_id)
+                    if doc:
+                        doc.status = "partial (timeout)" if timed_out else "completed"
+                        doc.processed = True
+                        meta = dict(doc.metadata_info or {})
+                        meta["chunks"] = len(chunks)
+                        meta["processed_at"] = datetime.now(timezone.utc).isoformat()
+                        doc.metadata_info = meta
+                        from sqlalchemy.orm.attributes import flag_modified
+                        flag_modified(doc, "metadata_info")
+                        await db.commit()
+                        logger.info(f"Successfully processed {filename}: {len(chunks)} chunks")
+                        
+                        if persist:
                             # Sync updated index to S3 (non-blocking)
                             from backend.services.s3_sync import s3_sync_manager
                             await s3_sync_manager.sync_index_to_s3()
-                except asyncio.TimeoutError:
-                    logger.error(f"TIMEOUT: Vectorization for {filename} took too long (>1800s)")
-                    await self._update_status(db, document_id, "failed (timeout)")
-                    return 0, []
             else:
                 if document_id and db:
                     doc = await db.get(Document, document_id)
                     if doc:
-                        doc.status = "failed"
+                        doc.status = "failed (timeout)" if timed_out else "failed"
                         await db.commit()
                         
         except Exception as e:
@@ -133,15 +224,112 @@ class RetrievalService:
             await self._update_status(db, document_id, f"failed: {str(e)[:50]}")
             if db:
                 await db.rollback()
-            return 0, []
+            return 0, [], None
                 
-        return len(chunks) if chunks else 0, chunks
+        return len(chunks) if chunks else 0, chunks, embeddings
+
+    async def prepare_document(
+        self,
+        file_path: str,
+        filename: str,
+        on_progress: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> int:
+        """
+        Extract -> chunk -> embed into the chunk cache without touching the indexes (standalone
+        ingestion workers). The index writer's ingest_document then finds the chunks and vectors
+        in the cache and only indexes them. Returns the number of chunks prepared.
+        """
+        progress: Dict[str, Any] = {}
+
+        async def report(stage: str, **counters):
+            progress[stage] = counters
+            if on_progress:
+                await on_progress(stage, dict(progress))
+
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"{filename} is not on this worker's disk ({file_path})")
+
+        loop = asyncio.get_event_loop()
+        file_hash = await loop.run_in_executor(executors.io, hash_file, file_path)
+        cached = await loop.run_in_executor(executors.io, self.chunk_cache.get, file_hash, {
+            "source": filename,
+            "source_topic": get_service_from_filename(filename)
+        })
+        if cached:
+            ids = [chunk_id(file_hash, i) for i in range(len(cached))]
+            if await loop.run_in_executor(executors.io, self.chunk_cache.get_embeddings, file_hash, ids) is not None:
+                return len(cached)
+            batches = self._iter_cached(cached, settings.INGEST_BATCH_SIZE)
+        else:
+            batches = self.doc_processor.iter_chunks(file_path, filename)
+
+        chunks = []
+        vectors: List[np.ndarray] = []
+        try:
+            while True:
+                try:
+                    batch = await asyncio.wait_for(batches.__anext__(), timeout=settings.INGEST_BATCH_TIMEOUT_SECONDS)
+                except StopAsyncIteration:
+                    break
+                pages = [c["metadata"]["page_end"] for c in batch if "page_end" in c["metadata"]]
+                if pages:
+                    await report("extract", pages=max(pages))
+                for offset, chunk in enumerate(batch, start=len(chunks)):
+                    chunk["metadata"]["chunk_id"] = chunk_id(file_hash, offset)
+                await report("chunk", chunks=len(chunks) + len(batch))
+                vectors.append(await asyncio.wait_for(
+                    loop.run_in_executor(executors.ingest, self._embed, [c["content"] for c in batch]),
+                    timeout=settings.INGEST_BATCH_TIMEOUT_SECONDS
+                ))
+                chunks.extend(batch)
+                await report("embed", chunks=len(chunks))
+        finally:
+            await batches.aclose()
+
+        if not chunks:
+            return 0
+        if not cached:
+            await loop.run_in_executor(executors.io, self.chunk_cache.put, file_hash, chunks)
+        await loop.run_in_executor(
+            executors.io, self.chunk_cache.put_embeddings, file_hash, np.vstack(vectors),
+            [c["metadata"]["chunk_id"] for c in chunks]
+        )
+        return len(chunks)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Embedding stage: one model call per batch, float32 rows aligned with `texts`."""
+        from backend.services.embeddings import get_shared_embeddings
+        return np.asarray(get_shared_embeddings().embed_documents(texts), dtype=np.float32)
+
+    async def persist(self, database: str = "faiss"):
+        """Saves the in-memory indexes, e.g. once after a batch of persist=False ingestions."""
+        async with self._index_lock:
+            await self.engine.persist(database=database)
+
+    async def reload_indexes(self, refresh: Optional[Callable[[], Awaitable[Any]]] = None):
+        """
+        Hot-swaps the in-memory indexes for what is on disk, e.g. after another replica published.
+        Pending adds are saved first and `refresh` (an S3 pull that patches the index files) runs in
+        between, all under the index lock, so ingestion waits but searches never do.
+        """
+        async with self._index_lock:
+            await self.engine.persist()
+            if refresh:
+                await refresh()
+            await self.engine.reload_indexes()
+
+    @staticmethod
+    async def _iter_cached(chunks: List[Dict[str, Any]], batch_size: int) -> AsyncIterator[List[Dict[str, Any]]]:
+        for i in range(0, len(chunks), batch_size):
+            yield chunks[i:i + batch_size]
 
     async def semantic_search(self, query: str, top_k: int = 5, database: str = "faiss") -> List[Dict[str, Any]]:
         """Performs advanced retrieval with intent classification and metadata filtering."""
         try:
             # 1. Classify Intent & Extract Topic
-            intent_info = await self.llm_service.classify_intent(query)
+            with span("intent") as s:
+                intent_info = await self.llm_service.classify_intent(query)
+                s.set(topic=str(intent_info.get("topic")))
             topic = intent_info.get("topic")
             
             # 2. Build Metadata Filter
@@ -191,3 +379,14 @@ class RetrievalService:
             await s3_sync_manager.sync_index_to_s3()
         except Exception as e:
             logger.error(f"Failed to delete document {filename}: {e}")
+
+
+_retrieval_service: Optional[RetrievalService] = None
+
+
+def get_retrieval_service() -> RetrievalService:
+    """The process-wide retrieval service, so indexes are loaded once and not per request."""
+    global _retrieval_service
+    if _retrieval_service is None:
+        _retrieval_service = RetrievalService()
+    return _retrieval_service
@@ -0,0 +1,287 @@
+"""
+Serving Snapshots
+- Read-only, memory-mapped copies of the BM25 and FAISS indexes for multi-process serving:
+  every uvicorn worker maps the same files, so the OS page cache holds one copy of the
+  postings, vectors and chunk texts however many workers run
+- Rows are grouped by source_topic, so a topic partition is a contiguous row range
+- BM25: CSC postings (term -> sorted rows + term frequencies) with the corpus-wide IDF; a query
+  reads only its terms' postings, sliced to the topic's rows (scores equal BM25Index)
+- Dense: float32 vectors + squared norms; exact L2 / inner-product scores with one
+  matrix-vector product per partition (scores equal faiss.IndexFlat)
+- The process that persists the indexes writes data/indexes/serving/<id>/ and publishes it by
+  atomically replacing the CURRENT pointer; readers reopen in the background when it changes
+"""
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from filelock import FileLock
+from loguru import logger
+
+from backend.utils.topic_partitions import topic_of, split_filter, matches_filter
+from backend.services.executors import executors
+
+SERVING_DIR = os.path.join("data", "indexes", "serving")
+KEEP_SNAPSHOTS = 2
+
+
+def _topic_order(metadatas: List[Dict[str, Any]]) -> Tuple[List[int], Dict[str, List[int]]]:
+    """Row order grouping each topic together, and topic -> [first row, end row)."""
+    order = sorted(range(len(metadatas)), key=lambda i: topic_of(metadatas[i]))
+    topics: Dict[str, List[int]] = {}
+    for row, i in enumerate(order):
+        topic = topic_of(metadatas[i])
+        if topic not in topics:
+            topics[topic] = [row, row]
+        topics[topic][1] = row + 1
+    return order, topics
+
+
+def _write_chunks(directory: str, prefix: str, contents: List[str], metadatas: List[Dict[str, Any]], order: List[int]):
+    offsets = [0]
+    with open(os.path.join(directory, f"{prefix}_chunks.jsonl"), "wb") as f:
+        for i in order:
+            line = json.dumps({"content": contents[i], "metadata": metadatas[i]}, ensure_ascii=False).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(directory, f"{prefix}_offsets.npy"), np.array(offsets, dtype=np.int64))
+
+
+def _write_bm25(directory: str, rows: Dict[str, Any]):
+    order, topics = _topic_order(rows["metadatas"])
+    vocab = list(rows["idf"])
+    columns = {term: col for col, term in enumerate(vocab)}
+    postings: List[List[Tuple[int, int]]] = [[] for _ in vocab]
+    doc_len = np.zeros(len(order), dtype=np.float32)
+    for row, i in enumerate(order):
+        tokens = rows["tokens"][i]
+        doc_len[row] = len(tokens)
+        for term, tf in Counter(tokens).items():
+            postings[columns[term]].append((row, tf))
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(p) for p in postings])
+    flat = [entry for p in postings for entry in p]
+    np.save(os.path.join(directory, "bm25_indptr.npy"), indptr)
+    np.save(os.path.join(directory, "bm25_rows.npy"), np.array([r for r, _ in flat], dtype=np.int32))
+    np.save(os.path.join(directory, "bm25_tf.npy"), np.array([tf for _, tf in flat], dtype=np.float32))
+    np.save(os.path.join(directory, "bm25_doc_len.npy"), doc_len)
+    np.save(os.path.join(directory, "bm25_idf.npy"), np.array([rows["idf"][t] for t in vocab], dtype=np.float64))
+    with open(os.path.join(directory, "bm25_meta.json"), "w") as f:
+        json.dump({"vocab": vocab, "topics": topics, "avgdl": rows["avgdl"], "k1": rows["k1"], "b": rows["b"]}, f)
+    _write_chunks(directory, "bm25", rows["contents"], rows["metadatas"], order)
+
+
+def _write_dense(directory: str, rows: Dict[str, Any]):
+    order, topics = _topic_order(rows["metadatas"])
+    vectors = np.ascontiguousarray(np.asarray(rows["vectors"], dtype=np.float32)[order])
+    np.save(os.path.join(directory, "dense_vectors.npy"), vectors)
+    np.save(os.path.join(directory, "dense_sq_norms.npy"), np.einsum("ij,ij->i", vectors, vectors))
+    with open(os.path.join(directory, "dense_meta.json"), "w") as f:
+        json.dump({"topics": topics, "metric": rows["metric"], "normalize": rows.get("normalize", False)}, f)
+    _write_chunks(directory, "dense", rows["contents"], rows["metadatas"], order)
+
+
+def write_snapshot(root: str, bm25: Optional[Dict[str, Any]] = None, dense: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Writes a snapshot and makes it CURRENT. Returns its directory.
+    bm25: tokens, contents, metadatas, idf (term -> idf), avgdl, k1, b
+    dense: vectors, contents, metadatas, metric ("l2" or "ip"), normalize
+    """
+    os.makedirs(root, exist_ok=True)
+    with FileLock(os.path.join(root, ".lock")):
+        snapshot_id = f"{time.time_ns()}-{os.getpid()}"
+        directory = os.path.join(root, snapshot_id)
+        os.makedirs(directory)
+        if bm25 and bm25["tokens"]:
+            _write_bm25(directory, bm25)
+        if dense and len(dense["vectors"]):
+            _write_dense(directory, dense)
+
+        tmp_path = os.path.join(root, f"CURRENT.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(snapshot_id)
+        os.replace(tmp_path, os.path.join(root, "CURRENT"))
+
+        # Workers still on an older snapshot keep their mappings after the files are unlinked
+        snapshots = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+        for old in snapshots[:-KEEP_SNAPSHOTS]:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return directory
+
+
+class _ChunkFile:
+    """Chunk i of a snapshot section, parsed on demand from the mapped JSON Lines file."""
+
+    def __init__(self, directory: str, prefix: str):
+        self.offsets = np.load(os.path.join(directory, f"{prefix}_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(directory, f"{prefix}_chunks.jsonl"), "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, row: int) -> Dict[str, Any]:
+        return json.loads(self._map[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+
+def _ranges(topics: Dict[str, List[int]], filter: Optional[Dict[str, Any]]) -> Tuple[List[List[int]], Dict[str, Any]]:
+    selected, rest = split_filter(filter)
+    if selected is None:
+        return list(topics.values()), rest
+    return [topics[t] for t in selected if t in topics], rest
+
+
+def _collect(chunks: _ChunkFile, rows: np.ndarray, scores: np.ndarray, top_k: int, rest: Dict[str, Any], descending: bool):
+    """Best-first results, reading (and post-filtering) only as many chunks as needed."""
+    ranked = np.argsort(-scores if descending else scores, kind="stable")
+    results = []
+    for pos in ranked:
+        chunk = chunks.get(int(rows[pos]))
+        if rest and not matches_filter(chunk["metadata"], rest):
+            continue
+        results.append({"content": chunk["content"], "metadata": chunk["metadata"], "score": float(scores[pos])})
+        if len(results) == top_k:
+            break
+    return results
+
+
+class ServingSnapshot:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.version = os.path.basename(directory)
+        self.bm25 = None
+        self.dense = None
+        if os.path.exists(os.path.join(directory, "bm25_meta.json")):
+            with open(os.path.join(directory, "bm25_meta.json")) as f:
+                meta = json.load(f)
+            load = lambda name: np.load(os.path.join(directory, f"bm25_{name}.npy"), mmap_mode="r")
+            self.bm25 = {
+                "vocab": {term: col for col, term in enumerate(meta["vocab"])},
+                "topics": meta["topics"], "avgdl": meta["avgdl"], "k1": meta["k1"], "b": meta["b"],
+                "indptr": load("indptr"), "rows": load("rows"), "tf": load("tf"),
+                "doc_len": load("doc_len"), "idf": load("idf"),
+                "chunks": _ChunkFile(directory, "bm25"),
+            }
+        if os.path.exists(os.path.join(directory, "dense_meta.json")):
+            with open(os.path.join(directory, "dense_meta.json")) as f:
+                meta = json.load(f)
+            self.dense = {
+                **meta,
+                "vectors": np.load(os.path.join(directory, "dense_vectors.npy"), mmap_mode="r"),
+                "sq_norms": np.load(os.path.join(directory, "dense_sq_norms.npy"), mmap_mode="r"),
+                "chunks": _ChunkFile(directory, "dense"),
+            }
+
+    def bm25_search(self, tokens: List[str], top_k: int = 20, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """BM25Okapi scores over the filter's topic rows only."""
+        index = self.bm25
+        if index is None or not tokens:
+            return []
+        k1, b, avgdl = index["k1"], index["b"], index["avgdl"]
+        ranges, rest = _ranges(index["topics"], filter)
+        all_rows, all_scores = [], []
+        for lo, hi in ranges:
+            scores = np.zeros(hi - lo, dtype=np.float64)
+            doc_len = np.asarray(index["doc_len"][lo:hi], dtype=np.float64)
+            for token in tokens:
+                col = index["vocab"].get(token)
+                if col is None:
+                    continue
+                start, end = int(index["indptr"][col]), int(index["indptr"][col + 1])
+                postings = index["rows"][start:end]
+                first, last = np.searchsorted(postings, lo), np.searchsorted(postings, hi)
+                rows = np.asarray(postings[first:last], dtype=np.int64) - lo
+                tf = np.asarray(index["tf"][start + first:start + last], dtype=np.float64)
+                scores[rows] += index["idf"][col] * (tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len[rows] / avgdl)))
+            hits = np.nonzero(scores > 0)[0]
+            all_rows.append(hits + lo)
+            all_scores.append(scores[hits])
+        if not all_rows:
+            return []
+        return _collect(index["chunks"], np.concatenate(all_rows), np.concatenate(all_scores), top_k, rest, descending=True)
+
+    def dense_search(self, vector, top_k: int = 20, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Exact nearest neighbours over the filter's topic rows (L2 distance or inner product)."""
+        index = self.dense
+        if index is None:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        if index["normalize"]:
+            query = query / max(float(np.linalg.norm(query)), 1e-12)
+        l2 = index["metric"] == "l2"
+        ranges, rest = _ranges(index["topics"], filter)
+        fetch_k = top_k * 4 if rest else top_k
+        all_rows, all_scores = [], []
+        for lo, hi in ranges:
+            dots = index["vectors"][lo:hi] @ query
+            scores = index["sq_norms"][lo:hi] - 2 * dots + float(query @ query) if l2 else dots
+            keep = min(fetch_k, hi - lo)
+            best = np.argpartition(scores if l2 else -scores, keep - 1)[:keep]
+            all_rows.append(best + lo)
+            all_scores.append(scores[best])
+        if not all_rows:
+            return []
+        return _collect(index["chunks"], np.concatenate(all_rows), np.concatenate(all_scores), top_k, rest, descending=not l2)
+
+
+class ServingSnapshots:
+    """
+    The CURRENT snapshot of a process. refresh() is cheap (one stat) and, when a newer
+    snapshot was published, opens it on a background thread; searches keep using the old
+    one until the swap.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or SERVING_DIR
+        self.snapshot: Optional[ServingSnapshot] = None
+        self._stamp = None
+        self._opening: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _pointer_stamp(self):
+        try:
+            st = os.stat(os.path.join(self.root, "CURRENT"))
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _open(self, stamp):
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                directory = os.path.join(self.root, f.read().strip())
+            snapshot = ServingSnapshot(directory)
+            self.snapshot = snapshot
+            with self._lock:
+                # Only a snapshot that opened is remembered; after a failure the next refresh retries
+                self._stamp = stamp
+            logger.info(f"Serving snapshot {snapshot.version} opened")
+        except Exception as e:
+            logger.error(f"Failed to open serving snapshot: {e}")
+        finally:
+            with self._lock:
+                self._opening = None
+
+    def refresh(self, wait: bool = False) -> Optional[ServingSnapshot]:
+        stamp = self._pointer_stamp()
+        with self._lock:
+            if stamp is None or stamp == self._stamp or self._opening is not None:
+                opening = self._opening
+            else:
+                opening = self._opening = threading.Thread(target=self._open, args=(stamp,), daemon=True)
+                opening.start()
+        if opening is not None and (wait or self.snapshot is None):
+            opening.join()
+        return self.snapshot
+
+    async def publish(self, bm25: Optional[Dict[str, Any]] = None, dense: Optional[Dict[str, Any]] = None):
+        loop = asyncio.get_event_loop()
+        directory = await loop.run_in_executor(executors.io, write_snapshot, self.root, bm25, dense)
+        logger.info(f"Serving snapshot published: {directory}")
+
+
+serving_snapshots = ServingSnapshots()
@@ -1,7 +1,7 @@
 from typing import Dict, Any, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.core.config import settings
-from backend.services.retrieval.semantic_search import RetrievalService
+from backend.services.retrieval.semantic_search import get_retrieval_service
 from backend.services.api_key_manager import APIKeyManager
 from backend.services.cloud_providers.factory import CloudProviderFactory
 from backend.services.cloud_providers.aws.dynamic_aws_handler import DynamicAWSHandler
@@ -10,7 +10,8 @@ from backend.services.llm_service import LLMService
 class QueryRouter:
     def __init__(self, db_session: AsyncSession):
         self.db = db_session
-        self.retrieval_service = RetrievalService()
+        # Shared across requests: the indexes are loaded once and hot-swapped by the index watcher
+        self.retrieval_service = get_retrieval_service()
         self.key_manager = APIKeyManager()
         self.llm_service = LLMService()
 
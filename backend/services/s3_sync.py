@@ -8,12 +8,20 @@ Organized by service and file type.
 import asyncio
 import json
 import os
-import boto3
 import numpy as np
 from datetime import datetime, timezone
+from typing import Optional
 from loguru import logger
 from botocore.exceptions import ClientError, NoCredentialsError
 from backend.core.config import settings
+from backend.utils.chunk_artifacts import (
+    artifact_header, artifact_name, chunk_text, read_chunk_artifact, write_chunk_artifact,
+    CHUNKS_SUFFIX, EMBEDDINGS_SUFFIX, METADATA_SUFFIX
+)
+from backend.utils.chunk_cache import hash_file
+from backend.services.s3_transfer import S3Transfer, build_client
+from backend.services.index_replication import IndexReplicator
+from backend.services.executors import executors
 
 
 class S3SyncManager:
@@ -23,12 +31,11 @@ class S3SyncManager:
         
         if self.enabled:
             try:
-                self.s3 = boto3.client(
-                    "s3",
-                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                    region_name=settings.AWS_REGION or "us-east-1"
-                )
+                self.s3 = build_client()
+                # Shared pool + multipart tuning for every transfer below
+                self.transfer = S3Transfer(self.s3, self.bucket)
+                # Segment + manifest replication of the FAISS/BM25 indexes
+                self.index_replicator = IndexReplicator(self)
                 logger.info(
                     f"S3SyncManager initialized for: "
                     f"s3://{self.bucket}"
@@ -50,6 +57,12 @@ class S3SyncManager:
         
         self._sync_lock = asyncio.Lock()
         self._pending_syncs = 0
+        # The startup pull runs once; later callers await the same task
+        self._pull_task: Optional[asyncio.Future] = None
+
+    async def run_io(self, fn, *args, **kwargs):
+        """Runs a blocking S3 call on the dedicated S3 thread pool."""
+        return await self.transfer.run(fn, *args, **kwargs)
 
     def _get_s3_key(self, prefix: str, 
                     service: str, 
@@ -63,11 +76,13 @@ class S3SyncManager:
         service: str,
         file_path: str,
         chunks: list,
-        embeddings: list
+        embeddings,
+        sync_shared: bool = True
     ):
         """
         Main entry point. Called after every upload.
         Waits 5 seconds then syncs everything to S3.
+        sync_shared=False skips the shared index/registry (batch uploads sync those once at the end).
         """
         if not self.enabled:
             return
@@ -81,14 +96,21 @@ class S3SyncManager:
         await asyncio.sleep(settings.S3_SYNC_DELAY_SECONDS)
         
         logger.info(f"S3 sync starting (Phase 1: File Specific) for {filename}")
-        
+
+        # The content hash ties the chunk artifact to the exact document bytes (warm-start check)
+        loop = asyncio.get_event_loop()
+        try:
+            content_hash = await loop.run_in_executor(executors.io, hash_file, file_path)
+        except OSError:
+            content_hash = None
+
         # Run file-specific syncs concurrently
         await asyncio.gather(
             self._upload_original_document(
-                filename, service, file_path
+                filename, service, file_path, content_hash
             ),
             self._upload_chunks(
-                filename, service, chunks
+                filename, service, chunks, content_hash
             ),
             self._upload_embeddings(
                 filename, service, embeddings
@@ -99,22 +121,23 @@ class S3SyncManager:
             return_exceptions=True
         )
         
-        # Phase 2: Shared Index/Registry Sync (Debounced)
-        async with self._sync_lock:
-            self._pending_syncs += 1
+        if sync_shared:
+            # Phase 2: Shared Index/Registry Sync (Debounced)
+            async with self._sync_lock:
+                self._pending_syncs += 1
             
-        # Wait a bit more to catch other concurrent uploads
-        await asyncio.sleep(2)
+            # Wait a bit more to catch other concurrent uploads
+            await asyncio.sleep(2)
         
-        async with self._sync_lock:
-            if self._pending_syncs > 0:
-                logger.info(f"S3 sync Phase 2 (Shared Index/Registry) starting. Pending: {self._pending_syncs}")
-                await asyncio.gather(
-                    self._upload_registry(),
-                    self._upload_faiss_index(),
-                    return_exceptions=True
-                )
-                self._pending_syncs = 0
+            async with self._sync_lock:
+                if self._pending_syncs > 0:
+                    logger.info(f"S3 sync Phase 2 (Shared Index/Registry) starting. Pending: {self._pending_syncs}")
+                    await asyncio.gather(
+                        self._upload_registry(),
+                        self._upload_index_segments(),
+                        return_exceptions=True
+                    )
+                    self._pending_syncs = 0
         
         logger.info(
             f"S3 sync complete for {filename} "
@@ -124,7 +147,8 @@ class S3SyncManager:
     async def _upload_original_document(
         self, filename: str, 
         service: str, 
-        file_path: str
+        file_path: str,
+        content_hash: Optional[str] = None
     ):
         """Upload original PDF to documents/service/"""
         try:
@@ -133,23 +157,20 @@ class S3SyncManager:
                 service,
                 filename
             )
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.upload_file(
-                    file_path,
-                    self.bucket,
-                    key,
-                    ExtraArgs={
-                        "Metadata": {
-                            "service": service,
-                            "uploaded": datetime.now(
-                                timezone.utc
-                            ).isoformat(),
-                            "source": "cloud-intelligence-rag"
-                        }
+            extra_metadata = {"sha256": content_hash} if content_hash else {}
+            await self.transfer.upload_file(
+                file_path,
+                key,
+                extra_args={
+                    "Metadata": {
+                        "service": service,
+                        "uploaded": datetime.now(
+                            timezone.utc
+                        ).isoformat(),
+                        "source": "cloud-intelligence-rag",
+                        **extra_metadata
                     }
-                )
+                }
             )
             logger.info(
                 f"S3 ✅ Document uploaded: "
@@ -169,11 +190,7 @@ class S3SyncManager:
         try:
             key = self._get_s3_key(settings.S3_DOCUMENTS_PREFIX, service, filename)
             # Verify existence in S3
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.head_object(Bucket=self.bucket, Key=key)
-            )
+            await self.run_io(self.s3.head_object, Bucket=self.bucket, Key=key)
             
             # If we are here, file exists in S3. 
             # Safe to delete local copy.
@@ -186,26 +203,82 @@ class S3SyncManager:
             
         return False
 
-    async def download_document(self, filename: str, service: str, target_path: str):
-        """Downloads a document from S3 to local storage."""
+    async def download_document(self, filename: str, service: str, target_path: str, key: Optional[str] = None):
+        """Downloads a document from S3 to local storage. `key` overrides the service-derived key."""
         if not self.enabled:
             raise Exception("S3 sync is disabled.")
             
         try:
-            key = self._get_s3_key(settings.S3_DOCUMENTS_PREFIX, service, filename)
-            os.makedirs(os.path.dirname(target_path), exist_ok=True)
-            
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.download_file(self.bucket, key, target_path)
-            )
+            key = key or self._get_s3_key(settings.S3_DOCUMENTS_PREFIX, service, filename)
+            await self.transfer.download_file(key, target_path)
             logger.info(f"S3 ✅ Downloaded {filename} from S3.")
             return target_path
         except Exception as e:
             logger.error(f"S3 ❌ Failed to download {filename}: {e}")
             raise
 
+    async def get_document_hash(self, key: str) -> Optional[str]:
+        """Returns the sha256 recorded in a document's S3 metadata (None for older uploads)."""
+        try:
+            head = await self.run_io(self.s3.head_object, Bucket=self.bucket, Key=key)
+            return head.get("Metadata", {}).get("sha256")
+        except Exception as e:
+            logger.warning(f"S3: Could not read metadata of {key}: {e}")
+            return None
+
+    async def load_document_artifacts(self, filename: str, service: str) -> Optional[dict]:
+        """
+        Loads the chunk artifact and embedding matrix backed up for a document.
+        Returns {"header", "chunks", "embeddings"} (embeddings may be None), or None if
+        there is no chunk artifact.
+        """
+        if not self.enabled:
+            return None
+
+        chunks_key = self._get_s3_key(
+            settings.S3_CHUNKS_PREFIX, service, artifact_name(filename, CHUNKS_SUFFIX)
+        )
+        embeddings_key = self._get_s3_key(
+            settings.S3_EMBEDDINGS_PREFIX, service, artifact_name(filename, EMBEDDINGS_SUFFIX)
+        )
+        def _get_body(key: str):
+            try:
+                return self.s3.get_object(Bucket=self.bucket, Key=key)["Body"]
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                    return None
+                raise
+
+        def _load_chunks():
+            body = _get_body(chunks_key)
+            if body is None:
+                return None
+            # Decompressed and parsed line by line straight off the response stream
+            with body:
+                return read_chunk_artifact(body)
+
+        def _load_embeddings():
+            body = _get_body(embeddings_key)
+            if body is None:
+                return None
+            import io
+            with body:
+                return np.load(io.BytesIO(body.read()), allow_pickle=False)
+
+        try:
+            loaded_chunks, embeddings = await asyncio.gather(
+                self.run_io(_load_chunks),
+                self.run_io(_load_embeddings)
+            )
+        except Exception as e:
+            logger.warning(f"S3: Could not load artifacts for {filename}: {e}")
+            return None
+        if loaded_chunks is None:
+            return None
+
+        header, chunks = loaded_chunks
+        return {"header": header, "chunks": chunks, "embeddings": embeddings}
+
     async def upload_generic_asset(self, file_path: str, s3_prefix: str):
         """Uploads any file to S3 under a specific prefix."""
         if not self.enabled:
@@ -215,15 +288,10 @@ class S3SyncManager:
             filename = os.path.basename(file_path)
             key = f"{s3_prefix}{filename}"
             
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.upload_file(
-                    file_path, 
-                    self.bucket, 
-                    key,
-                    ExtraArgs={"ContentType": "application/pdf" if filename.endswith(".pdf") else "application/json"}
-                )
+            await self.transfer.upload_file(
+                file_path,
+                key,
+                extra_args={"ContentType": "application/pdf" if filename.endswith(".pdf") else "application/json"}
             )
             logger.info(f"S3 ✅ Asset uploaded: s3://{self.bucket}/{key}")
             return True
@@ -235,59 +303,44 @@ class S3SyncManager:
         self,
         filename: str,
         service: str,
-        chunks: list
+        chunks: list,
+        content_hash: Optional[str] = None
     ):
-        """Upload text chunks as JSON"""
+        """
+        Upload text chunks as a gzip JSON Lines artifact (see backend/utils/chunk_artifacts.py).
+        The file is written chunk by chunk to a temp file and sent with a managed
+        (multipart above the threshold) upload instead of one in-memory put_object.
+        """
+        import tempfile
+        tmp_path = None
         try:
-            chunks_data = []
-            for i, chunk in enumerate(chunks):
-                chunks_data.append({
-                    "chunk_index": i,
-                    "text": chunk.page_content 
-                            if hasattr(chunk, "page_content") 
-                            else str(chunk),
-                    "metadata": chunk.metadata 
-                                if hasattr(chunk, "metadata") 
-                                else {},
-                    "char_count": len(
-                        chunk.page_content 
-                        if hasattr(chunk, "page_content") 
-                        else str(chunk)
-                    )
-                })
-
-            chunks_filename = filename.replace(
-                ".pdf", "_chunks.json"
-            )
             key = self._get_s3_key(
                 settings.S3_CHUNKS_PREFIX,
                 service,
-                chunks_filename
+                artifact_name(filename, CHUNKS_SUFFIX)
+            )
+            header = artifact_header(
+                filename, service, len(chunks), content_hash
             )
 
-            chunks_json = json.dumps({
-                "filename": filename,
-                "service": service,
-                "total_chunks": len(chunks_data),
-                "created": datetime.now(
-                    timezone.utc
-                ).isoformat(),
-                "chunks": chunks_data
-            }, indent=2)
+            with tempfile.NamedTemporaryFile(
+                suffix=CHUNKS_SUFFIX, delete=False
+            ) as tmp:
+                tmp_path = tmp.name
 
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.put_object(
-                    Bucket=self.bucket,
-                    Key=key,
-                    Body=chunks_json.encode("utf-8"),
-                    ContentType="application/json"
-                )
+            written = await loop.run_in_executor(
+                executors.io, write_chunk_artifact, tmp_path, header, chunks
+            )
+            await self.transfer.upload_file(
+                tmp_path,
+                key,
+                extra_args={"ContentType": "application/gzip"}
             )
             logger.info(
                 f"S3 ✅ Chunks uploaded "
-                f"({len(chunks_data)} chunks): "
+                f"({written} chunks, "
+                f"{os.path.getsize(tmp_path) // 1024} KB): "
                 f"s3://{self.bucket}/{key}"
             )
         except Exception as e:
@@ -295,16 +348,19 @@ class S3SyncManager:
                 f"S3 ❌ Chunks upload failed "
                 f"for {filename}: {e}"
             )
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
 
     async def _upload_embeddings(
         self,
         filename: str,
         service: str,
-        embeddings: list
+        embeddings
     ):
-        """Upload raw embedding vectors as .npy file"""
+        """Upload raw embedding vectors as float32 .npy (rows align with the chunk artifact's chunk_id)"""
         try:
-            if not embeddings:
+            if embeddings is None or len(embeddings) == 0:
                 logger.warning(
                     f"S3: No embeddings to upload "
                     f"for {filename}"
@@ -312,9 +368,9 @@ class S3SyncManager:
                 return
 
             import tempfile
-            embeddings_array = np.array(embeddings)
-            embeddings_filename = filename.replace(
-                ".pdf", "_embeddings.npy"
+            embeddings_array = np.asarray(embeddings, dtype=np.float32)
+            embeddings_filename = artifact_name(
+                filename, EMBEDDINGS_SUFFIX
             )
             key = self._get_s3_key(
                 settings.S3_EMBEDDINGS_PREFIX,
@@ -329,15 +385,7 @@ class S3SyncManager:
                 np.save(tmp.name, embeddings_array)
                 tmp_path = tmp.name
 
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.upload_file(
-                    tmp_path,
-                    self.bucket,
-                    key
-                )
-            )
+            await self.transfer.upload_file(tmp_path, key)
             os.unlink(tmp_path)
 
             logger.info(
@@ -359,8 +407,8 @@ class S3SyncManager:
     ):
         """Upload document metadata summary"""
         try:
-            meta_filename = filename.replace(
-                ".pdf", "_meta.json"
+            meta_filename = artifact_name(
+                filename, METADATA_SUFFIX
             )
             key = self._get_s3_key(
                 settings.S3_METADATA_PREFIX,
@@ -370,12 +418,7 @@ class S3SyncManager:
 
             # Calculate stats
             total_chars = sum(
-                len(
-                    c.page_content 
-                    if hasattr(c, "page_content") 
-                    else str(c)
-                )
-                for c in chunks
+                len(chunk_text(c)) for c in chunks
             )
 
             metadata = {
@@ -400,28 +443,25 @@ class S3SyncManager:
                         f"s3://{self.bucket}/"
                         f"{settings.S3_CHUNKS_PREFIX}"
                         f"{service}/"
-                        f"{filename.replace('.pdf','_chunks.json')}"
+                        f"{artifact_name(filename, CHUNKS_SUFFIX)}"
                     ),
                     "embeddings": (
                         f"s3://{self.bucket}/"
                         f"{settings.S3_EMBEDDINGS_PREFIX}"
                         f"{service}/"
-                        f"{filename.replace('.pdf','_embeddings.npy')}"
+                        f"{artifact_name(filename, EMBEDDINGS_SUFFIX)}"
                     )
                 }
             }
 
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.put_object(
-                    Bucket=self.bucket,
-                    Key=key,
-                    Body=json.dumps(
-                        metadata, indent=2
-                    ).encode("utf-8"),
-                    ContentType="application/json"
-                )
+            await self.run_io(
+                self.s3.put_object,
+                Bucket=self.bucket,
+                Key=key,
+                Body=json.dumps(
+                    metadata, indent=2
+                ).encode("utf-8"),
+                ContentType="application/json"
             )
             logger.info(
                 f"S3 ✅ Metadata uploaded: "
@@ -446,15 +486,7 @@ class S3SyncManager:
                 f"{settings.S3_REGISTRY_PREFIX}"
                 f"uploaded_docs_registry.json"
             )
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.upload_file(
-                    registry_path,
-                    self.bucket,
-                    key
-                )
-            )
+            await self.transfer.upload_file(registry_path, key, track=True)
             logger.info(
                 f"S3 ✅ Registry synced: "
                 f"s3://{self.bucket}/{key}"
@@ -464,38 +496,13 @@ class S3SyncManager:
                 f"S3 ❌ Registry sync failed: {e}"
             )
 
-    async def _upload_faiss_index(self):
-        """Sync FAISS index files to S3"""
+    async def _upload_index_segments(self):
+        """Publish the index changes since the last sync as a new segment + manifest version"""
         try:
-            faiss_dir = "data/indexes/faiss"
-            if not os.path.exists(faiss_dir):
-                return
-
-            for fname in ["index.faiss", "index.pkl"]:
-                fpath = os.path.join(faiss_dir, fname)
-                if not os.path.exists(fpath):
-                    continue
-
-                key = (
-                    f"{settings.S3_INDEXES_PREFIX}"
-                    f"faiss/{fname}"
-                )
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(
-                    None,
-                    lambda p=fpath, k=key: (
-                        self.s3.upload_file(
-                            p, self.bucket, k
-                        )
-                    )
-                )
-                logger.info(
-                    f"S3 ✅ FAISS index synced: "
-                    f"s3://{self.bucket}/{key}"
-                )
+            await self.index_replicator.push()
         except Exception as e:
             logger.error(
-                f"S3 ❌ FAISS index sync failed: {e}"
+                f"S3 ❌ Index segment sync failed: {e}"
             )
 
     async def pull_index_from_s3(self):
@@ -506,7 +513,17 @@ class S3SyncManager:
         """Public method to sync vector index to S3"""
         if not self.enabled:
             return
-        await self._upload_faiss_index()
+        await self._upload_index_segments()
+
+    async def sync_shared_to_s3(self):
+        """Syncs the shared index and registry once, e.g. at the end of a batch upload."""
+        if not self.enabled:
+            return
+        await asyncio.gather(
+            self._upload_registry(),
+            self._upload_index_segments(),
+            return_exceptions=True
+        )
 
     async def pull_registry_from_s3(self):
         """Public method to pull the document registry from S3."""
@@ -514,16 +531,22 @@ class S3SyncManager:
             return
         await self._pull_registry()
 
-    async def pull_all_from_s3(self):
+    async def pull_all_from_s3(self, force: bool = False):
         """
         On startup: pull everything from S3 
         so new users have instant access.
         Downloads indexes and registry only
-        (not all PDFs to save disk space).
+        (not all PDFs to save disk space),
+        and only the files whose ETag changed.
+        Runs once per process unless force=True.
         """
         if not self.enabled:
             return
+        if self._pull_task is None or force:
+            self._pull_task = asyncio.ensure_future(self._pull_all())
+        await self._pull_task
 
+    async def _pull_all(self):
         logger.info(
             "S3: Pulling latest indexes "
             "and registry from S3..."
@@ -538,31 +561,68 @@ class S3SyncManager:
         logger.info("S3: Pull complete.")
 
     async def _pull_faiss_index(self):
-        """Download FAISS index from S3 on startup"""
+        """Bring the local indexes up to the S3 manifest (only missing segments are downloaded)"""
+        try:
+            if await self.index_replicator.pull():
+                return
+        except Exception as e:
+            logger.warning(
+                f"S3: Could not pull index segments: {e}"
+            )
+            return
+        # Buckets without a manifest still hold the legacy whole-file index
+        await self._pull_legacy_faiss_index()
+
+    async def pull_shared_index(self):
+        """Brings the local index files up to S3 again (used by the index watcher after startup)"""
+        if not self.enabled:
+            return
+        await self._pull_faiss_index()
+
+    def _legacy_index_files(self):
+        return [
+            (f"{settings.S3_INDEXES_PREFIX}faiss/{fname}", f"data/indexes/faiss/{fname}")
+            for fname in ["index.faiss", "index.pkl"]
+        ]
+
+    async def remote_index_version(self) -> Optional[str]:
+        """Version of the index published in S3: the manifest version, or the legacy index ETag"""
+        manifest = await self.index_replicator.get_manifest()
+        if manifest is not None:
+            return f"v{manifest['version']}"
+        key, _ = self._legacy_index_files()[0]
+        try:
+            head = await self.run_io(self.s3.head_object, Bucket=self.bucket, Key=key)
+        except ClientError:
+            return None
+        return head["ETag"]
+
+    def local_index_version(self) -> Optional[str]:
+        """Version of the index files on this node, comparable with remote_index_version()"""
+        version = self.index_replicator.local_version()
+        if version:
+            return f"v{version}"
+        _, path = self._legacy_index_files()[0]
+        return self.transfer.state.etag(path)
+
+    async def _pull_legacy_faiss_index(self):
+        """Download the whole-file FAISS index written before segment replication"""
         try:
             os.makedirs(
                 "data/indexes/faiss", exist_ok=True
             )
-            for fname in ["index.faiss", "index.pkl"]:
-                key = (
-                    f"{settings.S3_INDEXES_PREFIX}"
-                    f"faiss/{fname}"
-                )
-                local_path = (
-                    f"data/indexes/faiss/{fname}"
-                )
-                loop = asyncio.get_event_loop()
-                await loop.run_in_executor(
-                    None,
-                    lambda k=key, p=local_path: (
-                        self.s3.download_file(
-                            self.bucket, k, p
-                        )
+            files = self._legacy_index_files()
+            results = await asyncio.gather(
+                *(self.transfer.download_if_changed(key, path) for key, path in files),
+                return_exceptions=True
+            )
+            for (key, _), result in zip(files, results):
+                if isinstance(result, Exception):
+                    raise result
+                if result:
+                    logger.info(
+                        f"S3: Downloaded {os.path.basename(key)} from S3"
                     )
-                )
-                logger.info(
-                    f"S3: Downloaded {fname} from S3"
-                )
         except Exception as e:
             logger.warning(
                 f"S3: Could not pull FAISS index: {e}"
@@ -578,15 +638,10 @@ class S3SyncManager:
             local_path = (
                 "data/uploaded_docs_registry.json"
             )
-            os.makedirs("data", exist_ok=True)
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None,
-                lambda: self.s3.download_file(
-                    self.bucket, key, local_path
-                )
-            )
-            logger.info("S3: Registry pulled from S3")
+            if await self.transfer.download_if_changed(key, local_path):
+                from backend.utils.source_validator import document_registry
+                document_registry.reload()
+                logger.info("S3: Registry pulled from S3")
         except Exception as e:
             logger.warning(
                 f"S3: Could not pull registry: {e}"
@@ -610,9 +665,7 @@ class S3SyncManager:
                 "total_size_mb": 0
             }
 
-            loop = asyncio.get_event_loop()
-            pages = await loop.run_in_executor(
-                None,
+            pages = await self.run_io(
                 lambda: list(
                     paginator.paginate(Bucket=self.bucket)
                 )
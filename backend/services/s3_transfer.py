@@ -0,0 +1,152 @@
+"""
+S3 Transfer Layer
+- One boto3 client per process with a connection pool sized for parallel transfers
+- Tuned multipart thresholds / part size / per-file concurrency (boto3 TransferConfig)
+- Transfers run on the bounded io executor (backend/services/executors.py) instead of the
+  default event-loop executor
+- Async helpers that move many files in parallel
+- Conditional pulls: a file is only downloaded when its S3 ETag differs from the one last
+  pulled or pushed by this node, into a temp file that atomically replaces the local copy
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Optional, Dict, Any, Callable
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from loguru import logger
+
+from backend.core.config import settings
+from backend.services.executors import executors
+from backend.utils.atomic_files import write_json_atomic
+
+MB = 1024 * 1024
+TRANSFER_STATE_PATH = os.path.join("data", "s3_transfer_state.json")
+
+
+def build_transfer_config() -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * MB,
+        multipart_chunksize=settings.S3_MULTIPART_CHUNKSIZE_MB * MB,
+        max_concurrency=settings.S3_MAX_CONCURRENCY,
+        use_threads=True
+    )
+
+
+def build_client(endpoint_url: Optional[str] = None):
+    """S3 client whose HTTP pool fits every transfer thread plus their multipart workers."""
+    return boto3.client(
+        "s3",
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_REGION or "us-east-1",
+        endpoint_url=endpoint_url or settings.S3_ENDPOINT_URL,
+        config=Config(
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 5, "mode": "adaptive"}
+        )
+    )
+
+
+class TransferState:
+    """ETag of every local file as last pulled from / pushed to S3, persisted across restarts."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or TRANSFER_STATE_PATH
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def etag(self, local_path: str) -> Optional[str]:
+        entry = self._entries.get(os.path.abspath(local_path))
+        return entry["etag"] if entry and os.path.exists(local_path) else None
+
+    def record(self, local_path: str, key: str, etag: str):
+        with self._lock:
+            self._entries[os.path.abspath(local_path)] = {"key": key, "etag": etag}
+            # Unique temp file: other processes record into the same state file
+            write_json_atomic(self.path, self._entries)
+
+
+class S3Transfer:
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        transfer_config: Optional[TransferConfig] = None,
+        max_workers: Optional[int] = None,
+        state: Optional[TransferState] = None
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.transfer_config = transfer_config or build_transfer_config()
+        self.state = state or TransferState()
+        # A private pool only when sized explicitly (benchmarks); otherwise the shared io executor
+        self._owns_executor = max_workers is not None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-io") \
+            if self._owns_executor else executors.io
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Runs a blocking S3 call on the S3 thread pool."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, lambda: fn(*args, **kwargs))
+
+    async def upload_file(self, path: str, key: str, extra_args: Optional[Dict[str, Any]] = None, track: bool = False):
+        """track=True records the new ETag so this node's next conditional pull skips its own upload."""
+        await self.run(
+            self.client.upload_file, path, self.bucket, key,
+            ExtraArgs=extra_args, Config=self.transfer_config
+        )
+        if track:
+            head = await self.run(self.client.head_object, Bucket=self.bucket, Key=key)
+            self.state.record(path, key, head["ETag"])
+
+    async def download_file(self, key: str, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        await self.run(self.client.download_file, self.bucket, key, path, Config=self.transfer_config)
+
+    async def download_if_changed(self, key: str, path: str) -> bool:
+        """
+        Downloads `key` only if its ETag differs from the local copy's recorded ETag.
+        The download lands in a temp file that replaces `path` atomically. Returns True if downloaded.
+        """
+        head = await self.run(self.client.head_object, Bucket=self.bucket, Key=key)
+        if self.state.etag(path) == head["ETag"]:
+            logger.info(f"S3: {os.path.basename(path)} unchanged (ETag {head['ETag'].strip(chr(34))[:12]}), skipping")
+            return False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.part"
+        try:
+            await self.run(self.client.download_file, self.bucket, key, tmp_path, Config=self.transfer_config)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        # download_file does not accept IfMatch, so only record the ETag if the object did not
+        # change mid-download; otherwise the next pull fetches it again
+        after = await self.run(self.client.head_object, Bucket=self.bucket, Key=key)
+        if after["ETag"] == head["ETag"]:
+            self.state.record(path, key, head["ETag"])
+        return True
+
+    async def upload_many(self, files: List[Tuple[str, str]]) -> List[Any]:
+        """Uploads [(local_path, key)] in parallel. Returns one result or exception per file."""
+        return await asyncio.gather(*(self.upload_file(path, key) for path, key in files), return_exceptions=True)
+
+    async def download_many(self, files: List[Tuple[str, str]]) -> List[Any]:
+        """Downloads [(key, local_path)] in parallel. Returns one result or exception per file."""
+        return await asyncio.gather(*(self.download_file(key, path) for key, path in files), return_exceptions=True)
+
+    def shutdown(self):
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+            logger.info("S3 transfer pool shut down")
@@ -0,0 +1,53 @@
+"""
+Serving Role
+- With SERVING_WORKERS > 1 every uvicorn worker runs the same startup; exactly one of them
+  becomes the primary by taking data/serving_primary.lock (non-blocking, held until exit)
+- The primary pulls from S3, bootstraps, runs the ingestion workers and the index watcher, and
+  publishes serving snapshots; the other workers only search the snapshots
+- A single worker is always the primary
+"""
+import os
+from typing import Optional
+
+from filelock import FileLock, Timeout
+from loguru import logger
+
+from backend.core.config import settings
+
+PRIMARY_LOCK_PATH = os.path.join("data", "serving_primary.lock")
+
+
+class ServingRole:
+    def __init__(self, lock_path: str = PRIMARY_LOCK_PATH, workers: Optional[int] = None):
+        self.lock_path = lock_path
+        self.workers = settings.SERVING_WORKERS if workers is None else workers
+        self._lock: Optional[FileLock] = None
+        self._primary: Optional[bool] = None
+
+    @property
+    def is_primary(self) -> bool:
+        if self._primary is None:
+            self._primary = self.workers <= 1 or self._acquire()
+        return self._primary
+
+    def _acquire(self) -> bool:
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        lock = FileLock(self.lock_path)
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            logger.info(f"Serving replica (pid {os.getpid()}): searching shared index snapshots")
+            return False
+        # Released by the OS when this process exits, so a restarted worker can take over
+        self._lock = lock
+        logger.info(f"Serving primary (pid {os.getpid()}): ingests and publishes index snapshots")
+        return True
+
+    def release(self):
+        if self._lock is not None:
+            self._lock.release()
+            self._lock = None
+            self._primary = None
+
+
+serving_role = ServingRole()
@@ -0,0 +1,285 @@
+"""
+Request Tracing
+- Span timings for one chat request (intent, BM25, dense, fusion, FlashRank, cross-encoder,
+  prompt build, generation, judge, regeneration), carried across awaits and asyncio tasks in
+  contextvars; span() outside a trace is a no-op
+- Finished traces go to a JSON Lines sink (TRACE_JSON_PATH) and/or the OpenTelemetry SDK
+  (TRACE_OTEL_ENABLED, OTLP when TRACE_OTLP_ENDPOINT is set; optional dependency)
+- The JSON Lines file is appended by a background thread: finishing a trace on the event loop
+  only queues its line, and lines are dropped (and counted) if the writer falls far behind
+- Rolling p50/p95/p99 per span name at GET /metrics/traces; ChatRequest.debug returns the
+  request's spans in ChatResponse.trace
+- Spans are opened on the event loop around awaits: executor threads do not inherit the context
+"""
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from backend.core.config import settings
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "_start", "duration_ms", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        self.end_ns = self.start_ns + int(self.duration_ms * 1e6)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """What span() yields outside a trace, so callers can set attributes unconditionally."""
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, None, attributes)
+        self.spans: List[Span] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "duration_ms": self.root.duration_ms,
+            "spans": [self.root.to_dict()] + [s.to_dict() for s in self.spans],
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class JsonLinesSink:
+    def __init__(self, path: str, max_pending: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self._pending: "queue.Queue[str]" = queue.Queue(maxsize=max_pending)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), default=str) + "\n"
+        self._start_writer()
+        try:
+            self._pending.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every queued line is on disk, or `timeout` passes. Returns False on timeout."""
+        pending = self._pending
+        with pending.all_tasks_done:
+            return pending.all_tasks_done.wait_for(lambda: not pending.unfinished_tasks, timeout)
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run, name="trace-jsonl-writer", daemon=True)
+                    self._writer.start()
+
+    def _run(self):
+        while True:
+            lines = [self._pending.get()]
+            # Whatever queued meanwhile goes out in the same append
+            while True:
+                try:
+                    lines.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(lines)
+            except Exception as e:
+                logger.warning(f"Trace export to {self.path} failed: {e}")
+            finally:
+                for _ in lines:
+                    self._pending.task_done()
+
+    def _write(self, lines: List[str]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+
+
+class OpenTelemetrySink:
+    """Replays finished traces into the OpenTelemetry SDK with their recorded timestamps."""
+
+    def __init__(self, endpoint: Optional[str] = None):
+        from opentelemetry import trace as otel_trace
+
+        if endpoint:
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+            otel_trace.set_tracer_provider(provider)
+        self._otel = otel_trace
+        self._tracer = otel_trace.get_tracer("aws-rag-bot")
+
+    def export(self, trace: Trace):
+        started = {}
+        for span in [trace.root] + sorted(trace.spans, key=lambda s: s.start_ns):
+            parent = started.get(span.parent_id)
+            context = self._otel.set_span_in_context(parent) if parent is not None else None
+            otel_span = self._tracer.start_span(
+                span.name, context=context, start_time=span.start_ns,
+                attributes={k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in span.attributes.items()}
+            )
+            if span.error:
+                otel_span.set_status(self._otel.Status(self._otel.StatusCode.ERROR, span.error))
+            started[span.span_id] = otel_span
+        for span in trace.spans + [trace.root]:
+            started[span.span_id].end(end_time=span.end_ns)
+
+
+class Tracer:
+    def __init__(self, enabled: Optional[bool] = None, sinks: Optional[List[Any]] = None, window: int = 2000):
+        self.enabled = settings.TRACING_ENABLED if enabled is None else enabled
+        self._sinks = sinks
+        self._durations: Dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    @property
+    def sinks(self) -> List[Any]:
+        if self._sinks is None:
+            self._sinks = []
+            if settings.TRACE_JSON_PATH:
+                self._sinks.append(JsonLinesSink(settings.TRACE_JSON_PATH))
+            if settings.TRACE_OTEL_ENABLED:
+                try:
+                    self._sinks.append(OpenTelemetrySink(settings.TRACE_OTLP_ENDPOINT))
+                except Exception as e:
+                    logger.warning(f"OpenTelemetry export disabled: {e}")
+        return self._sinks
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Optional[Trace]]:
+        """Starts a request trace; exported when the block exits."""
+        if not self.enabled:
+            yield None
+            return
+        current = Trace(name, attributes)
+        trace_token = _current_trace.set(current)
+        span_token = _current_span.set(current.root)
+        try:
+            yield current
+        except BaseException as e:
+            current.root.error = repr(e)
+            raise
+        finally:
+            current.root.finish()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self._finish(current)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Any]:
+        """Times a stage of the current trace (a no-op outside one)."""
+        current = _current_trace.get()
+        if current is None:
+            yield _NOOP_SPAN
+            return
+        parent = _current_span.get()
+        span = Span(name, parent.span_id if parent else current.root.span_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = repr(e)
+            raise
+        finally:
+            span.finish()
+            _current_span.reset(token)
+            current.spans.append(span)
+
+    def _finish(self, trace: Trace):
+        with self._lock:
+            for span in [trace.root] + trace.spans:
+                self._durations.setdefault(span.name, deque(maxlen=self._window)).append(span.duration_ms)
+        for sink in self.sinks:
+            try:
+                sink.export(trace)
+            except Exception as e:
+                logger.warning(f"Trace export to {type(sink).__name__} failed: {e}")
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for background sinks to write what they have queued (tests, shutdown), sharing one
+        `timeout` across sinks. Returns False if it ran out, leaving the rest to be dropped.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for sink in self._sinks or []:
+            if not hasattr(sink, "flush"):
+                continue
+            remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            if not sink.flush(timeout=remaining):
+                logger.warning(f"Gave up flushing {type(sink).__name__} after {timeout}s")
+                return False
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Latency percentiles per span name over the last `window` traces."""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self._durations.items()}
+        return {
+            name: {
+                "count": len(values),
+                "p50_ms": _percentile(values, 0.50),
+                "p95_ms": _percentile(values, 0.95),
+                "p99_ms": _percentile(values, 0.99),
+                "max_ms": values[-1],
+            }
+            for name, values in snapshot.items() if values
+        }
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    idx = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return round(sorted_values[idx], 2)
+
+
+tracer = Tracer()
+span = tracer.span
@@ -3,8 +3,19 @@ from typing import List, Dict, Any, Optional
 
 class VectorStoreBase(ABC):
     @abstractmethod
-    async def add_documents(self, documents: List[Dict[str, Any]]):
-        """Add list of documents (content + metadata) to the store."""
+    async def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
+        """Add list of documents (content + metadata) to the store. persist=False defers the disk write to persist()."""
+        pass
+
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], persist: bool = True):
+        """
+        Add documents with precomputed vectors (aligned 1:1). Every store writes the given vectors;
+        this fallback re-embeds via add_documents and is only for stores added without an override.
+        """
+        await self.add_documents(documents, persist=persist)
+
+    async def persist(self):
+        """Flush deferred writes to disk. Stores that write through on every add have nothing to do."""
         pass
 
     @abstractmethod
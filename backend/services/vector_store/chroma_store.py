@@ -4,6 +4,7 @@ Chroma Vector Store Service
 - Robust error handling and loguru logging
 """
 import os
+import uuid
 import asyncio
 from typing import List, Dict, Any, Optional
 from loguru import logger
@@ -11,6 +12,7 @@ from langchain_chroma import Chroma
 
 from backend.services.embeddings import get_shared_embeddings
 from backend.services.vector_store.base import VectorStoreBase
+from backend.services.executors import executors
 
 class ChromaStore(VectorStoreBase):
     def __init__(self):
@@ -29,7 +31,7 @@ class ChromaStore(VectorStoreBase):
             logger.error(f"Failed to initialize ChromaStore: {e}")
             raise
 
-    async def add_documents(self, documents: List[Dict[str, Any]]):
+    async def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
         """Adds documents to Chroma asynchronously."""
         try:
             texts = [doc["content"] for doc in documents]
@@ -38,10 +40,28 @@ class ChromaStore(VectorStoreBase):
             def _sync_add():
                 self.vector_store.add_texts(texts, metadatas=metadatas)
                 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_add)
+            await asyncio.get_event_loop().run_in_executor(executors.ingest, _sync_add)
             logger.info(f"Added {len(documents)} chunks to Chroma.")
         except Exception as e:
             logger.error(f"Failed to add documents to Chroma: {e}")
+            raise
+
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], persist: bool = True):
+        """Adds documents with precomputed vectors straight into the Chroma collection."""
+        try:
+            def _sync_add():
+                self.vector_store._collection.add(
+                    ids=[str(uuid.uuid4()) for _ in documents],
+                    embeddings=[list(map(float, vector)) for vector in embeddings],
+                    documents=[doc["content"] for doc in documents],
+                    metadatas=[doc["metadata"] for doc in documents]
+                )
+
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_add)
+            logger.info(f"Added {len(documents)} pre-embedded chunks to Chroma.")
+        except Exception as e:
+            logger.error(f"Failed to add embeddings to Chroma: {e}")
+            raise
 
     async def search(self, query: str, top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Searches Chroma asynchronously."""
@@ -49,7 +69,7 @@ class ChromaStore(VectorStoreBase):
             def _sync_search():
                 return self.vector_store.similarity_search_with_score(query, k=top_k, filter=filter)
 
-            docs_with_scores = await asyncio.get_event_loop().run_in_executor(None, _sync_search)
+            docs_with_scores = await asyncio.get_event_loop().run_in_executor(executors.search, _sync_search)
             
             results = []
             for doc, score in docs_with_scores:
@@ -75,7 +95,7 @@ class ChromaStore(VectorStoreBase):
                 self.vector_store.delete(where={"source": source})
                 return True
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_delete)
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_delete)
             logger.info(f"Deleted documents with source '{source}' from Chroma")
         except Exception as e:
             logger.error(f"Failed to delete documents from Chroma: {e}")
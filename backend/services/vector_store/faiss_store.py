@@ -1,21 +1,120 @@
 """
 FAISS Vector Store Service
 - Implements async wrappers for blocking FAISS operations
+- Topic-filtered searches score only that source_topic's rows of the main index, through an
+  ID selector (no per-topic copy of the vectors)
+- Searches read the index under a shared lock; adds and deletes, which mutate it in place,
+  take it exclusively
+- Index files are written atomically (temp dir + os.replace), and a load that catches the
+  two files mid-swap is retried
 - Robust error handling and loguru logging
 """
 import os
 import asyncio
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from loguru import logger
 from langchain_community.vectorstores import FAISS
 
-from backend.services.embeddings import get_shared_embeddings
+from backend.services.embeddings import get_shared_embeddings, embed_query
 from backend.services.vector_store.base import VectorStoreBase
+from backend.utils.topic_partitions import topic_of, split_filter, matches_filter
+from backend.services.executors import executors
+from backend.utils.atomic_files import save_faiss_atomic
+from backend.utils.rwlock import ReadWriteLock
+
+LOAD_ATTEMPTS = 3
+
+
+class FaissPartitions:
+    """
+    Per-topic row selectors over the one LangChain FAISS index, so a topic-filtered query only
+    scores that topic's vectors without holding a second copy of them (only row positions are
+    kept per topic). Positions are tracked incrementally as rows are added, and from scratch
+    after a delete or when the store object is swapped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._store = None
+        self._seen = 0
+        self._positions: Dict[str, List[int]] = {}
+        self._selectors: Dict[Tuple[str, ...], Tuple[Any, int]] = {}
+
+    def reset(self):
+        with self._lock:
+            self._store = None
+
+    def _sync(self, store):
+        # The id map is updated after index.add, so its length counts fully added rows
+        total = len(store.index_to_docstore_id)
+        if store is not self._store or total < self._seen:
+            self._store, self._seen, self._positions, self._selectors = store, 0, {}, {}
+        if total == self._seen:
+            return
+        touched = set()
+        for pos in range(self._seen, total):
+            doc = store.docstore.search(store.index_to_docstore_id[pos])
+            topic = topic_of(getattr(doc, "metadata", None) or {})
+            self._positions.setdefault(topic, []).append(pos)
+            touched.add(topic)
+        self._selectors = {key: sel for key, sel in self._selectors.items() if not touched.intersection(key)}
+        self._seen = total
+
+    def selector(self, store, topics: List[str]) -> Tuple[Any, int]:
+        """(IDSelectorBatch over the topics' rows, row count); built once per topic set until they change."""
+        import faiss
+
+        key = tuple(sorted(set(topics)))
+        with self._lock:
+            self._sync(store)
+            if key not in self._selectors:
+                ids = np.array([pos for t in key for pos in self._positions.get(t, ())], dtype=np.int64)
+                # The selector copies the ids into its own set
+                self._selectors[key] = (faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids)), len(ids))
+            return self._selectors[key]
+
+    def search(self, store, vector: List[float], top_k: int, filter: Optional[Dict[str, Any]] = None):
+        """Top-k (Document, score) over the rows of the filter's topics (all rows when unfiltered)."""
+        import faiss
+
+        topics, rest = split_filter(filter)
+        query = np.array([vector], dtype=np.float32)
+        if getattr(store, "_normalize_L2", False):
+            faiss.normalize_L2(query)
+        # Other filter keys are checked after the search, so over-fetch for them
+        fetch_k = top_k * 4 if rest else top_k
+
+        params = None
+        candidates = store.index.ntotal
+        if topics is not None:
+            # Held in a local for the whole search: the params only point at it
+            sel, candidates = self.selector(store, topics)
+            params = faiss.SearchParameters(sel=sel)
+        if not candidates:
+            return []
+
+        scores, rows = store.index.search(query, min(fetch_k, candidates), params=params)
+        hits = []
+        for score, row in zip(scores[0], rows[0]):
+            if row == -1:
+                continue
+            doc = store.docstore.search(store.index_to_docstore_id[int(row)])
+            if rest and not matches_filter(doc.metadata, rest):
+                continue
+            hits.append((doc, float(score)))
+        return hits[:top_k]
+
 
 class FAISSStore(VectorStoreBase):
     def __init__(self):
         self.embeddings = get_shared_embeddings()
         self.index_path = "data/indexes/faiss"
+        self.partitions = FaissPartitions()
+        # Searches share it; in-place index mutations (add, delete) hold it exclusively
+        self._rw = ReadWriteLock()
         self.vector_store = None
         # We don't block constructor, but _load_or_create is synchronous in LangChain
         # We'll handle it carefully when first used if needed, or just let it init.
@@ -23,35 +122,115 @@ class FAISSStore(VectorStoreBase):
 
     def _load_or_create(self):
         """Loads index from disk if it exists."""
-        try:
-            if os.path.exists(self.index_path):
-                self.vector_store = FAISS.load_local(
+        self.vector_store = self.load_index()
+
+    def load_index(self):
+        """Reads the index files into a new FAISS object (None if missing or unreadable)."""
+        for attempt in range(1, LOAD_ATTEMPTS + 1):
+            try:
+                if not os.path.exists(self.index_path):
+                    return None
+                vector_store = FAISS.load_local(
                     self.index_path, 
                     self.embeddings,
                     allow_dangerous_deserialization=True,
                     distance_strategy="COSINE"
                 )
+                # A writer swaps index.pkl and index.faiss one after the other
+                if vector_store.index.ntotal != len(vector_store.index_to_docstore_id):
+                    raise ValueError("index.faiss and index.pkl are from different saves")
                 logger.info(f"FAISS index loaded from {self.index_path}")
-        except Exception as e:
-            logger.error(f"Failed to load FAISS index: {e}")
+                return vector_store
+            except Exception as e:
+                if attempt == LOAD_ATTEMPTS:
+                    logger.error(f"Failed to load FAISS index: {e}")
+                else:
+                    time.sleep(0.1 * attempt)
+        return None
 
-    async def add_documents(self, documents: List[Dict[str, Any]]):
-        """Adds documents to FAISS asynchronously."""
+    def _save(self):
+        save_faiss_atomic(self.vector_store, self.index_path)
+
+    def _locked_save(self):
+        # Saving only reads the index
+        with self._rw.read():
+            self._save()
+
+    async def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
+        """Adds documents to FAISS asynchronously. With persist=False the index is only saved by persist()."""
         try:
             texts = [doc["content"] for doc in documents]
             metadatas = [doc["metadata"] for doc in documents]
             
             def _sync_add():
                 if self.vector_store:
-                    self.vector_store.add_texts(texts, metadatas=metadatas)
+                    # Embed outside the lock; only the index append is exclusive
+                    vectors = self.embeddings.embed_documents(texts)
+                    with self._rw.write():
+                        self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
                 else:
                     self.vector_store = FAISS.from_texts(texts, self.embeddings, metadatas=metadatas, distance_strategy="COSINE")
-                self.vector_store.save_local(self.index_path)
+                if persist:
+                    with self._rw.read():
+                        self._save()
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_add)
+            await asyncio.get_event_loop().run_in_executor(executors.ingest, _sync_add)
             logger.info(f"Added {len(documents)} chunks to FAISS.")
         except Exception as e:
             logger.error(f"Failed to add documents to FAISS: {e}")
+            raise
+
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], persist: bool = True):
+        """Adds documents with precomputed vectors, skipping the embedding model entirely."""
+        try:
+            text_embeddings = [(doc["content"], list(map(float, vector))) for doc, vector in zip(documents, embeddings)]
+            metadatas = [doc["metadata"] for doc in documents]
+
+            def _sync_add():
+                if self.vector_store:
+                    with self._rw.write():
+                        self.vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+                else:
+                    self.vector_store = FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas, distance_strategy="COSINE")
+                if persist:
+                    with self._rw.read():
+                        self._save()
+
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_add)
+            logger.info(f"Added {len(documents)} pre-embedded chunks to FAISS.")
+        except Exception as e:
+            logger.error(f"Failed to add embeddings to FAISS: {e}")
+            raise
+
+    async def persist(self):
+        """Saves the in-memory index to disk."""
+        if not self.vector_store:
+            return
+        try:
+            await asyncio.get_event_loop().run_in_executor(executors.io, self._locked_save)
+            logger.info(f"FAISS index saved to {self.index_path}")
+        except Exception as e:
+            logger.error(f"Failed to save FAISS index: {e}")
+            raise
+
+    def snapshot_rows(self) -> Optional[Dict[str, Any]]:
+        """Vectors and chunks in index order, for a memory-mapped serving snapshot."""
+        import faiss
+
+        store = self.vector_store
+        if not store:
+            return None
+        with self._rw.read():
+            total = len(store.index_to_docstore_id)
+            docs = [store.docstore.search(store.index_to_docstore_id[pos]) for pos in range(total)]
+            vectors = store.index.reconstruct_n(0, total)
+        return {
+            "vectors": vectors,
+            "contents": [doc.page_content for doc in docs],
+            "metadatas": [doc.metadata for doc in docs],
+            "metric": "ip" if store.index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+            "normalize": getattr(store, "_normalize_L2", False)
+        }
 
     async def search(self, query: str, top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Searches FAISS asynchronously."""
@@ -59,13 +238,17 @@ class FAISSStore(VectorStoreBase):
             return []
             
         try:
+            # Embedding is awaited (the inference sidecar, or the model in an executor thread)
+            vector = await embed_query(query, self.embeddings)
+
             # Define synchronous search to run in executor
             def _sync_search():
-                # Handle multi-value filters manually if needed, otherwise use metadata filter
-                # Note: LangChain FAISS metadata filtering is simple.
-                return self.vector_store.similarity_search_with_score(query, k=top_k, filter=filter)
+                # Only the partitions of the filter's topics are searched (all of them when unfiltered)
+                store = self.vector_store
+                with self._rw.read():
+                    return self.partitions.search(store, vector, top_k, filter)
 
-            docs_with_scores = await asyncio.get_event_loop().run_in_executor(None, _sync_search)
+            docs_with_scores = await asyncio.get_event_loop().run_in_executor(executors.search, _sync_search)
             
             results = []
             for doc, score in docs_with_scores:
@@ -86,23 +269,25 @@ class FAISSStore(VectorStoreBase):
 
         try:
             def _sync_delete():
-                ids_to_delete = []
-                for doc_id, doc in self.vector_store.docstore._dict.items():
-                    match = True
-                    for key, value in filter_dict.items():
-                        if doc.metadata.get(key) != value:
-                            match = False
-                            break
-                    if match:
-                        ids_to_delete.append(doc_id)
+                with self._rw.write():
+                    ids_to_delete = []
+                    for doc_id, doc in self.vector_store.docstore._dict.items():
+                        match = True
+                        for key, value in filter_dict.items():
+                            if doc.metadata.get(key) != value:
+                                match = False
+                                break
+                        if match:
+                            ids_to_delete.append(doc_id)
                 
-                if ids_to_delete:
-                    self.vector_store.delete(ids_to_delete)
-                    self.vector_store.save_local(self.index_path)
-                    return len(ids_to_delete)
-                return 0
+                    if ids_to_delete:
+                        self.vector_store.delete(ids_to_delete)
+                        self.partitions.reset()
+                        self._save()
+                        return len(ids_to_delete)
+                    return 0
 
-            deleted_count = await asyncio.get_event_loop().run_in_executor(None, _sync_delete)
+            deleted_count = await asyncio.get_event_loop().run_in_executor(executors.io, _sync_delete)
             if deleted_count > 0:
                 logger.info(f"Deleted {deleted_count} chunks from FAISS matching {filter_dict}")
         except Exception as e:
@@ -4,6 +4,7 @@ LanceDB Vector Store Service
 - Robust error handling and loguru logging
 """
 import asyncio
+import uuid
 from typing import List, Dict, Any, Optional
 from loguru import logger
 import lancedb
@@ -11,6 +12,7 @@ from langchain_community.vectorstores import LanceDB
 
 from backend.services.embeddings import get_shared_embeddings
 from backend.services.vector_store.base import VectorStoreBase
+from backend.services.executors import executors
 
 class LanceDBStore(VectorStoreBase):
     def __init__(self):
@@ -30,7 +32,7 @@ class LanceDBStore(VectorStoreBase):
                 raise
         return self.db
 
-    async def add_documents(self, documents: List[Dict[str, Any]]):
+    async def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
         """Adds documents to LanceDB asynchronously."""
         try:
             texts = [doc["content"] for doc in documents]
@@ -48,10 +50,40 @@ class LanceDBStore(VectorStoreBase):
                 else:
                     self.vector_store.add_texts(texts, metadatas=metadatas)
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_add)
+            await asyncio.get_event_loop().run_in_executor(executors.ingest, _sync_add)
             logger.info(f"Added {len(documents)} chunks to LanceDB.")
         except Exception as e:
             logger.error(f"Failed to add documents to LanceDB: {e}")
+            raise
+
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], persist: bool = True):
+        """Writes documents with precomputed vectors straight into the LanceDB table (no re-embedding)."""
+        try:
+            # Same row layout LangChain's LanceDB.add_texts writes, so searches read them unchanged
+            rows = [
+                {
+                    "vector": list(map(float, vector)),
+                    "id": str(uuid.uuid4()),
+                    "text": doc["content"],
+                    "metadata": doc["metadata"]
+                }
+                for doc, vector in zip(documents, embeddings)
+            ]
+
+            def _sync_add():
+                db = self._get_db()
+                if self.table_name in db.table_names():
+                    db.open_table(self.table_name).add(rows)
+                else:
+                    db.create_table(self.table_name, data=rows)
+                if self.vector_store is None:
+                    self.vector_store = LanceDB(db, self.embeddings, table_name=self.table_name)
+
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_add)
+            logger.info(f"Added {len(documents)} pre-embedded chunks to LanceDB.")
+        except Exception as e:
+            logger.error(f"Failed to add embeddings to LanceDB: {e}")
+            raise
 
     async def search(self, query: str, top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Searches LanceDB asynchronously."""
@@ -70,7 +102,7 @@ class LanceDBStore(VectorStoreBase):
                 
                 return self.vector_store.similarity_search_with_score(query, k=top_k, filter=filter)
 
-            docs_with_scores = await asyncio.get_event_loop().run_in_executor(None, _sync_search)
+            docs_with_scores = await asyncio.get_event_loop().run_in_executor(executors.search, _sync_search)
             
             results = []
             for doc, score in docs_with_scores:
@@ -98,7 +130,7 @@ class LanceDBStore(VectorStoreBase):
                 table.delete(f"source == '{source}'")
                 return True
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_delete)
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_delete)
             logger.info(f"Deleted documents with source '{source}' from LanceDB")
         except Exception as e:
             logger.error(f"LanceDB delete error: {e}")
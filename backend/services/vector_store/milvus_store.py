@@ -10,6 +10,7 @@ from langchain_milvus import Milvus
 
 from backend.services.embeddings import get_shared_embeddings
 from backend.services.vector_store.base import VectorStoreBase
+from backend.services.executors import executors
 
 class MilvusStore(VectorStoreBase):
     def __init__(self):
@@ -34,7 +35,7 @@ class MilvusStore(VectorStoreBase):
                 raise
         return self.vector_store
 
-    async def add_documents(self, documents: List[Dict[str, Any]]):
+    async def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
         """Adds documents to Milvus asynchronously."""
         try:
             texts = [doc["content"] for doc in documents]
@@ -44,10 +45,27 @@ class MilvusStore(VectorStoreBase):
                 store = self._get_vector_store()
                 store.add_texts(texts, metadatas=metadatas)
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_add)
+            await asyncio.get_event_loop().run_in_executor(executors.ingest, _sync_add)
             logger.info(f"Added {len(documents)} chunks to Milvus.")
         except Exception as e:
             logger.error(f"Failed to add documents to Milvus: {e}")
+            raise
+
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], persist: bool = True):
+        """Adds documents with precomputed vectors to Milvus."""
+        try:
+            texts = [doc["content"] for doc in documents]
+            metadatas = [doc["metadata"] for doc in documents]
+
+            def _sync_add():
+                store = self._get_vector_store()
+                store.add_embeddings(texts, [list(map(float, vector)) for vector in embeddings], metadatas=metadatas)
+
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_add)
+            logger.info(f"Added {len(documents)} pre-embedded chunks to Milvus.")
+        except Exception as e:
+            logger.error(f"Failed to add embeddings to Milvus: {e}")
+            raise
 
     async def search(self, query: str, top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Searches Milvus asynchronously."""
@@ -56,7 +74,7 @@ class MilvusStore(VectorStoreBase):
                 store = self._get_vector_store()
                 return store.similarity_search_with_score(query, k=top_k, filter=filter)
 
-            docs_with_scores = await asyncio.get_event_loop().run_in_executor(None, _sync_search)
+            docs_with_scores = await asyncio.get_event_loop().run_in_executor(executors.search, _sync_search)
             
             results = []
             for doc, score in docs_with_scores:
@@ -87,7 +105,7 @@ class MilvusStore(VectorStoreBase):
                     logger.warning("Milvus deletion not supported in this wrapper version.")
                     return False
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_delete)
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_delete)
             logger.info(f"Deleted documents with source '{source}' from Milvus")
         except Exception as e:
             logger.error(f"Milvus delete error: {e}")
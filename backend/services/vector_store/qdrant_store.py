@@ -4,6 +4,7 @@ Qdrant Vector Store Service
 - Robust error handling and loguru logging
 """
 import asyncio
+import uuid
 from typing import List, Dict, Any, Optional
 from loguru import logger
 from qdrant_client import QdrantClient, models
@@ -11,6 +12,7 @@ from langchain_qdrant import QdrantVectorStore
 
 from backend.services.embeddings import get_shared_embeddings
 from backend.services.vector_store.base import VectorStoreBase
+from backend.services.executors import executors
 
 class QdrantStore(VectorStoreBase):
     def __init__(self):
@@ -35,7 +37,7 @@ class QdrantStore(VectorStoreBase):
                 raise
         return self.vector_store
 
-    async def add_documents(self, documents: List[Dict[str, Any]]):
+    async def add_documents(self, documents: List[Dict[str, Any]], persist: bool = True):
         """Adds documents to Qdrant asynchronously."""
         try:
             texts = [doc["content"] for doc in documents]
@@ -45,10 +47,33 @@ class QdrantStore(VectorStoreBase):
                 store = self._get_vector_store()
                 store.add_texts(texts, metadatas=metadatas)
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_add)
+            await asyncio.get_event_loop().run_in_executor(executors.ingest, _sync_add)
             logger.info(f"Added {len(documents)} chunks to Qdrant.")
         except Exception as e:
             logger.error(f"Failed to add documents to Qdrant: {e}")
+            raise
+
+    async def add_embeddings(self, documents: List[Dict[str, Any]], embeddings: List[List[float]], persist: bool = True):
+        """Upserts documents with precomputed vectors straight into the Qdrant collection (no re-embedding)."""
+        try:
+            def _sync_add():
+                store = self._get_vector_store()
+                # Payload keys and vector name of the LangChain store, so searches read these points unchanged
+                points = [
+                    models.PointStruct(
+                        id=str(uuid.uuid4()),
+                        vector={store.vector_name: list(map(float, vector))} if store.vector_name else list(map(float, vector)),
+                        payload={store.content_payload_key: doc["content"], store.metadata_payload_key: doc["metadata"]}
+                    )
+                    for doc, vector in zip(documents, embeddings)
+                ]
+                store.client.upsert(collection_name=self.collection_name, points=points)
+
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_add)
+            logger.info(f"Added {len(documents)} pre-embedded chunks to Qdrant.")
+        except Exception as e:
+            logger.error(f"Failed to add embeddings to Qdrant: {e}")
+            raise
 
     async def search(self, query: str, top_k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Searches Qdrant asynchronously."""
@@ -58,7 +83,7 @@ class QdrantStore(VectorStoreBase):
                 # Use similarity_search to avoid potential client attribute issues with scoring if version mismatch
                 return store.similarity_search(query, k=top_k, filter=filter)
 
-            docs = await asyncio.get_event_loop().run_in_executor(None, _sync_search)
+            docs = await asyncio.get_event_loop().run_in_executor(executors.search, _sync_search)
             
             results = []
             for doc in docs:
@@ -97,7 +122,7 @@ class QdrantStore(VectorStoreBase):
                 )
                 return True
 
-            await asyncio.get_event_loop().run_in_executor(None, _sync_delete)
+            await asyncio.get_event_loop().run_in_executor(executors.io, _sync_delete)
             logger.info(f"Deleted documents with source '{source}' from Qdrant")
         except Exception as e:
             logger.error(f"Qdrant delete error: {e}")
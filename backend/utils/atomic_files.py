@@ -0,0 +1,42 @@
+"""
+Atomic File Writes
+- Output is staged in a uniquely named temp file or directory next to the target and moved
+  in with os.replace, so a crash or a concurrent reader never sees a half-written file
+- Unique temp names (mkstemp / mkdtemp) keep concurrent writers, including other processes,
+  from clobbering each other's staging files
+"""
+import json
+import os
+import tempfile
+from typing import Any
+
+FAISS_FILES = ("index.pkl", "index.faiss")
+
+
+def write_json_atomic(path: str, data: Any, **dump_kwargs):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def save_faiss_atomic(store, index_dir: str):
+    """
+    save_local into a sibling temp dir, then os.replace each file into `index_dir`.
+    The docstore goes first, so a reader never sees vectors without their chunks; readers
+    check that the pair lines up (see FAISSStore.load_index) for the window between the two.
+    """
+    parent = os.path.dirname(os.path.abspath(index_dir))
+    os.makedirs(parent, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=parent, prefix=f".{os.path.basename(index_dir)}.") as tmp_dir:
+        store.save_local(tmp_dir)
+        os.makedirs(index_dir, exist_ok=True)
+        for name in FAISS_FILES:
+            os.replace(os.path.join(tmp_dir, name), os.path.join(index_dir, name))
@@ -0,0 +1,152 @@
+"""
+Chunk Artifacts
+- Serializes processed chunks for the S3 backup as gzip JSON Lines (chunks/<service>/<filename>_chunks.jsonl.gz):
+  line 1 is the header, every further line one chunk; written and read incrementally
+- Stamps every artifact with the schema, processor and embedding-model versions
+- Decides whether an artifact can be reused instead of re-extracting the source document
+- Writes embedding matrices as float32 .npy (mmap-able) with an aligned chunk-ID list
+"""
+import os
+import gzip
+import json
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple, Iterator, IO
+
+import numpy as np
+
+from backend.core.config import settings
+from backend.utils.chunk_cache import PROCESSOR_VERSION
+
+# 1 = legacy indented JSON without version fields, 2 = versioned JSON (neither is read any more)
+CHUNK_ARTIFACT_SCHEMA = 3
+CHUNKS_SUFFIX = "_chunks.jsonl.gz"
+EMBEDDINGS_SUFFIX = "_embeddings.npy"
+METADATA_SUFFIX = "_meta.json"
+
+
+def chunk_text(chunk) -> str:
+    if isinstance(chunk, dict):
+        return chunk.get("content", "")
+    return chunk.page_content if hasattr(chunk, "page_content") else str(chunk)
+
+
+def chunk_metadata(chunk) -> Dict[str, Any]:
+    if isinstance(chunk, dict):
+        return chunk.get("metadata", {})
+    return chunk.metadata if hasattr(chunk, "metadata") else {}
+
+
+def artifact_name(filename: str, suffix: str) -> str:
+    """
+    lambda-dg.pdf + _chunks.jsonl.gz -> lambda-dg.pdf_chunks.jsonl.gz. The extension is kept,
+    so guide.pdf and guide.txt do not overwrite each other's artifacts.
+    """
+    return f"{filename}{suffix}"
+
+
+def chunk_id(content_hash: str, chunk_index: int) -> str:
+    """Stable ID of a chunk: the same bytes always produce the same IDs."""
+    return f"{content_hash[:16]}-{chunk_index}"
+
+
+def artifact_header(filename: str, service: str, total_chunks: int, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "schema_version": CHUNK_ARTIFACT_SCHEMA,
+        "processor_version": PROCESSOR_VERSION,
+        "embedding_model": settings.EMBEDDING_MODEL,
+        "content_hash": content_hash,
+        "filename": filename,
+        "service": service,
+        "total_chunks": total_chunks,
+        "created": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def iter_chunk_records(chunks) -> Iterator[Dict[str, Any]]:
+    """Chunk dicts ({"content", "metadata"}) or LangChain Documents -> artifact records."""
+    for i, chunk in enumerate(chunks):
+        text = chunk_text(chunk)
+        metadata = chunk_metadata(chunk)
+        yield {
+            "chunk_index": i,
+            "chunk_id": metadata.get("chunk_id"),
+            "text": text,
+            "metadata": metadata,
+            "char_count": len(text)
+        }
+
+
+def write_chunk_artifact(path: str, header: Dict[str, Any], chunks) -> int:
+    """Streams header + one JSON line per chunk into a gzip file. Returns the number of chunks written."""
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({**header, "format": "jsonl.gz"}) + "\n")
+        for record in iter_chunk_records(chunks):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+
+def read_chunk_artifact(fileobj: IO[bytes]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Parses a gzip JSONL artifact line by line from any binary stream (file or S3 body)."""
+    with gzip.GzipFile(fileobj=fileobj) as raw:
+        lines = (line for line in raw if line.strip())
+        header = json.loads(next(lines, b"{}"))
+        if header.get("schema_version") != CHUNK_ARTIFACT_SCHEMA:
+            return header, []
+        return header, [json.loads(line) for line in lines]
+
+
+def records_to_chunks(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"content": r["text"], "metadata": r.get("metadata", {})} for r in records]
+
+
+def chunks_reusable(header: Dict[str, Any], content_hash: Optional[str]) -> bool:
+    """Chunks can be reused if they were produced from the same bytes by the current processor."""
+    return (
+        header.get("schema_version") == CHUNK_ARTIFACT_SCHEMA
+        and header.get("processor_version") == PROCESSOR_VERSION
+        and content_hash is not None
+        and header.get("content_hash") == content_hash
+    )
+
+
+def embeddings_reusable(header: Dict[str, Any], embeddings, total_chunks: int) -> bool:
+    """Embeddings can be reused if they come from the configured model and align 1:1 with the chunks."""
+    return (
+        embeddings is not None
+        and header.get("embedding_model") == settings.EMBEDDING_MODEL
+        and len(embeddings) == total_chunks
+    )
+
+
+def _ids_path(npy_path: str) -> str:
+    return f"{npy_path[:-len('.npy')]}.ids.json"
+
+
+def save_embeddings(npy_path: str, embeddings, chunk_ids: List[str]):
+    """Writes embeddings as float32 .npy plus <name>.ids.json with the chunk ID of every row."""
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if len(matrix) != len(chunk_ids):
+        raise ValueError(f"{len(matrix)} embeddings for {len(chunk_ids)} chunk IDs")
+    tmp_path = f"{npy_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, matrix)
+    with open(f"{tmp_path}.ids", "w") as f:
+        json.dump({"embedding_model": settings.EMBEDDING_MODEL, "chunk_ids": chunk_ids}, f)
+    # IDs land first so a reader never sees a matrix without its row labels
+    os.replace(f"{tmp_path}.ids", _ids_path(npy_path))
+    os.replace(tmp_path, npy_path)
+
+
+def load_embeddings(npy_path: str, mmap: bool = True) -> Optional[Tuple[np.ndarray, List[str]]]:
+    """Returns (matrix, chunk_ids) or None if missing, from another model, or misaligned."""
+    try:
+        with open(_ids_path(npy_path)) as f:
+            ids = json.load(f)
+        matrix = np.load(npy_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    except (FileNotFoundError, ValueError):
+        return None
+    if ids.get("embedding_model") != settings.EMBEDDING_MODEL or len(matrix) != len(ids["chunk_ids"]):
+        return None
+    return matrix, ids["chunk_ids"]
@@ -0,0 +1,154 @@
+"""
+Persistent Chunk Cache
+- Content-addressed: entries are keyed by the file's SHA-256 and the processor version
+- Survives restarts and hits for the same bytes uploaded under a different name
+- Bounded on disk with least-recently-used eviction (file mtime is the access clock)
+- Also keeps the document's embeddings per model, so re-ingesting cached bytes skips inference
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+from typing import List, Dict, Any, Optional
+from loguru import logger
+from backend.core.config import settings
+
+# Bump whenever extraction or chunking output changes so stale entries stop matching
+PROCESSOR_VERSION = "2"
+CACHE_SUFFIXES = (".json.gz", ".npy", ".ids.json")
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Streams the file through SHA-256 without loading it into memory."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ChunkCache:
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or settings.CHUNK_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.CHUNK_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, file_hash: str) -> str:
+        return f"{file_hash}-v{PROCESSOR_VERSION}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def _embeddings_path(self, file_hash: str) -> str:
+        model = hashlib.sha1(settings.EMBEDDING_MODEL.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.cache_dir, f"{self.key_for(file_hash)}-{model}.npy")
+
+    def get(self, file_hash: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the cached chunks for a file hash, or None on a miss.
+        `metadata` overrides the upload-specific keys (source, upload_date, ...) of every chunk.
+        """
+        path = self._path(self.key_for(file_hash))
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                chunks = json.load(f)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable chunk cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+        if metadata:
+            for chunk in chunks:
+                chunk["metadata"].update(metadata)
+        return chunks
+
+    def put(self, file_hash: str, chunks: List[Dict[str, Any]]):
+        """Stores chunks atomically, then evicts least-recently-used entries over the size limit."""
+        path = self._path(self.key_for(file_hash))
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(chunks, f)
+            if os.path.getsize(tmp_path) > self.max_bytes:
+                logger.info(f"Not caching {len(chunks)} chunks: entry exceeds the cache size limit")
+                self._remove(tmp_path)
+                return
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.error(f"Chunk cache write failed for {file_hash[:12]}: {e}")
+            self._remove(tmp_path)
+            return
+        self._evict()
+
+    def get_embeddings(self, file_hash: str, chunk_ids: List[str]):
+        """Returns the cached (memory-mapped) embedding matrix if its rows match `chunk_ids`."""
+        from backend.utils.chunk_artifacts import load_embeddings
+
+        path = self._embeddings_path(file_hash)
+        loaded = load_embeddings(path)
+        if loaded is None or loaded[1] != chunk_ids:
+            return None
+        os.utime(path, None)
+        return loaded[0]
+
+    def put_embeddings(self, file_hash: str, embeddings, chunk_ids: List[str]):
+        from backend.utils.chunk_artifacts import save_embeddings
+
+        try:
+            save_embeddings(self._embeddings_path(file_hash), embeddings, chunk_ids)
+        except Exception as e:
+            logger.error(f"Embedding cache write failed for {file_hash[:12]}: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(CACHE_SUFFIXES):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                logger.info(f"Evicted chunk cache entry {os.path.basename(path)}")
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        names = [n for n in os.listdir(self.cache_dir) if n.endswith(CACHE_SUFFIXES)]
+        return {
+            "entries": sum(1 for n in names if n.endswith(".json.gz")),
+            "embeddings": sum(1 for n in names if n.endswith(".npy")),
+            "bytes": sum(os.path.getsize(os.path.join(self.cache_dir, n)) for n in names),
+            "max_bytes": self.max_bytes
+        }
+
+
+_chunk_cache: Optional[ChunkCache] = None
+
+
+def get_chunk_cache() -> ChunkCache:
+    global _chunk_cache
+    if _chunk_cache is None:
+        _chunk_cache = ChunkCache()
+    return _chunk_cache
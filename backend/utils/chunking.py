@@ -1,4 +1,5 @@
-from typing import List
+from bisect import bisect_right
+from typing import List, Dict, Any
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 class Chunker:
@@ -15,6 +16,50 @@ class Chunker:
         """Splits text into chunks using recursive character splitting."""
         return self.default_splitter.split_text(text)
 
+    def split_pages(self, pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Splits page-tagged text ({"page", "text", "method"}) like split_text, and records
+        which pages and extraction methods each chunk was built from.
+        """
+        parts, starts, spans = [], [], []
+        offset = 0
+        for page in pages:
+            if not page["text"].strip():
+                continue
+            if parts:
+                offset += 2 # "\n\n" separator
+            starts.append(offset)
+            spans.append(page)
+            parts.append(page["text"])
+            offset += len(page["text"])
+        if not parts:
+            return []
+
+        text = "\n\n".join(parts)
+        chunks = []
+        cursor = 0
+        for chunk in self.split_text(text):
+            start = text.find(chunk, cursor)
+            if start < 0:
+                start = cursor
+            cursor = start + 1
+            end = start + len(chunk)
+
+            first = max(0, bisect_right(starts, start) - 1)
+            last = max(first, bisect_right(starts, end - 1) - 1)
+            covered = spans[first:last + 1]
+            methods = {p.get("method", "unknown") for p in covered}
+
+            entry = {
+                "content": chunk,
+                "extraction": methods.pop() if len(methods) == 1 else "mixed"
+            }
+            if covered[0].get("page") is not None:
+                entry["page_start"] = covered[0]["page"]
+                entry["page_end"] = covered[-1]["page"]
+            chunks.append(entry)
+        return chunks
+
     def split_code(self, code: str, language: str) -> List[str]:
         """Specialized splitting for code files."""
         # Note: LangChain has specific splitters for many languages
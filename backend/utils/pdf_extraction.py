@@ -0,0 +1,225 @@
+"""
+Parallel PDF Text Extraction
+- Splits a PDF into page ranges and extracts them on a shared process pool
+- Yields pages back in document order with a bounded number of ranges in flight
+- Records per-page extraction time so outlier pages show up in the logs
+- Streams OCR in small rasterization windows so scanned guides never sit in RAM at once
+- Classifies each page by text density and image coverage so only text-poor pages are OCRed
+"""
+import os
+import time
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional
+
+import pypdf
+
+from backend.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pdf_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pdf_pool_size() -> int:
+    return settings.PDF_EXTRACTION_WORKERS or os.cpu_count() or 1
+
+
+def get_pdf_process_pool() -> ProcessPoolExecutor:
+    """Lazily creates the process pool shared by all PDF extractions."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        # spawn: the API process runs threads (asyncio executors, torch), which fork does not copy safely
+        _pdf_pool = ProcessPoolExecutor(
+            max_workers=get_pdf_pool_size(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"PDF extraction pool started with {get_pdf_pool_size()} processes")
+    return _pdf_pool
+
+
+def _image_xobject_names(page) -> set:
+    try:
+        xobjects = page["/Resources"]["/XObject"]
+        return {name for name, ref in xobjects.items() if ref.get_object().get("/Subtype") == "/Image"}
+    except Exception:
+        return set()
+
+
+def _extract_with_coverage(page) -> tuple:
+    """Returns (text, image_coverage) where coverage is the page fraction painted by image XObjects."""
+    images = _image_xobject_names(page)
+    painted = 0.0
+
+    def visitor(operator, operands, cm, tm):
+        nonlocal painted
+        if operator == b"Do" and operands and operands[0] in images:
+            # Area of the unit image square under the current transformation matrix
+            painted += abs(cm[0] * cm[3] - cm[1] * cm[2])
+
+    text = page.extract_text(visitor_operand_before=visitor if images else None) or ""
+    page_area = float(page.mediabox.width) * float(page.mediabox.height)
+    coverage = min(1.0, painted / page_area) if page_area else 0.0
+    return text, coverage
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Extracts pages [start, end) with pypdf. Runs inside a worker process."""
+    reader = pypdf.PdfReader(file_path)
+    pages = []
+    for index in range(start, end):
+        page_start = time.perf_counter()
+        try:
+            text, coverage = _extract_with_coverage(reader.pages[index])
+        except Exception as e:
+            logger.warning(f"pypdf failed on page {index + 1} of {file_path}: {e}")
+            text, coverage = "", 0.0
+        pages.append({
+            "page": index + 1,
+            "text": text,
+            "method": "pypdf",
+            "image_coverage": round(coverage, 3),
+            "seconds": time.perf_counter() - page_start
+        })
+    return pages
+
+
+def iter_pdf_pages(file_path: str, pages_per_task: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields {"page", "text", "seconds"} for every page, in order.
+    Small PDFs are extracted inline; large ones are fanned out over the process pool
+    with at most two ranges per worker in flight, so memory stays bounded.
+    """
+    page_count = len(pypdf.PdfReader(file_path).pages)
+    pages_per_task = pages_per_task or settings.PDF_PAGES_PER_TASK
+
+    if page_count < settings.PDF_PARALLEL_MIN_PAGES or get_pdf_pool_size() <= 1:
+        yield from extract_page_range(file_path, 0, page_count)
+        return
+
+    pool = get_pdf_process_pool()
+    ranges = deque((s, min(s + pages_per_task, page_count)) for s in range(0, page_count, pages_per_task))
+    in_flight = deque()
+    max_in_flight = get_pdf_pool_size() * 2
+
+    while ranges or in_flight:
+        while ranges and len(in_flight) < max_in_flight:
+            start, end = ranges.popleft()
+            in_flight.append(pool.submit(extract_page_range, file_path, start, end))
+        yield from in_flight.popleft().result()
+
+
+def ocr_page_window(file_path: str, first_page: int, last_page: int, dpi: int) -> List[Dict[str, Any]]:
+    """Rasterizes and OCRs pages [first_page, last_page] (1-based). Runs inside a worker process."""
+    from pdf2image import convert_from_path
+    import pytesseract
+
+    pages = []
+    images = convert_from_path(file_path, dpi=dpi, first_page=first_page, last_page=last_page)
+    for offset, image in enumerate(images):
+        page_start = time.perf_counter()
+        try:
+            text = pytesseract.image_to_string(image)
+        except Exception as e:
+            logger.warning(f"OCR failed on page {first_page + offset} of {file_path}: {e}")
+            text = ""
+        finally:
+            image.close()
+        pages.append({
+            "page": first_page + offset,
+            "text": text,
+            "method": "ocr",
+            "seconds": time.perf_counter() - page_start
+        })
+    return pages
+
+
+def _group_windows(page_numbers: List[int], window: int) -> List[tuple]:
+    """Groups sorted 1-based page numbers into contiguous (first, last) runs of at most `window` pages."""
+    windows = []
+    for page in sorted(page_numbers):
+        if windows and page == windows[-1][1] + 1 and page - windows[-1][0] < window:
+            windows[-1] = (windows[-1][0], page)
+        else:
+            windows.append((page, page))
+    return windows
+
+
+def get_pdf_page_count(file_path: str) -> int:
+    try:
+        return len(pypdf.PdfReader(file_path).pages)
+    except Exception:
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(file_path)["Pages"])
+
+
+def iter_ocr_pages(
+    file_path: str,
+    page_numbers: Optional[List[int]] = None,
+    dpi: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields OCR results for `page_numbers` (1-based, default: every page), in order.
+    Each worker rasterizes at most OCR_WINDOW_PAGES pages at a time, and only a
+    bounded number of windows are in flight, so peak memory does not grow with
+    document length.
+    """
+    if page_numbers is None:
+        page_numbers = list(range(1, get_pdf_page_count(file_path) + 1))
+    if not page_numbers:
+        return
+
+    dpi = dpi or settings.OCR_DPI
+    windows = deque(_group_windows(page_numbers, settings.OCR_WINDOW_PAGES))
+
+    if get_pdf_pool_size() <= 1:
+        for first, last in windows:
+            yield from ocr_page_window(file_path, first, last, dpi)
+        return
+
+    pool = get_pdf_process_pool()
+    in_flight = deque()
+    max_in_flight = get_pdf_pool_size() * 2
+
+    while windows or in_flight:
+        while windows and len(in_flight) < max_in_flight:
+            first, last = windows.popleft()
+            in_flight.append(pool.submit(ocr_page_window, file_path, first, last, dpi))
+        yield from in_flight.popleft().result()
+
+
+def has_text_layer(page: Dict[str, Any]) -> bool:
+    return len(page["text"].strip()) >= settings.OCR_TEXT_LAYER_MIN_CHARS
+
+
+def needs_ocr(page: Dict[str, Any]) -> bool:
+    """
+    Routes a pypdf page to OCR when its text layer is missing, or when the page is
+    mostly image (a scan or screenshot) and the text layer is too thin to trust.
+    """
+    if not has_text_layer(page):
+        return True
+    chars = len(page["text"].strip())
+    return page.get("image_coverage", 0.0) >= settings.OCR_IMAGE_COVERAGE and chars < settings.OCR_DENSE_TEXT_CHARS
+
+
+def log_slow_pages(file_path: str, pages: List[Dict[str, Any]], limit: int = 5):
+    """Logs a timing summary and the slowest pages above PDF_SLOW_PAGE_SECONDS."""
+    if not pages:
+        return
+    timings = sorted(p["seconds"] for p in pages)
+    median = timings[len(timings) // 2]
+    slow = sorted(
+        (p for p in pages if p["seconds"] >= settings.PDF_SLOW_PAGE_SECONDS),
+        key=lambda p: p["seconds"],
+        reverse=True
+    )
+    logger.info(
+        f"Extracted {len(pages)} pages from {file_path}: "
+        f"median {median * 1000:.0f}ms/page, max {timings[-1] * 1000:.0f}ms"
+    )
+    if slow:
+        outliers = ", ".join(f"p{p['page']}={p['seconds']:.1f}s" for p in slow[:limit])
+        logger.warning(f"Slow PDF pages in {file_path} ({len(slow)} over {settings.PDF_SLOW_PAGE_SECONDS}s): {outliers}")
@@ -1,6 +1,17 @@
+"""
+Service Detection
+- Maps queries and filenames to AWS service keys
+- Keywords are compiled once into prefix-trie regexes (backend.utils.text_match): queries are
+  matched on word boundaries, filenames as substrings (AmazonEC2UserGuide.pdf -> ec2)
+- Fuzzy typo correction is cached per word over the fixed service vocabulary
+"""
+from functools import lru_cache
+import re
 from rapidfuzz import process, fuzz
 import logging
 
+from backend.utils.text_match import compile_literals
+
 logger = logging.getLogger(__name__)
 
 AWS_SERVICES = [
@@ -13,6 +24,23 @@ AWS_SERVICES = [
     "step functions", "eventbridge", "secrets manager"
 ]
 
+_SERVICE_VOCABULARY = frozenset(AWS_SERVICES)
+
+
+@lru_cache(maxsize=8192)
+def _fuzzy_word(word: str):
+    """(service, score) for one lowercase word; the correction table fills as words are seen."""
+    if word in _SERVICE_VOCABULARY:
+        return word, 100.0
+    match = process.extractOne(
+        word,
+        AWS_SERVICES,
+        scorer=fuzz.ratio,
+        score_cutoff=65  # 65% similarity threshold
+    )
+    return (match[0], match[1]) if match else (None, 0)
+
+
 def fuzzy_match_service(query: str) -> str:
     """
     Match typos to correct AWS service names.
@@ -32,16 +60,10 @@ def fuzzy_match_service(query: str) -> str:
         if len(word) < 3:
             continue
             
-        match = process.extractOne(
-            word,
-            AWS_SERVICES,
-            scorer=fuzz.ratio,
-            score_cutoff=65  # 65% similarity threshold
-        )
-        
-        if match and match[1] > best_score:
-            best_score = match[1]
-            best_service = match[0]
+        service, score = _fuzzy_word(word)
+        if service and score > best_score:
+            best_score = score
+            best_service = service
     
     return best_service  # Returns None if no match found
 
@@ -215,6 +237,45 @@ FILENAME_TO_SERVICE = {
     "faq":              "general",
 }
 
+_EXTENSION_RE = re.compile(r'\.(pdf|docx|txt|html|md|csv|pptx|xlsx)$')
+_SEPARATOR_RE = re.compile(r'[-_\.]')
+_BOILERPLATE_RE = re.compile(r'\b(user|guide|developer|dg|ug|api|ref|reference|'
+                             r'manual|doc|docs|documentation|amazon|aws|'
+                             r'latest|v1|v2|2023|2024|2025|2026)\b')
+
+
+def _substring_scanner(keywords):
+    """
+    Lookahead regex reporting the longest keyword starting at every position (overlaps included),
+    plus keyword -> the keywords that are its prefixes, so shorter keywords starting at the
+    same position are counted too. Together: every keyword occurring as a substring, in one scan.
+    """
+    regex = re.compile(f"(?=({compile_literals(keywords).pattern}))")
+    prefixes = {kw: [p for p in keywords if kw.startswith(p)] for kw in keywords}
+    return regex, prefixes
+
+
+def _find_substrings(scanner, text: str) -> set:
+    regex, prefixes = scanner
+    found = set()
+    for match in regex.finditer(text):
+        found.update(prefixes[match.group(1)])
+    return found
+
+
+# Ties between services go to the one whose keyword comes first in FILENAME_TO_SERVICE
+_KEYWORD_ORDER = {keyword: i for i, keyword in enumerate(FILENAME_TO_SERVICE)}
+# Filename keywords as written (matched in the raw name) and with '-' as ' ' (matched in the cleaned name)
+_SPACED_KEYWORDS = {keyword.replace('-', ' '): keyword for keyword in FILENAME_TO_SERVICE}
+_FILENAME_SCANNER = _substring_scanner(list(FILENAME_TO_SERVICE))
+_SPACED_SCANNER = _substring_scanner(list(_SPACED_KEYWORDS))
+# Queries: whole words only (optionally plural), so "s3" does not fire inside "cs300"
+_QUERY_KEYWORD_RE = re.compile(
+    rf"(?<![a-z0-9])({compile_literals(FILENAME_TO_SERVICE).pattern})s?(?![a-z0-9])"
+)
+
+
+@lru_cache(maxsize=4096)
 def get_service_from_filename(filename: str) -> str:
     """
     Automatically detects AWS service from filename.
@@ -225,23 +286,21 @@ def get_service_from_filename(filename: str) -> str:
     - iam_user_guide.pdf → iam
     - NEW-service-docs.pdf → auto detected
     """
-    import re
-    
     # Clean filename: remove extension, 
     # lowercase, replace separators with spaces
-    name = filename.lower()
-    name = re.sub(r'\.(pdf|docx|txt|html|md|csv|pptx|xlsx)$', '', name)
-    name = re.sub(r'[-_\.]', ' ', name)
-    name = re.sub(r'\b(user|guide|developer|dg|ug|api|ref|reference|'
-                  r'manual|doc|docs|documentation|amazon|aws|'
-                  r'latest|v1|v2|2023|2024|2025|2026)\b', '', name)
+    lowered = filename.lower()
+    name = _EXTENSION_RE.sub('', lowered)
+    name = _SEPARATOR_RE.sub(' ', name)
+    name = _BOILERPLATE_RE.sub('', name)
     name = name.strip()
     
     # Score each service by keyword matches
+    keywords = _find_substrings(_FILENAME_SCANNER, lowered)
+    keywords.update(_SPACED_KEYWORDS[k] for k in _find_substrings(_SPACED_SCANNER, name))
     scores = {}
-    for keyword, service in FILENAME_TO_SERVICE.items():
-        if keyword.replace('-', ' ') in name or keyword in filename.lower():
-            scores[service] = scores.get(service, 0) + len(keyword)
+    for keyword in sorted(keywords, key=_KEYWORD_ORDER.get):
+        service = FILENAME_TO_SERVICE[keyword]
+        scores[service] = scores.get(service, 0) + len(keyword)
     
     if scores:
         return max(scores, key=scores.get)
@@ -296,10 +355,9 @@ def detect_service(query: str) -> str:
     """
     # 1. First try exact keyword matching
     scores = {}
-    query_lower = query.lower()
-    for keyword, service in FILENAME_TO_SERVICE.items():
-        if keyword in query_lower:
-            scores[service] = scores.get(service, 0) + 1
+    for keyword in sorted(set(_QUERY_KEYWORD_RE.findall(query.lower())), key=_KEYWORD_ORDER.get):
+        service = FILENAME_TO_SERVICE[keyword]
+        scores[service] = scores.get(service, 0) + 1
     
     service = max(scores, key=scores.get) if scores else None
     
@@ -310,3 +368,9 @@ def detect_service(query: str) -> str:
             logger.info(f"Fuzzy matched '{query}' -> '{service}'")
     
     return service or "general"
+
+
+def get_service_filter(query: str) -> dict:
+    """Metadata filter for the service a query names ({} when it names none)."""
+    service = detect_service(query)
+    return {} if service == "general" else {"source_topic": service}
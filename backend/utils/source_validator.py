@@ -1,7 +1,15 @@
 import os
+import re
 import json
 import logging
+import threading
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from backend.utils.text_match import compile_literals
+
+from filelock import FileLock
 
 logger = logging.getLogger(__name__)
 
@@ -71,24 +79,166 @@ PERMANENTLY_BLOCKED = [
     "unknown",
 ]
 
+_BLOCKED = frozenset(PERMANENTLY_BLOCKED)
+_FAKE_PATTERN_RE = compile_literals([p.lower() for p in FAKE_SOURCE_PATTERNS], re.IGNORECASE)
+# Blocked file names an answer may cite; rewritten to the validated source in one pass
+_FAKE_CITATION_RE = compile_literals(PERMANENTLY_BLOCKED)
+
+
+def _is_blocked(filename: str) -> bool:
+    return filename in _BLOCKED or _FAKE_PATTERN_RE.search(filename) is not None
+
+
+class _SourceMatcher:
+    """Finds the first valid source named anywhere in a text (case-insensitive)."""
+
+    def __init__(self, sources):
+        self._canonical = {}
+        for source in sources:
+            self._canonical.setdefault(source.lower(), source)
+        self._regex = compile_literals(self._canonical, re.IGNORECASE)
+
+    def find(self, text: str) -> Optional[str]:
+        match = self._regex.search(text)
+        return self._canonical[match.group(0).lower()] if match else None
+
+
+@lru_cache(maxsize=16)
+def _matcher_for(sources: tuple) -> _SourceMatcher:
+    return _SourceMatcher(sources)
+
+
+class DocumentRegistry:
+    """
+    In-memory view of REGISTRY_FILE with precomputed lookups.
+    Reads never parse JSON: they stat the file and only reload when another process (or an S3
+    pull) replaced it. Writes take a file lock, re-read, apply the change and replace the file
+    atomically, so concurrent writers in any process never lose each other's updates.
+    `version` increases on every change to the in-memory state.
+    """
+
+    def __init__(self, path: str = REGISTRY_FILE):
+        self.path = path
+        self.version = 0
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(f"{path}.lock")
+        self._stamp = None
+        # (documents, valid_sources, by_service, source_matcher), replaced as a whole so readers see one version
+        self._view = ([], (), {}, None)
+        self.reload()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> list:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f).get("documents", [])
+        except FileNotFoundError:
+            return []
+        except (ValueError, AttributeError):
+            logger.warning(f"[REGISTRY] Unreadable registry file {self.path}, treating it as empty")
+            return []
+
+    def _apply(self, documents: list, stamp):
+        active = [d["filename"] for d in documents if d.get("active", True)]
+        by_service = {}
+        for doc in documents:
+            fname = doc.get("filename", "")
+            if doc.get("active", True) and not _is_blocked(fname):
+                by_service.setdefault(doc.get("service"), fname)
+        valid_sources = tuple(sorted(
+            s for s in set(active) | set(HARDCODED_FALLBACKS.values()) if not _is_blocked(s)
+        ))
+        self._view = (documents, valid_sources, by_service, _SourceMatcher(valid_sources))
+        self._stamp = stamp
+        self.version += 1
+
+    def reload(self):
+        """Re-reads the registry file, e.g. after it was pulled from S3."""
+        with self._lock:
+            stamp = self._file_stamp()
+            self._apply(self._read(), stamp)
+
+    def _refresh(self):
+        if self._file_stamp() != self._stamp:
+            self.reload()
+
+    def _write(self, mutate) -> bool:
+        """Applies `mutate(documents) -> changed` to the latest file contents under the file lock."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock, self._file_lock:
+            documents = self._read()
+            if not mutate(documents):
+                self._apply(documents, self._file_stamp())
+                return False
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"documents": documents}, f, indent=2)
+            os.replace(tmp_path, self.path)
+            self._apply(documents, self._file_stamp())
+            return True
+
+    def documents(self) -> list:
+        self._refresh()
+        return [dict(d) for d in self._view[0]]
+
+    def valid_sources(self) -> list:
+        self._refresh()
+        return list(self._view[1])
+
+    def source_for_service(self, service: str):
+        self._refresh()
+        return self._view[2].get(service)
+
+    def find_source(self, text: str) -> Optional[str]:
+        self._refresh()
+        return self._view[3].find(text)
+
+    def register(self, filename: str, service: str) -> bool:
+        def mutate(documents):
+            if any(d["filename"] == filename for d in documents):
+                return False
+            documents.append({
+                "filename": filename,
+                "service": service,
+                "uploaded": datetime.now().strftime("%Y-%m-%d"),
+                "active": True
+            })
+            return True
+        return self._write(mutate)
+
+    def remove(self, filename: str) -> bool:
+        def mutate(documents):
+            kept = [d for d in documents if d["filename"] != filename]
+            removed = len(kept) != len(documents)
+            documents[:] = kept
+            return removed
+        return self._write(mutate)
+
+    def replace(self, documents: list):
+        def mutate(current):
+            current[:] = documents
+            return True
+        self._write(mutate)
+
+
+document_registry = DocumentRegistry()
+
+
 def load_registry() -> dict:
-    if os.path.exists(REGISTRY_FILE):
-        with open(REGISTRY_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                return data
-            except:
-                return {"documents": []}
-    return {"documents": []}
+    return {"documents": document_registry.documents()}
 
 def save_registry(registry: dict):
-    os.makedirs(os.path.dirname(REGISTRY_FILE), exist_ok=True)
-    with open(REGISTRY_FILE, "w") as f:
-        json.dump(registry, f, indent=2)
+    document_registry.replace(registry.get("documents", []))
 
 def register_document(filename: str, service: str):
     # Block permanently — no exceptions
-    if filename in PERMANENTLY_BLOCKED or any(fake in filename.lower() for fake in FAKE_SOURCE_PATTERNS):
+    if _is_blocked(filename):
         logger.warning(f"BLOCKED fake source: {filename}")
         return None
 
@@ -98,31 +248,16 @@ def register_document(filename: str, service: str):
         logger.warning(f"BLOCKED .md file: {filename}")
         return None
 
-    registry = load_registry()
-    existing = [d["filename"] for d in registry["documents"]]
-    if filename not in existing:
-        registry["documents"].append({
-            "filename": filename,
-            "service": service,
-            "uploaded": datetime.now().strftime("%Y-%m-%d"),
-            "active": True
-        })
-        save_registry(registry)
+    if document_registry.register(filename, service):
         logger.info(f"[REGISTRY] Registered: {filename} → {service}")
 
+def remove_document(filename: str):
+    if document_registry.remove(filename):
+        logger.info(f"[REGISTRY] Removed: {filename}")
+
 def get_valid_sources() -> list:
-    registry = load_registry()
-    registered = [
-        d["filename"] for d in registry["documents"]
-        if d.get("active", True)
-    ]
-    # Always include hardcoded fallbacks
-    hardcoded = list(HARDCODED_FALLBACKS.values())
-    all_valid = list(set(registered + hardcoded))
-    
-    # FILTER: Remove any fake patterns even if they somehow got in
-    clean_valid = [s for s in all_valid if s not in PERMANENTLY_BLOCKED and not any(fake in s.lower() for fake in FAKE_SOURCE_PATTERNS)]
-    return clean_valid
+    # Registered active documents plus the hardcoded fallbacks, fake patterns filtered out
+    return document_registry.valid_sources()
 
 def get_correct_source_for_service(service: str) -> str:
     # First check hardcoded mapping
@@ -130,23 +265,24 @@ def get_correct_source_for_service(service: str) -> str:
         return HARDCODED_FALLBACKS[service]
     
     # Fallback to registry (filtering fakes)
-    registry = load_registry()
-    for doc in registry["documents"]:
-        fname = doc.get("filename", "")
-        if doc.get("service") == service and doc.get("active", True):
-            if fname not in PERMANENTLY_BLOCKED and not any(fake in fname.lower() for fake in FAKE_SOURCE_PATTERNS):
-                return fname
+    registered = document_registry.source_for_service(service)
+    if registered:
+        return registered
                 
     return HARDCODED_FALLBACKS.get(service, f"{service}-dg.pdf")
 
 def is_fake_source(source: str) -> bool:
-    source_lower = source.lower()
-    if source in PERMANENTLY_BLOCKED:
-        return True
-    for fake in FAKE_SOURCE_PATTERNS:
-        if fake.lower() in source_lower:
-            return True
-    return False
+    return _is_blocked(source)
+
+def find_valid_source(text: str, valid_sources: list = None) -> Optional[str]:
+    """The first valid source named in `text` (registry sources unless `valid_sources` is given)."""
+    if valid_sources is None:
+        return document_registry.find_source(text)
+    return _matcher_for(tuple(valid_sources)).find(text)
+
+def rewrite_fake_citations(answer: str, source: str) -> str:
+    """Replaces every blocked source name in `answer` with `source` in a single pass."""
+    return _FAKE_CITATION_RE.sub(lambda _: source, answer)
 
 def validate_source(
     cited_source: str,
@@ -154,14 +290,10 @@ def validate_source(
     service: str = None,
     chunks: list = None
 ) -> str:
-    if valid_sources is None:
-        valid_sources = get_valid_sources()
-
     # Check if cited source is already valid
-    for valid in valid_sources:
-        if valid.lower() in cited_source.lower():
-            if valid not in PERMANENTLY_BLOCKED:
-                return valid
+    valid = find_valid_source(cited_source, valid_sources)
+    if valid and valid not in _BLOCKED:
+        return valid
 
     # Use service-based lookup as priority fallback
     if service:
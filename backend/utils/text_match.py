@@ -0,0 +1,31 @@
+"""
+Text Matching Helpers
+- Compiles a set of literal strings into one prefix-factored regex (a trie), the regex
+  equivalent of an Aho-Corasick automaton: one scan of the text finds any of the words,
+  and the cost does not grow with the number of words
+"""
+import re
+from typing import Iterable
+
+
+def compile_literals(words: Iterable[str], flags: int = 0) -> "re.Pattern":
+    """
+    One regex matching any of `words`, factored into a prefix trie (a|ab|ac -> a(?:b|c)?),
+    so matching costs depend on the text length, not on how many words there are.
+    Longest match wins at each position. Pass re.IGNORECASE with lowercased words.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        alternatives = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alternatives:
+            return ""
+        pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return re.compile(build(trie) if trie else r"(?!)", flags)
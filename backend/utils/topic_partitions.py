@@ -0,0 +1,37 @@
+"""
+Topic Partition Helpers
+- Chunks are partitioned by metadata["source_topic"] (the detected AWS service); chunks
+  without one go to the small global "general" partition
+- A source_topic filter selects partitions; the remaining filter keys are checked per chunk
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+GENERAL_TOPIC = "general"
+TOPIC_KEY = "source_topic"
+
+
+def topic_of(metadata: Dict[str, Any]) -> str:
+    return metadata.get(TOPIC_KEY) or GENERAL_TOPIC
+
+
+def split_filter(filter: Optional[Dict[str, Any]]) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+    """(topics to search, or None for all partitions; the filter keys left to check per chunk)."""
+    if not filter:
+        return None, {}
+    rest = {key: value for key, value in filter.items() if key != TOPIC_KEY}
+    if TOPIC_KEY not in filter:
+        return None, rest
+    value = filter[TOPIC_KEY]
+    return (list(value) if isinstance(value, (list, tuple, set)) else [value]), rest
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Equality per key; a list value matches any of its items."""
+    for key, value in filter.items():
+        actual = metadata.get(key)
+        if isinstance(value, list):
+            if actual not in value:
+                return False
+        elif actual != value:
+            return False
+    return True
@@ -0,0 +1,155 @@
+"""
+Upload Helpers
+- Streams uploads to disk in fixed-size blocks while hashing (no whole-file reads)
+- Expands .zip / .tar(.gz) archives member by member with path-traversal protection
+- Archive expansion is capped per member and in total by decompressed bytes (zip bombs)
+"""
+import os
+import shutil
+import hashlib
+import tarfile
+import zipfile
+from typing import List, Dict, Any, Optional
+from loguru import logger
+
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+def sanitize_filename(filename: str) -> str:
+    """Basic filename sanitization to prevent directory traversal."""
+    # Remove path components and only keep basename
+    base = os.path.basename(filename.replace("\\", "/"))
+    # Replace spaces with underscores
+    return base.replace(" ", "_")
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+async def save_upload(upload, target_path: str, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Writes an UploadFile to disk block by block. Returns {"sha256", "size"}."""
+    import aiofiles
+
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(target_path, mode="wb") as f:
+        while True:
+            block = await upload.read(UPLOAD_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if max_bytes and size > max_bytes:
+                raise ValueError(f"{upload.filename} exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+            digest.update(block)
+            await f.write(block)
+    return {"sha256": digest.hexdigest(), "size": size}
+
+
+def _copy_hashed(src, target_path: str, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Copies `src` while hashing; stops as soon as more than `max_bytes` have been read."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(target_path, "wb") as dst:
+        for block in iter(lambda: src.read(UPLOAD_BLOCK_SIZE), b""):
+            size += len(block)
+            if max_bytes is not None and size > max_bytes:
+                raise ValueError(f"{os.path.basename(target_path)} decompresses to more than {max_bytes // (1024 * 1024)} MB")
+            digest.update(block)
+            dst.write(block)
+    return {"sha256": digest.hexdigest(), "size": size}
+
+
+def extract_archive(
+    archive_path: str,
+    target_dir: str,
+    max_files: int,
+    max_member_bytes: Optional[int] = None,
+    max_total_bytes: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Extracts regular files from a zip or tar archive into `target_dir` (flattened).
+    Returns [{"filename", "path", "sha256", "size"}]. Hidden files and macOS
+    resource forks are skipped; links and special files are never written.
+    A member larger than `max_member_bytes`, or more than `max_total_bytes` of output,
+    rejects the whole archive: declared sizes are checked first, then the bytes actually
+    written (headers can lie). `target_dir` is removed when the archive is rejected.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    extracted = []
+
+    def accept(member_name: str, declared_size: int) -> Optional[str]:
+        name = sanitize_filename(member_name)
+        parts = member_name.replace("\\", "/").split("/")
+        if not name or name.startswith(".") or "__MACOSX" in parts:
+            return None
+        if len(extracted) >= max_files:
+            raise ValueError(f"Archive contains more than {max_files} files")
+        if max_member_bytes is not None and declared_size > max_member_bytes:
+            raise ValueError(f"{name} decompresses to more than {max_member_bytes // (1024 * 1024)} MB")
+        if max_total_bytes is not None and written() + declared_size > max_total_bytes:
+            raise ValueError(f"Archive decompresses to more than {max_total_bytes // (1024 * 1024)} MB")
+        return name
+
+    def written() -> int:
+        return sum(f["size"] for f in extracted)
+
+    def budget() -> Optional[int]:
+        """Bytes the next member may still write."""
+        limits = []
+        if max_member_bytes is not None:
+            limits.append(max_member_bytes)
+        if max_total_bytes is not None:
+            limits.append(max_total_bytes - written())
+        return min(limits) if limits else None
+
+    def unique_path(name: str) -> str:
+        path = os.path.join(target_dir, name)
+        stem, ext = os.path.splitext(name)
+        n = 1
+        while os.path.exists(path):
+            path = os.path.join(target_dir, f"{stem}_{n}{ext}")
+            n += 1
+        return path
+
+    try:
+        if zipfile.is_zipfile(archive_path):
+            with zipfile.ZipFile(archive_path) as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    name = accept(info.filename, info.file_size)
+                    if not name:
+                        continue
+                    path = unique_path(name)
+                    with zf.open(info) as src:
+                        extracted.append({"filename": os.path.basename(path), "path": path, **_copy_hashed(src, path, budget())})
+        else:
+            with tarfile.open(archive_path) as tf:
+                for member in tf:
+                    if not member.isfile():
+                        continue
+                    name = accept(member.name, member.size)
+                    if not name:
+                        continue
+                    path = unique_path(name)
+                    src = tf.extractfile(member)
+                    with src:
+                        extracted.append({"filename": os.path.basename(path), "path": path, **_copy_hashed(src, path, budget())})
+    except Exception:
+        remove_quietly(target_dir)
+        raise
+
+    logger.info(f"Extracted {len(extracted)} files from {os.path.basename(archive_path)}")
+    return extracted
+
+
+def remove_quietly(path: str):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,139 @@
+"""
+S3 Transfer Benchmark
+- Compares the old transfer path (default client/TransferConfig, one file after another on the
+  default executor) with the shared S3Transfer layer (tuned multipart, sized pools, parallel files)
+- Measures an index upload (index.faiss + index.pkl + documents) and the startup pull of the index
+- Runs against a local S3 stand-in: a moto server started in-process (needs moto[server]),
+  any endpoint such as MinIO/LocalStack (--endpoint-url), or moto's in-memory mock (--in-process)
+
+Usage:
+    python scripts/benchmark_s3_transfer.py --index-mb 128 --docs 20 --doc-mb 4
+    python scripts/benchmark_s3_transfer.py --endpoint-url http://localhost:9000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Ensure the root directory is in the python path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+import boto3
+
+from backend.core.config import settings
+from backend.services.s3_transfer import S3Transfer, build_client
+
+BUCKET = "rag-transfer-benchmark"
+
+
+def _make_file(path: str, size_mb: int):
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+
+async def _baseline(client, uploads, downloads):
+    """The pre-transfer-layer behaviour: default config, sequential, default executor."""
+    loop = asyncio.get_event_loop()
+    start = time.perf_counter()
+    for path, key in uploads:
+        await loop.run_in_executor(None, lambda p=path, k=key: client.upload_file(p, BUCKET, k))
+    upload_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for key, path in downloads:
+        await loop.run_in_executor(None, lambda k=key, p=path: client.download_file(BUCKET, k, p))
+    return upload_s, time.perf_counter() - start
+
+
+async def _tuned(transfer: S3Transfer, uploads, downloads):
+    start = time.perf_counter()
+    for result in await transfer.upload_many(uploads):
+        if isinstance(result, Exception):
+            raise result
+    upload_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for result in await transfer.download_many(downloads):
+        if isinstance(result, Exception):
+            raise result
+    return upload_s, time.perf_counter() - start
+
+
+async def run(endpoint_url, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        src = os.path.join(workdir, "src")
+        os.makedirs(src)
+        uploads = []
+        for name, size in [("index.faiss", args.index_mb), ("index.pkl", max(1, args.index_mb // 8))]:
+            _make_file(os.path.join(src, name), size)
+            uploads.append((os.path.join(src, name), f"indexes/faiss/{name}"))
+        for i in range(args.docs):
+            path = os.path.join(src, f"doc{i}.pdf")
+            _make_file(path, args.doc_mb)
+            uploads.append((path, f"documents/general/doc{i}.pdf"))
+        index_keys = [key for _, key in uploads[:2]]
+        total_mb = args.index_mb + max(1, args.index_mb // 8) + args.docs * args.doc_mb
+
+        default_client = boto3.client("s3", region_name="us-east-1", endpoint_url=endpoint_url)
+        default_client.create_bucket(Bucket=BUCKET)
+        tuned = S3Transfer(build_client(endpoint_url=endpoint_url), BUCKET)
+
+        results = {}
+        for label in ("baseline", "tuned"):
+            dest = os.path.join(workdir, label)
+            downloads = [(key, os.path.join(dest, os.path.basename(key))) for key in index_keys]
+            os.makedirs(dest)
+            if label == "baseline":
+                results[label] = await _baseline(default_client, uploads, downloads)
+            else:
+                results[label] = await _tuned(tuned, uploads, downloads)
+        tuned.shutdown()
+
+    print(f"\n{len(uploads)} files, {total_mb} MB uploaded; index pull = {args.index_mb + max(1, args.index_mb // 8)} MB")
+    print(f"{'':10} {'upload s':>10} {'pull s':>10}")
+    for label, (up, down) in results.items():
+        print(f"{label:10} {up:10.2f} {down:10.2f}")
+    base, new = results["baseline"], results["tuned"]
+    print(f"{'speedup':10} {base[0] / new[0]:9.1f}x {base[1] / new[1]:9.1f}x")
+    print(
+        f"\nTransferConfig: threshold={settings.S3_MULTIPART_THRESHOLD_MB}MB "
+        f"part={settings.S3_MULTIPART_CHUNKSIZE_MB}MB concurrency={settings.S3_MAX_CONCURRENCY} "
+        f"threads={settings.EXECUTOR_IO_THREADS} pool={settings.S3_MAX_POOL_CONNECTIONS}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark S3 uploads/pulls against a local S3 stand-in")
+    parser.add_argument("--endpoint-url", help="existing S3-compatible endpoint (MinIO, LocalStack, moto server)")
+    parser.add_argument("--in-process", action="store_true", help="use moto's in-memory mock (no HTTP)")
+    parser.add_argument("--port", type=int, default=5055, help="port for the in-process moto server")
+    parser.add_argument("--index-mb", type=int, default=64)
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--doc-mb", type=int, default=2)
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        asyncio.run(run(args.endpoint_url, args))
+    elif args.in_process:
+        from moto import mock_aws
+        with mock_aws():
+            asyncio.run(run(None, args))
+    else:
+        from moto.server import ThreadedMotoServer
+        server = ThreadedMotoServer(port=args.port, verbose=False)
+        server.start()
+        try:
+            asyncio.run(run(f"http://127.0.0.1:{args.port}", args))
+        finally:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
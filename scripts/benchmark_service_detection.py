@@ -0,0 +1,117 @@
+"""
+Service Detection Benchmark
+- Per-query cost of detect_service, get_service_from_filename and the per-word typo correction
+  done by LLMService.preprocess_query
+- "baseline" re-implements the old loops (substring check per keyword, regexes compiled per call,
+  rapidfuzz extractOne for every word); "compiled" is backend/utils/service_detection.py
+- Filename timings bypass the lru_cache so they measure detection, not cache hits
+
+Usage:
+    python scripts/benchmark_service_detection.py --rounds 2000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+# Ensure the root directory is in the python path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from rapidfuzz import process, fuzz
+
+from backend.utils import service_detection as sd
+
+QUERIES = [
+    "What is the maximum timeout for a Lambda function?",
+    "how do I enable versioning on an s3 bucket",
+    "Difference between ec2 instance store and ebs volumes",
+    "Configure IAM roles for EKS service accounts",
+    "slmabda memory limits and /tmp storage",
+    "dynmodb global tables replication lag",
+    "How much does it cost to run a NAT gateway in my VPC?",
+    "Explain clodwatch alarms with step functions retries",
+]
+
+FILENAMES = [
+    "lambda-dg.pdf", "s3-userguide.pdf", "AmazonEC2UserGuide.pdf", "iam_user_guide.pdf",
+    "AmazonVPC_UserGuide.pdf", "cloudformation-userguide.pdf", "amazon-bedrock-ug.pdf",
+    "secretsmanager-userguide.pdf", "dynamodb-developer-guide.pdf", "route53-developer-guide.pdf",
+]
+
+
+def baseline_detect_service(query: str) -> str:
+    scores = {}
+    query_lower = query.lower()
+    for keyword, service in sd.FILENAME_TO_SERVICE.items():
+        if keyword in query_lower:
+            scores[service] = scores.get(service, 0) + 1
+    service = max(scores, key=scores.get) if scores else None
+    return service or baseline_fuzzy(query) or "general"
+
+
+def baseline_fuzzy(query: str):
+    best_service, best_score = None, 0
+    for word in query.lower().split():
+        if len(word) < 3:
+            continue
+        match = process.extractOne(word, sd.AWS_SERVICES, scorer=fuzz.ratio, score_cutoff=65)
+        if match and match[1] > best_score:
+            best_service, best_score = match[0], match[1]
+    return best_service
+
+
+def baseline_filename(filename: str) -> str:
+    name = filename.lower()
+    name = re.sub(r'\.(pdf|docx|txt|html|md|csv|pptx|xlsx)$', '', name)
+    name = re.sub(r'[-_\.]', ' ', name)
+    name = re.sub(r'\b(user|guide|developer|dg|ug|api|ref|reference|'
+                  r'manual|doc|docs|documentation|amazon|aws|'
+                  r'latest|v1|v2|2023|2024|2025|2026)\b', '', name)
+    name = name.strip()
+    scores = {}
+    for keyword, service in sd.FILENAME_TO_SERVICE.items():
+        if keyword.replace('-', ' ') in name or keyword in filename.lower():
+            scores[service] = scores.get(service, 0) + len(keyword)
+    return max(scores, key=scores.get) if scores else "general"
+
+
+def preprocess(query: str, fuzzy) -> list:
+    """The per-word loop of LLMService.preprocess_query."""
+    return [fuzzy(re.sub(r'[^\w\s]', '', word)) for word in query.split()]
+
+
+def per_call_us(fn, inputs, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for item in inputs:
+            fn(item)
+    return (time.perf_counter() - start) / (rounds * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-query service detection")
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    compiled_filename = sd.get_service_from_filename.__wrapped__
+    cases = [
+        ("detect_service", baseline_detect_service, sd.detect_service, QUERIES),
+        ("get_service_from_filename", baseline_filename, compiled_filename, FILENAMES),
+        ("preprocess_query words", lambda q: preprocess(q, baseline_fuzzy), lambda q: preprocess(q, sd.fuzzy_match_service), QUERIES),
+    ]
+
+    print(f"{len(sd.FILENAME_TO_SERVICE)} keywords, {len(sd.AWS_SERVICES)} fuzzy vocabulary entries, {args.rounds} rounds\n")
+    print(f"{'':28} {'baseline us':>12} {'compiled us':>12} {'speedup':>8}")
+    for label, old, new, inputs in cases:
+        mismatched = [item for item in inputs if label == "get_service_from_filename" and old(item) != new(item)]
+        base = per_call_us(old, inputs, args.rounds)
+        fast = per_call_us(new, inputs, args.rounds)
+        print(f"{label:28} {base:12.1f} {fast:12.1f} {base / fast:7.1f}x")
+        if mismatched:
+            print(f"  filename results differ for: {mismatched}")
+
+
+if __name__ == "__main__":
+    main()
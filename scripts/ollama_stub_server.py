@@ -0,0 +1,87 @@
+"""
+Ollama Stub Server
+- Minimal stand-in for the Ollama HTTP API (/api/generate, /api/chat, /api/tags)
+- Per-model latency and failure injection for exercising circuit breakers and hedging
+
+Usage:
+    python scripts/ollama_stub_server.py --port 11500 --delay ollama/llama3.2=40 --fail llama3
+    OLLAMA_BASE_URL=http://localhost:11500 python scripts/run_backend.py
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+
+def _parse_delays(values):
+    delays = {}
+    for item in values or []:
+        model, _, seconds = item.partition("=")
+        delays[model.replace("ollama/", "")] = float(seconds)
+    return delays
+
+
+def build_app(delays=None, failing=None) -> web.Application:
+    delays = delays or {}
+    failing = {m.replace("ollama/", "") for m in (failing or [])}
+    stats = {"requests": {}}
+
+    async def _simulate(model: str):
+        stats["requests"][model] = stats["requests"].get(model, 0) + 1
+        await asyncio.sleep(delays.get(model, 0.0))
+        if model in failing:
+            raise web.HTTPInternalServerError(text=f'{{"error": "stub failure for {model}"}}')
+
+    def _base(model: str) -> dict:
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": 1,
+            "eval_count": 1,
+        }
+
+    async def generate(request):
+        body = await request.json()
+        model = body.get("model", "")
+        await _simulate(model)
+        return web.json_response({**_base(model), "response": f"[{model}] stub answer"})
+
+    async def chat(request):
+        body = await request.json()
+        model = body.get("model", "")
+        await _simulate(model)
+        return web.json_response({
+            **_base(model),
+            "message": {"role": "assistant", "content": f"[{model}] stub answer"},
+        })
+
+    async def tags(request):
+        models = sorted(set(delays) | failing)
+        return web.json_response({"models": [{"name": m} for m in models]})
+
+    async def show(request):
+        return web.json_response({"template": "", "parameters": "", "model_info": {}})
+
+    async def stub_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/chat", chat)
+    app.router.add_post("/api/show", show)
+    app.router.add_get("/api/tags", tags)
+    app.router.add_get("/stub/stats", stub_stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Ollama stub for failure-injection testing")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--delay", action="append", help="model=seconds, may be repeated")
+    parser.add_argument("--fail", action="append", help="model that always returns HTTP 500")
+    args = parser.parse_args()
+
+    web.run_app(build_app(_parse_delays(args.delay), args.fail), port=args.port)
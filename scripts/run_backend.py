@@ -1,3 +1,4 @@
+import argparse
 import uvicorn
 import os
 import sys
@@ -6,5 +7,13 @@ import sys
 root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(root_dir)
 
+from backend.core.config import settings
+
 if __name__ == "__main__":
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=False)
+    parser = argparse.ArgumentParser(description="Run the FastAPI backend")
+    parser.add_argument("--workers", type=int, default=settings.SERVING_WORKERS,
+                        help="uvicorn worker processes (>1 serves queries from shared index snapshots)")
+    args = parser.parse_args()
+    # Workers re-read settings from the environment; they need the count to pick their role
+    os.environ["SERVING_WORKERS"] = str(args.workers)
+    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=False, workers=args.workers)
@@ -0,0 +1,28 @@
+"""
+Inference Sidecar
+- Hosts the embedding model and the FlashRank / cross-encoder rerankers in their own process
+- Start it next to the API and set INFERENCE_URL=http://<INFERENCE_HOST>:<INFERENCE_PORT> for the API,
+  which then no longer loads any model
+
+Usage:
+    python scripts/run_inference_server.py --port 8100
+"""
+import argparse
+import os
+import sys
+
+# Ensure the root directory is in the python path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import uvicorn
+
+from backend.core.config import settings
+from backend.services.inference_server import create_app
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the embedding / reranking inference sidecar")
+    parser.add_argument("--host", default=settings.INFERENCE_HOST)
+    parser.add_argument("--port", type=int, default=settings.INFERENCE_PORT)
+    args = parser.parse_args()
+    uvicorn.run(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,45 @@
+"""
+Standalone Ingestion Worker
+- Claims jobs from the SQL ingestion queue and runs them outside the API process
+- Start several of these (and set INGESTION_WORKERS=0 for the API) to keep bulk uploads off the chat path
+- Only extracts, chunks and embeds into the shared chunk cache (same data/ directory as the API);
+  the API's index writer indexes the prepared jobs, so no process overwrites another's index files
+
+Usage:
+    python scripts/run_ingestion_worker.py --workers 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Ensure the root directory is in the python path
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+from loguru import logger
+
+from backend.models.database import engine, Base
+from backend.services.ingestion_queue import IngestionWorkerPool, ingestion_queue
+
+
+async def main(workers: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    pool = IngestionWorkerPool(ingestion_queue, index_writer=False)
+    await pool.start(workers=workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run ingestion workers against the shared job queue")
+    parser.add_argument("--workers", type=int, default=1, help="concurrent jobs in this process")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.workers))
+    except KeyboardInterrupt:
+        logger.info("Ingestion worker stopped.")
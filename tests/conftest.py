@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# Make the backend package importable when running `pytest tests/` from the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings requires these secrets; provide throwaway values for the test run
+os.environ.setdefault("MASTER_ENCRYPTION_KEY", "AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA=")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+
+@pytest.fixture
+def topic_docs():
+    """Builds chunks of one topic's guide (`<topic>-dg.pdf`), one per text."""
+    def build(topic, texts):
+        return [
+            {"content": t, "metadata": {"source": f"{topic}-dg.pdf", "chunk_index": i, "source_topic": topic}}
+            for i, t in enumerate(texts)
+        ]
+    return build
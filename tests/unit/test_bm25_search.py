@@ -0,0 +1,87 @@
+import os
+import pickle
+import threading
+
+from backend.services.retrieval.bm25_search import BM25Index
+
+
+def _docs(texts, source="s3-dg.pdf"):
+    return [{"content": t, "metadata": {"source": source, "chunk_index": i}} for i, t in enumerate(texts)]
+
+
+def test_deferred_persist_is_searchable(tmp_path):
+    path = str(tmp_path / "bm25.pkl")
+    index = BM25Index(index_path=path)
+
+    # Streaming ingestion: several batches without touching disk
+    index.add_documents(_docs(["bucket versioning keeps old objects", "lifecycle rules expire objects"]), persist=False)
+    index.add_documents(_docs(["multipart upload splits large objects"]), persist=False)
+    assert not os.path.exists(path)
+
+    results = index.search("multipart upload")
+    assert results[0]["content"] == "multipart upload splits large objects"
+
+    index.save()
+    reloaded = BM25Index(index_path=path)
+    assert len(reloaded.corpus) == 3
+    assert reloaded.search("lifecycle")[0]["content"] == "lifecycle rules expire objects"
+
+
+def test_topic_filter_searches_only_that_partition(tmp_path, topic_docs):
+    index = BM25Index(index_path=str(tmp_path / "bm25.pkl"))
+    index.add_documents(topic_docs("s3", ["bucket timeout settings", "object lock"]), persist=False)
+    index.add_documents(topic_docs("lambda", ["function timeout is 900 seconds", "layers"]), persist=False)
+    index.add_documents(_docs(["general timeout guidance"], source="faq.pdf"), persist=False)
+
+    lambda_only = index.search("timeout", filter={"source_topic": "lambda"})
+    assert [r["content"] for r in lambda_only] == ["function timeout is 900 seconds"]
+    both = index.search("timeout", filter={"source_topic": ["lambda", "s3"]})
+    assert {r["metadata"]["source_topic"] for r in both} == {"lambda", "s3"}
+    # Unfiltered queries fan out over every partition, including the general one
+    assert len(index.search("timeout")) == 3
+
+    # Ingesting one topic leaves the other partitions' statistics alone
+    s3_partition = index._partitions["s3"]
+    index.add_documents(topic_docs("lambda", ["timeout errors in async invokes"]), persist=False)
+    assert len(index.search("timeout", filter={"source_topic": "lambda"})) == 2
+    assert index._partitions["s3"] is s3_partition
+
+
+def test_partitions_survive_save_delete_and_old_pickles(tmp_path, topic_docs):
+    path = str(tmp_path / "bm25.pkl")
+    index = BM25Index(index_path=path)
+    index.add_documents(topic_docs("s3", ["bucket policy", "bucket versioning"]) + topic_docs("ec2", ["instance types", "spot pricing", "placement groups"]))
+
+    reloaded = BM25Index(index_path=path)
+    assert set(reloaded._partitions) == {"s3", "ec2"}
+    assert reloaded.search("bucket", filter={"source_topic": "s3", "chunk_index": 1})[0]["content"] == "bucket versioning"
+
+    reloaded.delete_documents({"source": "s3-dg.pdf"})
+    assert reloaded.search("bucket") == []
+    assert reloaded.search("instance")[0]["metadata"]["source_topic"] == "ec2"
+
+    # Pickles from before partitioning hold one global "bm25" object
+    with open(path, "wb") as f:
+        texts = ["instance types", "spot pricing", "placement groups"]
+        pickle.dump({"bm25": None, "corpus": [t.split() for t in texts], "original_corpus": texts,
+                     "metadatas": [{"source": "ec2-ug.pdf", "source_topic": "ec2"}] * 3}, f)
+    legacy = BM25Index(index_path=path)
+    assert legacy.search("instance", filter={"source_topic": "ec2"})[0]["content"] == "instance types"
+
+
+def test_searches_run_concurrently_and_see_new_batches(tmp_path):
+    index = BM25Index(index_path=str(tmp_path / "bm25.pkl"))
+    index.add_documents(_docs(["bucket versioning keeps old objects", "lifecycle rules", "multipart upload"]), persist=False)
+    index.search("bucket")  # builds the statistics once
+    results = []
+
+    # A search in flight holds the read lock; another search does not wait for it
+    with index._rw.read():
+        searcher = threading.Thread(target=lambda: results.append(index.search("versioning")))
+        searcher.start()
+        searcher.join(timeout=2)
+        assert not searcher.is_alive() and len(results[0]) == 1
+
+    # A later batch marks its topic stale; the next search rebuilds it under the write lock
+    index.add_documents(_docs(["object lock prevents deletes"]), persist=False)
+    assert index.search("lock")[0]["content"] == "object lock prevents deletes"
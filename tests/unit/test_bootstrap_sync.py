@@ -0,0 +1,185 @@
+import asyncio
+from types import SimpleNamespace
+
+import boto3
+import pytest
+import pytest_asyncio
+from moto import mock_aws
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from backend.models.database import Base
+from backend.models.models import Document
+from backend.services.retrieval.bootstrap_sync import BootstrapSync
+from backend.services.s3_sync import S3SyncManager
+from backend.utils.chunk_cache import hash_file
+from backend.core.config import settings
+
+BUCKET = "rag-bootstrap-test"
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/bootstrap.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    await engine.dispose()
+
+
+class FakeEngine:
+    def __init__(self):
+        self.added = []
+        self.embeddings = {}
+        self.persisted = 0
+        self.concurrent = 0
+        self.max_concurrent = 0
+
+    async def add_to_all_stores(self, chunks, persist=True, embeddings=None):
+        assert persist is False
+        self.embeddings[chunks[0]["metadata"]["source"]] = embeddings
+        self.concurrent += 1
+        self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        await asyncio.sleep(0.01)
+        self.added.append(chunks[0]["metadata"]["source"])
+        self.concurrent -= 1
+
+    async def persist_all_stores(self):
+        self.persisted += 1
+
+
+async def fake_process_file(path, filename):
+    with open(path) as f:
+        return [{"content": f.read(), "metadata": {"source": filename}}]
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_diffs_once_and_indexes_concurrently(session_factory, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(settings, "BOOTSTRAP_DOWNLOAD_CONCURRENCY", 4)
+
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for i in range(6):
+            client.put_object(Bucket=BUCKET, Key=f"documents/lambda/guide{i}.txt", Body=f"guide {i}".encode())
+
+        # guide0 is already indexed with the current ETag; guide1 has a stale ETag
+        etags = {o["Key"]: o["ETag"].strip('"') for o in client.list_objects_v2(Bucket=BUCKET)["Contents"]}
+        async with session_factory() as db:
+            db.add(Document(filename="guide0.txt", status="completed",
+                            metadata_info={"s3_etag": etags["documents/lambda/guide0.txt"]}))
+            db.add(Document(filename="guide1.txt", status="completed", metadata_info={"s3_etag": "stale"}))
+            await db.commit()
+
+        engine = FakeEngine()
+        service = SimpleNamespace(engine=engine, doc_processor=SimpleNamespace(process_file=fake_process_file))
+        sync = BootstrapSync(retrieval_service=service, s3_manager=S3SyncManager(), session_factory=session_factory)
+        await sync.run_bootstrap_sync()
+
+    progress = sync.get_progress()
+    assert progress["state"] == "done"
+    assert progress["up_to_date"] == 1 and progress["to_sync"] == 5
+    assert progress["indexed"] == 5 and progress["failed"] == 0
+    assert sorted(engine.added) == [f"guide{i}.txt" for i in range(1, 6)]
+    assert engine.max_concurrent == 1
+    assert engine.persisted == 1
+
+    async with session_factory() as db:
+        docs = (await db.execute(select(Document))).scalars().all()
+    assert len(docs) == 6
+    assert all(d.status == "completed" for d in docs)
+    assert {d.metadata_info["s3_etag"] for d in docs} == set(etags.values())
+
+
+@pytest.mark.asyncio
+async def test_bootstrap_warm_starts_from_matching_artifacts(session_factory, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        manager = S3SyncManager()
+        chunks = [{"content": f"part {i}", "metadata": {"source": "warm.txt", "chunk_index": i}} for i in range(3)]
+        for name in ("warm.txt", "stale.txt"):
+            path = tmp_path / name
+            path.write_text(f"{name} bytes")
+            await manager._upload_original_document(name, "lambda", str(path), hash_file(str(path)))
+        # warm.txt: artifacts match the document bytes; stale.txt: artifacts from older bytes
+        await manager._upload_chunks("warm.txt", "lambda", chunks, hash_file(str(tmp_path / "warm.txt")))
+        await manager._upload_embeddings("warm.txt", "lambda", [[0.1, 0.2]] * 3)
+        await manager._upload_chunks("stale.txt", "lambda", chunks, "0" * 64)
+
+        extracted = []
+
+        async def tracking_process_file(path, filename):
+            extracted.append(filename)
+            return await fake_process_file(path, filename)
+
+        engine = FakeEngine()
+        service = SimpleNamespace(engine=engine, doc_processor=SimpleNamespace(process_file=tracking_process_file))
+        sync = BootstrapSync(retrieval_service=service, s3_manager=manager, session_factory=session_factory)
+        await sync.run_bootstrap_sync()
+
+    progress = sync.get_progress()
+    assert progress["warm_started"] == 1 and progress["indexed"] == 1
+    assert extracted == ["stale.txt"]
+    assert engine.embeddings["warm.txt"].shape == (3, 2)
+    assert engine.embeddings["stale.txt"] is None
+    assert engine.persisted == 1
+
+
+class FailingEngine(FakeEngine):
+    """bad.txt fails in the stores; persist fails when `persist_error` is set."""
+
+    def __init__(self, persist_error=None):
+        super().__init__()
+        self.persist_error = persist_error
+
+    async def add_to_all_stores(self, chunks, persist=True, embeddings=None):
+        if chunks[0]["metadata"]["source"] == "bad.txt":
+            raise RuntimeError("Indexing failed in faiss")
+        await super().add_to_all_stores(chunks, persist=persist, embeddings=embeddings)
+
+    async def persist_all_stores(self):
+        await super().persist_all_stores()
+        if self.persist_error:
+            raise self.persist_error
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("persist_error", [None, OSError("disk full")])
+async def test_bootstrap_completes_documents_only_once_saved(session_factory, tmp_path, monkeypatch, persist_error):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for name in ("good.txt", "bad.txt"):
+            client.put_object(Bucket=BUCKET, Key=f"documents/lambda/{name}", Body=name.encode())
+
+        engine = FailingEngine(persist_error)
+        service = SimpleNamespace(engine=engine, doc_processor=SimpleNamespace(process_file=fake_process_file))
+        sync = BootstrapSync(retrieval_service=service, s3_manager=S3SyncManager(), session_factory=session_factory)
+        await sync.run_bootstrap_sync()
+
+    async with session_factory() as db:
+        docs = {d.filename: d for d in (await db.execute(select(Document))).scalars().all()}
+    # A store failure is never recorded as completed, and no ETag lets the next diff skip it
+    assert docs["bad.txt"].status.startswith("failed")
+    assert "s3_etag" not in docs["bad.txt"].metadata_info
+    if persist_error is None:
+        assert sync.get_progress()["failed"] == 1
+        assert docs["good.txt"].status == "completed" and docs["good.txt"].metadata_info["s3_etag"]
+    else:
+        assert sync.get_progress()["state"] == "failed" and sync.get_progress()["failed"] == 2
+        assert docs["good.txt"].status == "failed (index not saved)"
+        assert "s3_etag" not in docs["good.txt"].metadata_info
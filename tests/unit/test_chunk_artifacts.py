@@ -0,0 +1,41 @@
+import gzip
+import io
+import json
+from types import SimpleNamespace
+
+from backend.utils.chunk_artifacts import (
+    CHUNK_ARTIFACT_SCHEMA, artifact_header, artifact_name, chunks_reusable,
+    read_chunk_artifact, write_chunk_artifact
+)
+
+
+def test_jsonl_artifact_round_trip(tmp_path):
+    chunks = [
+        {"content": "Lambda scales automatically.", "metadata": {"source": "lambda-dg.pdf", "chunk_id": "ab-0"}},
+        SimpleNamespace(page_content="Functions run in an execution environment.", metadata={"source": "lambda-dg.pdf"}),
+    ]
+    path = str(tmp_path / artifact_name("lambda-dg.pdf", "_chunks.jsonl.gz"))
+    assert path.endswith("lambda-dg.pdf_chunks.jsonl.gz")
+    assert artifact_name("lambda-dg.txt", "_chunks.jsonl.gz") != artifact_name("lambda-dg.pdf", "_chunks.jsonl.gz")
+
+    header = artifact_header("lambda-dg.pdf", "lambda", len(chunks), "f" * 64)
+    assert write_chunk_artifact(path, header, chunks) == 2
+
+    with gzip.open(path, "rt") as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3 and json.loads(lines[0])["schema_version"] == CHUNK_ARTIFACT_SCHEMA
+
+    with open(path, "rb") as f:
+        loaded_header, records = read_chunk_artifact(f)
+    assert chunks_reusable(loaded_header, "f" * 64)
+    assert [r["text"] for r in records] == ["Lambda scales automatically.", "Functions run in an execution environment."]
+    assert records[0]["chunk_id"] == "ab-0" and records[1]["metadata"] == {"source": "lambda-dg.pdf"}
+
+
+def test_other_schema_versions_are_not_parsed():
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as f:
+        f.write(b'{"schema_version": 2}\n{"text": "old"}\n')
+    buf.seek(0)
+    header, records = read_chunk_artifact(buf)
+    assert header["schema_version"] == 2 and records == []
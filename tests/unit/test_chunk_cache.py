@@ -0,0 +1,64 @@
+import os
+import time
+
+import numpy as np
+
+from backend.utils.chunk_cache import ChunkCache, hash_file
+
+
+def _chunks(source, n=3):
+    return [
+        {"content": f"chunk {i} " * 50, "metadata": {"source": source, "chunk_index": i, "page_start": i + 1}}
+        for i in range(n)
+    ]
+
+
+def test_hit_is_content_addressed(tmp_path):
+    first = tmp_path / "1a2b3c4d_lambda-dg.pdf"
+    second = tmp_path / "9f8e7d6c_lambda-dg.pdf"
+    first.write_bytes(b"%PDF same bytes")
+    second.write_bytes(b"%PDF same bytes")
+    assert hash_file(str(first)) == hash_file(str(second))
+
+    cache = ChunkCache(cache_dir=str(tmp_path / "cache"))
+    cache.put(hash_file(str(first)), _chunks("1a2b3c4d_lambda-dg.pdf"))
+
+    hit = cache.get(hash_file(str(second)), {"source": "9f8e7d6c_lambda-dg.pdf"})
+    assert [c["metadata"]["source"] for c in hit] == ["9f8e7d6c_lambda-dg.pdf"] * 3
+    assert hit[2]["metadata"]["page_start"] == 3
+    assert cache.get("0" * 64) is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = ChunkCache(cache_dir=str(tmp_path), max_bytes=10 ** 9)
+    for name in ("a", "b", "c"):
+        cache.put(name, _chunks(name))
+    entry_size = max(os.path.getsize(os.path.join(str(tmp_path), n)) for n in os.listdir(str(tmp_path)))
+
+    # Make "a" the most recently used entry, then shrink the cache to two entries
+    old = time.time() - 100
+    for name in ("a", "b", "c"):
+        os.utime(cache._path(cache.key_for(name)), (old, old))
+    cache.get("a")
+    cache.max_bytes = entry_size * 2
+    cache.put("d", _chunks("d"))
+
+    assert cache.get("a") is not None
+    assert cache.get("d") is not None
+    assert cache.get("b") is None and cache.get("c") is None
+
+
+def test_embeddings_are_aligned_and_model_scoped(tmp_path, monkeypatch):
+    from backend.core.config import settings
+
+    cache = ChunkCache(cache_dir=str(tmp_path))
+    ids = [f"abc-{i}" for i in range(3)]
+    cache.put_embeddings("abc", np.arange(6, dtype=np.float64).reshape(3, 2), ids)
+
+    hit = cache.get_embeddings("abc", ids)
+    assert isinstance(hit, np.memmap) and hit.dtype == np.float32
+    assert hit[2].tolist() == [4.0, 5.0]
+    assert cache.get_embeddings("abc", ids[:2]) is None
+
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL", "another-model")
+    assert cache.get_embeddings("abc", ids) is None
@@ -17,3 +17,15 @@ def test_code_chunking():
     
     chunks = chunker.split_code(code, "py")
     assert len(chunks) >= 1
+
+def test_page_provenance():
+    chunker = Chunker(chunk_size=60, chunk_overlap=0)
+    pages = [
+        {"page": 1, "text": "Lambda functions run code without provisioning servers.", "method": "pypdf"},
+        {"page": 2, "text": "", "method": "pypdf"},
+        {"page": 3, "text": "Scanned table of Lambda quotas and limits per region.", "method": "ocr"},
+    ]
+
+    chunks = chunker.split_pages(pages)
+    assert chunks[0]["page_start"] == 1 and chunks[0]["extraction"] == "pypdf"
+    assert chunks[-1]["page_end"] == 3 and chunks[-1]["extraction"] == "ocr"
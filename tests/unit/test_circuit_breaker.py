@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from backend.core.config import settings
+from backend.services.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from backend.services.llm_scheduler import LLMScheduler, FakeLLMBackend
+from backend.services.llm_service import LLMService
+
+def test_breaker_opens_and_recovers():
+    breaker = CircuitBreaker("ollama/llama3.2", window_size=4, min_calls=4, failure_rate=0.5, open_seconds=0.0)
+    for _ in range(2):
+        breaker.record_success(0.1)
+    for _ in range(2):
+        breaker.record_failure(0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # open_seconds elapsed: exactly one probe is allowed through
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def _service(backend):
+    service = LLMService()
+    service.scheduler = LLMScheduler(completion_fn=backend, max_concurrency_per_model=4, max_concurrency_total=8)
+    service.breakers = CircuitBreakerRegistry()
+    return service
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY_SECONDS", 0.05)
+    backend = FakeLLMBackend(latency={"ollama/llama3.2": 5.0})
+    service = _service(backend)
+
+    answer = await service._call_llm([{"role": "user", "content": "hi"}])
+    assert answer == "[ollama/llama3] ok"
+
+@pytest.mark.asyncio
+async def test_open_circuit_is_skipped():
+    backend = FakeLLMBackend()
+    service = _service(backend)
+    service.breakers.get("ollama/llama3.2")._trip()
+
+    answer = await service._call_llm([{"role": "user", "content": "hi"}])
+    assert answer == "[ollama/llama3] ok"
+    assert [c["model"] for c in backend.calls] == ["ollama/llama3"]
+
+@pytest.mark.asyncio
+async def test_stalled_primary_that_loses_the_hedge_opens_its_circuit(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(settings, "LLM_BREAKER_MIN_CALLS", 2)
+    monkeypatch.setattr(settings, "LLM_BREAKER_FAILURE_RATE", 0.5)
+    backend = FakeLLMBackend(latency={"ollama/llama3.2": 5.0})
+    service = _service(backend)
+
+    for _ in range(2):
+        assert await service._call_llm([{"role": "user", "content": "hi"}]) == "[ollama/llama3] ok"
+        # Let the cancelled primary report to its breaker
+        await asyncio.sleep(0.01)
+    assert service.breakers.get("ollama/llama3.2").state == CircuitBreaker.OPEN
+
+    backend.calls.clear()
+    assert await service._call_llm([{"role": "user", "content": "hi"}]) == "[ollama/llama3] ok"
+    assert [c["model"] for c in backend.calls] == ["ollama/llama3"]
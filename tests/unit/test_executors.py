@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.services.executors import Executors, ExecutorSaturatedError, SEARCH, IO
+
+
+def _executors():
+    return Executors(sizes={SEARCH: 2, IO: 1}, queue_limits={SEARCH: 2, IO: 0})
+
+
+@pytest.mark.asyncio
+async def test_busy_io_pool_does_not_delay_search():
+    pools = _executors()
+    loop = asyncio.get_event_loop()
+    release = threading.Event()
+
+    # A bulk transfer holds the only io thread and queues more behind it
+    blocked = [loop.run_in_executor(pools.io, release.wait) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    assert await asyncio.wait_for(loop.run_in_executor(pools.search, sum, [1, 2, 3]), timeout=1) == 6
+
+    metrics = pools.get_metrics()
+    assert metrics[IO]["running"] == 1 and metrics[IO]["queued"] == 2
+    assert metrics[SEARCH]["completed"] == 1 and metrics[SEARCH]["queued"] == 0
+
+    release.set()
+    await asyncio.gather(*blocked)
+    assert pools.io.get_metrics()["completed"] == 3
+    pools.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_admission_refuses_work_while_search_backlog_is_full():
+    pools = _executors()
+    loop = asyncio.get_event_loop()
+    release = threading.Event()
+
+    running = [loop.run_in_executor(pools.search, release.wait) for _ in range(2)]
+    queued = [loop.run_in_executor(pools.search, release.wait) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(ExecutorSaturatedError):
+        pools.admit(SEARCH, IO)
+    # io has no limit: background work is never refused
+    pools.admit(IO)
+
+    release.set()
+    await asyncio.gather(*running, *queued)
+    pools.admit(SEARCH)
+    metrics = pools.search.get_metrics()
+    assert metrics["rejected"] == 1 and metrics["peak_queued"] >= 2 and metrics["wait_max_ms"] > 0
+    pools.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_failures_are_counted_and_raised():
+    pools = _executors()
+
+    with pytest.raises(ZeroDivisionError):
+        await asyncio.get_event_loop().run_in_executor(pools.search, lambda: 1 / 0)
+    assert pools.search.get_metrics()["failed"] == 1
+    pools.shutdown()
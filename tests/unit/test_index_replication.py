@@ -0,0 +1,198 @@
+import boto3
+import numpy as np
+import pytest
+from moto import mock_aws
+
+from backend.core.config import settings
+from backend.services.index_replication import IndexReplicator, Bm25IndexFiles
+from backend.services.s3_sync import S3SyncManager
+
+BUCKET = "rag-replication-test"
+
+
+class FakeFaissFiles:
+    """Same interface as FaissIndexFiles, backed by an in-memory 'disk' (faiss is not needed here)."""
+
+    def __init__(self):
+        self.disk = {}
+        self.rows_by_id = {}
+
+    def load(self):
+        self.rows_by_id = dict(self.disk)
+
+    def reset(self):
+        self.rows_by_id = {}
+
+    def ids(self):
+        return list(self.rows_by_id)
+
+    def rows(self, ids):
+        vectors = np.array([self.rows_by_id[i][0] for i in ids], dtype=np.float32)
+        return vectors, [{"id": i, **self.rows_by_id[i][1]} for i in ids]
+
+    def add(self, vectors, docs):
+        for vector, doc in zip(vectors, docs):
+            self.rows_by_id[doc["id"]] = (list(vector), {"content": doc["content"], "metadata": doc["metadata"]})
+
+    def remove(self, ids):
+        return [self.rows_by_id.pop(i)[1] for i in ids if i in self.rows_by_id]
+
+    def save(self):
+        self.disk = dict(self.rows_by_id)
+
+    def write(self, doc_id, source, n):
+        self.disk[doc_id] = ([float(n), 1.0], {"content": f"{source} chunk {n}", "metadata": {"source": source, "chunk_index": n}})
+
+
+def _node(manager, tmp_path, name):
+    return IndexReplicator(
+        manager,
+        faiss_files=FakeFaissFiles(),
+        bm25_files=Bm25IndexFiles(str(tmp_path / name / "bm25.pkl")),
+        state_path=str(tmp_path / name / "state.json"),
+    )
+
+
+def _segment_keys(client):
+    return sorted(o["Key"] for o in client.list_objects_v2(Bucket=BUCKET, Prefix="indexes/segments/").get("Contents", []))
+
+
+@pytest.mark.asyncio
+async def test_sync_uploads_only_changes_and_replica_pulls_missing_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        manager = S3SyncManager()
+        writer, replica = _node(manager, tmp_path, "writer"), _node(manager, tmp_path, "replica")
+
+        for n in range(3):
+            writer.faiss.write(f"a{n}", "lambda-dg.pdf", n)
+        assert await writer.push() == 1
+        assert await writer.push() is None  # nothing changed, nothing uploaded
+
+        assert await replica.pull()
+        assert sorted(replica.faiss.disk) == ["a0", "a1", "a2"]
+
+        # Second sync: two new rows, one deleted row -> one small segment plus a tombstone
+        writer.faiss.write("b0", "ec2-ug.pdf", 0)
+        writer.faiss.write("b1", "ec2-ug.pdf", 1)
+        del writer.faiss.disk["a1"]
+        assert await writer.push() == 2
+        manifest = await writer.get_manifest()
+        assert [s["rows"] for s in manifest["segments"]] == [3, 2]
+        assert manifest["tombstones"] == [{"version": 2, "ids": ["a1"]}]
+
+        downloaded = []
+        download_many = manager.transfer.download_many
+
+        async def tracking_download_many(files):
+            downloaded.extend(key for key, _ in files)
+            return await download_many(files)
+
+        monkeypatch.setattr(manager.transfer, "download_many", tracking_download_many)
+        assert await replica.pull()
+        assert sorted(downloaded) == [k for k in _segment_keys(client) if manifest["segments"][1]["id"] in k]
+        assert sorted(replica.faiss.disk) == ["a0", "a2", "b0", "b1"]
+        replica.bm25.load()
+        assert sorted(replica.bm25.index.original_corpus) == sorted(
+            ["lambda-dg.pdf chunk 0", "lambda-dg.pdf chunk 2", "ec2-ug.pdf chunk 0", "ec2-ug.pdf chunk 1"]
+        )
+
+
+@pytest.mark.asyncio
+async def test_compaction_makes_replicas_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+    monkeypatch.setattr(settings, "INDEX_MAX_SEGMENTS", 2)
+
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        manager = S3SyncManager()
+        writer, replica = _node(manager, tmp_path, "writer"), _node(manager, tmp_path, "replica")
+
+        for n in range(3):
+            writer.faiss.write(f"d{n}", "s3-userguide.pdf", n)
+            await writer.push()
+            if n == 0:
+                await replica.pull()
+
+        manifest = await writer.get_manifest()
+        assert manifest["version"] == 3 and manifest["compacted_version"] == 3
+        assert [s["rows"] for s in manifest["segments"]] == [3]
+        # Superseded segments are deleted once the compacted manifest is live
+        client = boto3.client("s3", region_name="us-east-1")
+        assert all(manifest["segments"][0]["id"] in key for key in _segment_keys(client))
+
+        assert await replica.pull()
+        assert sorted(replica.faiss.disk) == ["d0", "d1", "d2"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_pushes_keep_both_segments(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        manager = S3SyncManager()
+        first, second, replica = (_node(manager, tmp_path, name) for name in ("first", "second", "replica"))
+        first.faiss.write("a0", "lambda-dg.pdf", 0)
+        second.faiss.write("b0", "ec2-ug.pdf", 0)
+
+        # `first` publishes between `second` reading the manifest and writing it
+        read_manifest = second._read_manifest
+        raced = []
+
+        async def racing_read():
+            result = await read_manifest()
+            if not raced:
+                raced.append(await first.push())
+            return result
+
+        monkeypatch.setattr(second, "_read_manifest", racing_read)
+        assert await second.push() == 2
+        manifest = await second.get_manifest()
+        assert raced == [1] and [s["rows"] for s in manifest["segments"]] == [1, 1]
+        # The segment uploaded for the losing attempt is not left behind
+        assert len(_segment_keys(client)) == 4
+
+        assert await replica.pull()
+        assert sorted(replica.faiss.disk) == ["a0", "b0"]
+
+
+@pytest.mark.asyncio
+async def test_rows_saved_before_a_pull_are_still_pushed(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        manager = S3SyncManager()
+        first, second, fresh = (_node(manager, tmp_path, name) for name in ("first", "second", "fresh"))
+        first.faiss.write("a0", "lambda-dg.pdf", 0)
+        assert await first.push() == 1
+
+        # `first` saves a row locally, then pulls `second`'s segment before its own next push
+        second.faiss.write("b0", "ec2-ug.pdf", 0)
+        assert await second.push() == 2
+        first.faiss.write("a1", "lambda-dg.pdf", 1)
+        assert await first.pull()
+        assert sorted(first.faiss.disk) == ["a0", "a1", "b0"]
+        assert await first.push() == 3
+
+        # A node without replication state rebuilds from the segments and keeps its own rows
+        fresh.faiss.write("c0", "s3-userguide.pdf", 0)
+        assert await fresh.pull()
+        assert sorted(fresh.faiss.disk) == ["a0", "a1", "b0", "c0"]
+        assert await fresh.push() == 4
+
+        assert await second.pull()
+        assert sorted(second.faiss.disk) == ["a0", "a1", "b0", "c0"]
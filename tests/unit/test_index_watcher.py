@@ -0,0 +1,61 @@
+import pytest
+
+from backend.services.index_watcher import IndexWatcher
+
+
+class FakeS3:
+    enabled = True
+
+    def __init__(self):
+        self.remote = "v1"
+        self.local = "v1"
+        self.pulls = 0
+
+    async def remote_index_version(self):
+        return self.remote
+
+    def local_index_version(self):
+        return self.local
+
+    async def pull_shared_index(self):
+        self.pulls += 1
+        self.local = self.remote
+
+
+class FakeRetrievalService:
+    def __init__(self):
+        self.reloads = 0
+
+    async def reload_indexes(self, refresh=None):
+        if refresh:
+            await refresh()
+        self.reloads += 1
+
+
+@pytest.mark.asyncio
+async def test_watcher_reloads_only_versions_published_elsewhere():
+    s3, service = FakeS3(), FakeRetrievalService()
+    watcher = IndexWatcher(s3_manager=s3, retrieval_service=service, interval=1)
+
+    # First check loads what the startup pull left on disk
+    assert await watcher.check_once() is True
+    assert await watcher.check_once() is False
+    assert service.reloads == 1
+
+    # Another replica publishes v2
+    s3.remote = "v2"
+    assert await watcher.check_once() is True
+    assert (s3.pulls, service.reloads, watcher.loaded_version) == (2, 2, "v2")
+
+    # This node publishes v3: its files and memory are already there, nothing to reload
+    s3.remote = s3.local = "v3"
+    assert await watcher.check_once() is False
+    assert (service.reloads, watcher.loaded_version) == (2, "v3")
+
+
+@pytest.mark.asyncio
+async def test_watcher_start_is_a_noop_when_disabled():
+    watcher = IndexWatcher(s3_manager=FakeS3(), retrieval_service=FakeRetrievalService(), interval=0)
+    watcher.start()
+    assert watcher.status()["running"] is False
+    await watcher.stop()
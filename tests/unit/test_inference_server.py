@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import numpy as np
+import pytest
+
+from backend.core.config import settings
+from backend.services import inference_client
+from backend.services.inference_client import InferenceClient, RemoteEmbeddings
+from backend.services.inference_server import InferenceModels, create_app
+
+
+class FakeModels:
+    """Deterministic stand-ins for the embedding model and rerankers, recording batch sizes."""
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(("documents", len(texts)))
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+    def embed_queries(self, texts):
+        self.calls.append(("queries", len(texts)))
+        return [[float(len(t)), 0.0, 1.0] for t in texts]
+
+    def cross_encoder_scores(self, pairs):
+        self.calls.append(("cross_encoder", len(pairs)))
+        return [float(text.count(query)) for query, text in pairs]
+
+    def flashrank_scores(self, query, texts):
+        return [1.0 if query in text else 0.0 for text in texts]
+
+    def status(self):
+        return {}
+
+
+@pytest.fixture
+def sidecar():
+    models = FakeModels()
+    app = create_app(models)
+    client = InferenceClient(
+        base_url="http://sidecar",
+        client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://sidecar")
+    )
+    return models, client
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_model_calls(sidecar):
+    models, client = sidecar
+    texts = [f"chunk {'x' * i}" for i in range(12)]
+
+    results = await asyncio.gather(*(client.embed([t]) for t in texts))
+    assert [r[0][0] for r in results] == [float(len(t)) for t in texts]
+    batches = [n for kind, n in models.calls if kind == "documents"]
+    assert sum(batches) == 12 and len(batches) < 12
+
+    query = await RemoteEmbeddings(client).aembed_query("timeout")
+    assert query == [7.0, 0.0, 1.0]
+    health = (await client.health())["batches"]
+    assert health["embed_documents"]["items"] == 12
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_bulk_embedding_is_split_and_reassembled(sidecar, monkeypatch):
+    models, client = sidecar
+    monkeypatch.setattr(inference_client, "REQUEST_CHUNK", 4)
+    texts = [str(i) * (i + 1) for i in range(10)]
+
+    vectors = await client.embed(texts)
+    assert vectors.shape == (10, 3) and vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [float(len(t)) for t in texts]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_reranker_uses_the_sidecar(sidecar, monkeypatch):
+    _, client = sidecar
+    monkeypatch.setattr(settings, "INFERENCE_URL", "http://sidecar")
+    monkeypatch.setattr(inference_client, "_inference_client", client)
+    from backend.services.retrieval.reranker import Reranker
+
+    reranker = Reranker()
+    assert reranker.client is client and reranker.cross_encoder is None
+    candidates = [
+        {"content": "lambda timeout", "metadata": {"chunk_index": 0}},
+        {"content": "timeout timeout timeout", "metadata": {"chunk_index": 1}},
+        {"content": "s3 buckets", "metadata": {"chunk_index": 2}},
+    ]
+    ranked = await reranker.rerank("timeout", candidates, top_k=2)
+    assert [r["metadata"]["chunk_index"] for r in ranked] == [1, 0]
+    assert ranked[0]["rerank_score"] == 3.0 and ranked[0]["flash_score"] == 1.0
+    await client.aclose()
+
+
+def test_query_embeddings_are_one_model_call():
+    class CountingEmbeddings:
+        def __init__(self):
+            self.calls = []
+
+        def embed_documents(self, texts):
+            self.calls.append(len(texts))
+            return [[float(len(t))] for t in texts]
+
+    models = InferenceModels()
+    models._embeddings = CountingEmbeddings()
+    assert models.embed_queries(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    assert models._embeddings.calls == [3]
+
+
+@pytest.mark.asyncio
+async def test_shutdown_stops_the_batch_workers():
+    app = create_app(FakeModels())
+    client = InferenceClient(
+        base_url="http://sidecar",
+        client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://sidecar")
+    )
+    await client.embed(["chunk"])
+    workers = [t for t in asyncio.all_tasks() if t.get_coro().__qualname__ == "MicroBatcher._worker"]
+    assert workers
+
+    for handler in app.router.on_shutdown:
+        await handler()
+    assert all(t.cancelled() for t in workers)
+    await client.aclose()
@@ -0,0 +1,223 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from backend.models.database import Base
+from backend.models.models import IngestionJob
+from backend.services import ingestion_queue as iq
+from backend.services.serving_role import ServingRole
+
+
+@pytest_asyncio.fixture
+async def queue(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/jobs.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield iq.IngestionQueue(async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession))
+    await engine.dispose()
+
+
+class FakeRetrievalService:
+    def __init__(self, results, block=None):
+        self.results = list(results)
+        self.block = block
+        self.deleted = []
+        self.persisted = []
+        self.persist_error = None
+
+    async def ingest_document(self, file_path, filename, database, document_id, db, on_progress=None, persist=True):
+        await on_progress("extract", {"extract": {"pages": 3}})
+        if self.block:
+            await self.block.wait()
+        return self.results.pop(0)
+
+    async def prepare_document(self, file_path, filename, on_progress=None):
+        await on_progress("embed", {"embed": {"chunks": 2}})
+        return 2
+
+    async def delete_document(self, filename, database="faiss"):
+        self.deleted.append((filename, database))
+
+    async def persist(self, database="faiss"):
+        if self.persist_error:
+            raise self.persist_error
+        self.persisted.append(database)
+
+
+@pytest.mark.asyncio
+async def test_claim_is_exclusive_and_retries_back_off(queue, monkeypatch):
+    monkeypatch.setattr(iq.settings, "INGESTION_RETRY_BASE_SECONDS", 60.0)
+    job = await queue.enqueue("ec2-ug.pdf", "/tmp/ec2-ug.pdf", max_attempts=2)
+
+    claimed = await asyncio.gather(queue.claim("w1"), queue.claim("w2"))
+    assert sum(1 for c in claimed if c) == 1
+
+    await queue.fail(job.id, "ollama down")
+    retried = await queue.get(job.id)
+    assert retried.status == iq.QUEUED and retried.attempts == 1
+    assert retried.next_run_at > datetime.utcnow() + timedelta(seconds=50)
+    assert await queue.claim("w1") is None
+
+    # Backoff elapsed: second attempt fails for good
+    async with queue.session_factory() as session:
+        (await session.get(IngestionJob, job.id)).next_run_at = datetime.utcnow()
+        await session.commit()
+    assert (await queue.claim("w1")).attempts == 2
+    await queue.fail(job.id, "ollama down")
+    assert (await queue.get(job.id)).status == iq.FAILED
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_job_and_cancels(queue, monkeypatch):
+    finished = []
+
+    async def fake_pipeline(filename, chunks, embeddings, service, file_path, sync_shared=True):
+        finished.append(filename)
+
+    monkeypatch.setattr(iq, "post_ingestion_pipeline", fake_pipeline)
+    monkeypatch.setattr(iq.settings, "INGESTION_POLL_SECONDS", 0.05)
+
+    ok = await queue.enqueue("lambda-dg.pdf", "/tmp/lambda-dg.pdf")
+    pool = iq.IngestionWorkerPool(queue, FakeRetrievalService([(2, [{"content": "a"}, {"content": "b"}], None)]))
+    await pool.run_job(await queue.claim("w1"))
+    done = await queue.get(ok.id)
+    assert done.status == iq.SUCCEEDED
+    assert done.progress == {"extract": {"pages": 3}}
+    assert finished == ["lambda-dg.pdf"]
+
+    slow = await queue.enqueue("s3-userguide.pdf", "/tmp/s3-userguide.pdf")
+    pool = iq.IngestionWorkerPool(queue, FakeRetrievalService([(1, [], None)], block=asyncio.Event()))
+    running = asyncio.create_task(pool.run_job(await queue.claim("w1")))
+    await asyncio.sleep(0.05)
+    await queue.request_cancel(slow.id)
+    await asyncio.wait_for(running, timeout=2)
+    assert (await queue.get(slow.id)).status == iq.CANCELLED
+    assert finished == ["lambda-dg.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_standalone_workers_prepare_and_only_the_writer_indexes(queue, monkeypatch):
+    async def fake_pipeline(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(iq, "post_ingestion_pipeline", fake_pipeline)
+    job = await queue.enqueue("ec2-ug.pdf", "/tmp/ec2-ug.pdf")
+    writer_service = FakeRetrievalService([(2, [{"content": "a"}, {"content": "b"}], None)])
+    preparer = iq.IngestionWorkerPool(queue, FakeRetrievalService([]), index_writer=False)
+    writer = iq.IngestionWorkerPool(queue, writer_service)
+
+    # A writer without extraction loops waits for prepared jobs
+    assert await queue.claim("api:0", iq.CLAIM_INDEX) is None
+    await preparer.run_job(await queue.claim("worker:0", iq.CLAIM_PREPARE))
+    prepared = await queue.get(job.id)
+    assert prepared.status == iq.QUEUED and prepared.prepared and prepared.attempts == 0
+
+    assert await queue.claim("worker:0", iq.CLAIM_PREPARE) is None
+    await writer.run_job(await queue.claim("api:0", iq.CLAIM_INDEX))
+    done = await queue.get(job.id)
+    assert done.status == iq.SUCCEEDED and done.attempts == 1
+    assert writer_service.results == []
+
+
+@pytest.mark.asyncio
+async def test_batch_is_finalized_once(queue):
+    jobs = await queue.enqueue_many(
+        [{"filename": f"doc{i}.pdf", "file_path": f"/tmp/doc{i}.pdf"} for i in range(2)], batch_id="b1"
+    )
+    assert not await queue.claim_batch_finalization("b1")
+
+    for job in jobs:
+        await queue.claim("w1")
+        await queue.complete(job.id)
+
+    results = await asyncio.gather(*(queue.claim_batch_finalization("b1") for _ in range(3)))
+    assert results.count(True) == 1
+    assert (await queue.batch_summary("b1"))["finalized"]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_last_queued_job_finalizes_the_batch(queue):
+    done, queued = await queue.enqueue_many(
+        [{"filename": f"doc{i}.pdf", "file_path": f"/tmp/doc{i}.pdf"} for i in range(2)], batch_id="b2"
+    )
+    pool = iq.IngestionWorkerPool(queue, FakeRetrievalService([]))
+    finalized = []
+
+    async def fake_finalize(batch_id):
+        finalized.append(batch_id)
+
+    pool.finalize_batch = fake_finalize
+    await queue.claim("w1")
+    await queue.complete(done.id)
+    await pool.finalize_if_done("b2")
+    assert finalized == [] and await queue.finalizable_batches() == []
+
+    assert (await queue.request_cancel(queued.id)).status == iq.CANCELLED
+    assert await queue.finalizable_batches() == ["b2"]
+    await pool.finalize_ready_batches()
+    await pool.finalize_ready_batches()
+    assert finalized == ["b2"] and await queue.finalizable_batches() == []
+
+
+@pytest.mark.asyncio
+async def test_replica_delete_is_queued_for_the_primary(queue, tmp_path):
+    lock_path = str(tmp_path / "serving_primary.lock")
+    primary, replica = ServingRole(lock_path, workers=2), ServingRole(lock_path, workers=2)
+    assert primary.is_primary and not replica.is_primary
+
+    # The replica never touches its own index copy; it hands the delete to the primary's writer
+    replica_service, primary_service = FakeRetrievalService([]), FakeRetrievalService([])
+    job = await queue.enqueue_delete("lambda-dg.pdf", "faiss")
+    assert iq.job_to_dict(job)["kind"] == iq.DELETE
+
+    # Standalone preparers skip deletes; only the primary's index writer claims them
+    assert await queue.claim("worker:0", iq.CLAIM_PREPARE) is None
+    writer = iq.IngestionWorkerPool(queue, primary_service)
+    await writer.run_job(await queue.claim("api:0", iq.CLAIM_INDEX))
+
+    assert (await queue.get(job.id)).status == iq.SUCCEEDED
+    assert primary_service.deleted == [("lambda-dg.pdf", "faiss")] and replica_service.deleted == []
+    primary.release()
+
+
+@pytest.mark.asyncio
+async def test_batch_members_succeed_only_once_the_batch_is_saved(queue, monkeypatch):
+    async def fake_pipeline(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(iq, "post_ingestion_pipeline", fake_pipeline)
+    jobs = await queue.enqueue_many(
+        [{"filename": f"doc{i}.pdf", "file_path": f"/tmp/doc{i}.pdf"} for i in range(2)], batch_id="b3"
+    )
+    service = FakeRetrievalService([(1, [{"content": "a"}], None)] * 4)
+    pool = iq.IngestionWorkerPool(queue, service)
+
+    async def crash(batch_id):
+        pass
+
+    # Indexed in memory only: dying before the batch is saved must not leave the jobs 'succeeded'
+    pool.finalize_if_done = crash
+    for _ in jobs:
+        await pool.run_job(await queue.claim("api:0"))
+    assert {(await queue.get(j.id)).status for j in jobs} == {iq.INDEXED}
+    assert not (await queue.batch_summary("b3"))["finalized"]
+
+    # The process died before finalize_batch: the next writer re-queues and re-indexes them
+    restarted = iq.IngestionWorkerPool(queue, service)
+    assert await queue.requeue_unsaved() == 2
+    assert {(await queue.get(j.id)).status for j in jobs} == {iq.QUEUED}
+
+    # A failed save keeps them 'indexed' and lets the sweep finalize the batch again
+    service.persist_error = OSError("disk full")
+    for _ in jobs:
+        await restarted.run_job(await queue.claim("api:0"))
+    assert {(await queue.get(j.id)).status for j in jobs} == {iq.INDEXED}
+    assert service.persisted == [] and await queue.finalizable_batches() == ["b3"]
+
+    service.persist_error = None
+    await restarted.finalize_ready_batches()
+    assert {(await queue.get(j.id)).status for j in jobs} == {iq.SUCCEEDED}
+    assert service.persisted == ["faiss"] and (await queue.batch_summary("b3"))["finalized"]
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from backend.services.llm_scheduler import (
+    LLMScheduler,
+    FakeLLMBackend,
+    LLMOverloadedError,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_JUDGE,
+    PRIORITY_INGESTION,
+)
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_per_model():
+    backend = FakeLLMBackend(latency=0.02)
+    scheduler = LLMScheduler(completion_fn=backend, max_concurrency_per_model=2, max_concurrency_total=8)
+
+    await asyncio.gather(*[
+        scheduler.submit(PRIORITY_INTERACTIVE, model="ollama/llama3.2", messages=[])
+        for _ in range(6)
+    ])
+    assert backend.max_in_flight == 2
+    assert scheduler.get_metrics()["classes"]["interactive"]["completed"] == 6
+
+@pytest.mark.asyncio
+async def test_interactive_requests_jump_the_queue():
+    backend = FakeLLMBackend(latency=0.02)
+    scheduler = LLMScheduler(completion_fn=backend, max_concurrency_per_model=1, max_concurrency_total=1)
+
+    ingestion = [
+        asyncio.create_task(scheduler.submit(PRIORITY_INGESTION, model="ollama/llava", messages=[{"n": i}]))
+        for i in range(3)
+    ]
+    await asyncio.sleep(0)
+    judge = asyncio.create_task(scheduler.submit(PRIORITY_JUDGE, model="ollama/llava", messages=[{"n": "judge"}]))
+    chat = asyncio.create_task(scheduler.submit(PRIORITY_INTERACTIVE, model="ollama/llava", messages=[{"n": "chat"}]))
+    await asyncio.gather(*ingestion, judge, chat)
+
+    order = [c["messages"][0]["n"] for c in backend.calls]
+    # The first ingestion call was already running; chat and judge overtake the rest
+    assert order[:3] == [0, "chat", "judge"]
+
+@pytest.mark.asyncio
+async def test_full_queue_sheds_load():
+    backend = FakeLLMBackend(latency=0.05)
+    scheduler = LLMScheduler(
+        completion_fn=backend,
+        max_concurrency_per_model=1,
+        max_concurrency_total=1,
+        queue_limits={PRIORITY_INTERACTIVE: 10, PRIORITY_JUDGE: 10, PRIORITY_INGESTION: 1},
+    )
+
+    results = await asyncio.gather(*[
+        scheduler.submit(PRIORITY_INGESTION, model="ollama/llava", messages=[])
+        for _ in range(3)
+    ], return_exceptions=True)
+
+    assert sum(isinstance(r, LLMOverloadedError) for r in results) == 1
+    assert scheduler.get_metrics()["classes"]["ingestion"]["shed"] == 1
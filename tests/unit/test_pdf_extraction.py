@@ -0,0 +1,71 @@
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+from backend.core.config import settings
+from backend.utils import pdf_extraction
+
+def make_text_pdf(path, texts):
+    """Builds a PDF with one line of Helvetica text per page."""
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for text in texts:
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)})
+        })
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+def test_parallel_extraction_preserves_page_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "PDF_EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", 2)
+    path = str(tmp_path / "guide.pdf")
+    make_text_pdf(path, [f"Page number {i}" for i in range(1, 11)])
+
+    pages = list(pdf_extraction.iter_pdf_pages(path, pages_per_task=3))
+
+    assert [p["page"] for p in pages] == list(range(1, 11))
+    assert all(f"Page number {p['page']}" in p["text"] for p in pages)
+    assert all(p["seconds"] >= 0 for p in pages)
+
+def test_ocr_windows_skip_text_layer_pages(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_WINDOW_PAGES", 3)
+    # Pages 4 and 8 have a text layer and are left out of OCR
+    to_ocr = [1, 2, 3, 5, 6, 7, 9]
+    assert pdf_extraction._group_windows(to_ocr, settings.OCR_WINDOW_PAGES) == [(1, 3), (5, 7), (9, 9)]
+
+def test_image_dominated_pages_are_routed_to_ocr(tmp_path):
+    path = str(tmp_path / "scan.pdf")
+    writer = PdfWriter()
+    page = writer.add_blank_page(width=612, height=792)
+    image = DecodedStreamObject()
+    image.set_data(b"\x00")
+    image.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Image"),
+        NameObject("/Width"): NumberObject(1),
+        NameObject("/Height"): NumberObject(1),
+        NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+        NameObject("/BitsPerComponent"): NumberObject(8),
+    })
+    page[NameObject("/Resources")] = DictionaryObject({
+        NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): writer._add_object(image)})
+    })
+    stream = DecodedStreamObject()
+    stream.set_data(b"q 612 0 0 792 0 0 cm /Im0 Do Q")
+    page[NameObject("/Contents")] = writer._add_object(stream)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+    [scanned] = pdf_extraction.extract_page_range(path, 0, 1)
+    assert scanned["image_coverage"] == 1.0
+    assert pdf_extraction.needs_ocr(scanned)
+    assert not pdf_extraction.needs_ocr({"text": "x" * 500, "image_coverage": 1.0})
+    assert not pdf_extraction.needs_ocr({"text": "x" * 50, "image_coverage": 0.1})
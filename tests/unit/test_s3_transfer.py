@@ -0,0 +1,91 @@
+import asyncio
+import os
+import threading
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from backend.core.config import settings
+from backend.services.s3_sync import S3SyncManager
+from backend.services.s3_transfer import S3Transfer, TransferState, build_client
+
+BUCKET = "rag-transfer-test"
+
+
+@pytest.mark.asyncio
+async def test_download_if_changed_skips_unchanged_and_swaps_atomically(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+
+    with mock_aws():
+        client = build_client()
+        client.create_bucket(Bucket=BUCKET)
+        client.put_object(Bucket=BUCKET, Key="registry/reg.json", Body=b'{"v": 1}')
+        state_path = str(tmp_path / "state.json")
+        transfer = S3Transfer(client, BUCKET, state=TransferState(state_path))
+        local = str(tmp_path / "data" / "reg.json")
+
+        assert await transfer.download_if_changed("registry/reg.json", local) is True
+        assert await transfer.download_if_changed("registry/reg.json", local) is False
+
+        # A restart keeps the recorded ETags
+        restarted = S3Transfer(client, BUCKET, state=TransferState(state_path))
+        assert await restarted.download_if_changed("registry/reg.json", local) is False
+
+        client.put_object(Bucket=BUCKET, Key="registry/reg.json", Body=b'{"v": 2}')
+        assert await restarted.download_if_changed("registry/reg.json", local) is True
+        with open(local) as f:
+            assert f.read() == '{"v": 2}'
+        assert os.listdir(os.path.dirname(local)) == ["reg.json"]
+
+        # Our own upload is recorded, so it is not pulled back
+        with open(local, "w") as f:
+            f.write('{"v": 3}')
+        await restarted.upload_file(local, "registry/reg.json", track=True)
+        assert await restarted.download_if_changed("registry/reg.json", local) is False
+        transfer.shutdown()
+        restarted.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_startup_pull_runs_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setattr(settings, "S3_BUCKET_NAME", BUCKET)
+
+    with mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket=BUCKET)
+        manager = S3SyncManager()
+        calls = []
+
+        async def fake_pull_all():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+
+        monkeypatch.setattr(manager, "_pull_all", fake_pull_all)
+        await asyncio.gather(manager.pull_all_from_s3(), manager.pull_index_from_s3())
+        await manager.pull_all_from_s3()
+        assert len(calls) == 1
+        await manager.pull_all_from_s3(force=True)
+        assert len(calls) == 2
+
+
+def test_transfer_state_writers_never_share_a_temp_file(tmp_path):
+    state_path = str(tmp_path / "state" / "transfer_state.json")
+    writers = [TransferState(state_path) for _ in range(4)]
+
+    def record(n):
+        for i in range(25):
+            writers[n].record(str(tmp_path / f"f{n}-{i}"), f"k{n}-{i}", f"etag{i}")
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert os.listdir(tmp_path / "state") == ["transfer_state.json"]
+    # Each writer's last write is a complete, parseable file
+    assert len(TransferState(state_path)._entries) == 25
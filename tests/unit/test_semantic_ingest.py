@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from backend.services.retrieval.semantic_search import RetrievalService
+from backend.utils import source_validator
+from backend.utils.chunk_cache import ChunkCache
+
+
+class FakeEngine:
+    """Indexed rows per source, and what the last persist() wrote to disk."""
+
+    def __init__(self):
+        self.rows = []
+        self.saved = None
+
+    async def add_embeddings(self, documents, embeddings, database="faiss", persist=True):
+        self.rows.extend(documents)
+
+    async def delete_documents(self, filter_dict, database="faiss"):
+        self.rows = [r for r in self.rows if r["metadata"]["source"] != filter_dict["source"]]
+
+    async def persist(self, database="faiss"):
+        self.saved = list(self.rows)
+
+
+class FlakyProcessor:
+    """Yields two batches; the first attempt fails after the first one is indexed."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    async def iter_chunks(self, file_path, filename):
+        self.attempts += 1
+        for b in range(2):
+            if b == 1 and self.attempts == 1:
+                raise RuntimeError("vision model unavailable")
+            yield [{"content": f"batch {b} chunk {i}", "metadata": {"source": filename}} for i in range(2)]
+
+
+def _service(tmp_path):
+    service = RetrievalService.__new__(RetrievalService)
+    service.engine = FakeEngine()
+    service.doc_processor = FlakyProcessor()
+    service.chunk_cache = ChunkCache(cache_dir=str(tmp_path / "cache"))
+    service._index_lock = asyncio.Lock()
+    service._embed = lambda texts: np.ones((len(texts), 4), dtype=np.float32)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_a_retried_ingestion_does_not_duplicate_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(source_validator, "register_document", lambda filename, service: None)
+    path = tmp_path / "lambda-dg.pdf"
+    path.write_bytes(b"%PDF lambda")
+    service = _service(tmp_path)
+
+    # Attempt 1 fails after one batch was indexed: the partial rows are dropped, nothing is saved
+    count, _, _ = await service.ingest_document(str(path), "lambda-dg.pdf")
+    assert count == 0 and service.engine.rows == [] and service.engine.saved is None
+
+    count, chunks, _ = await service.ingest_document(str(path), "lambda-dg.pdf")
+    assert count == 4 and len(service.engine.rows) == 4 and len(service.engine.saved) == 4
+    assert sorted(r["content"] for r in service.engine.rows) == sorted(c["content"] for c in chunks)
@@ -0,0 +1,24 @@
+from backend.utils import service_detection as sd
+
+
+def test_filename_detection():
+    assert sd.get_service_from_filename("lambda-dg.pdf") == "lambda"
+    assert sd.get_service_from_filename("AmazonEC2UserGuide.pdf") == "ec2"
+    assert sd.get_service_from_filename("secrets-manager-userguide.pdf") == "secretsmanager"
+    assert sd.get_service_from_filename("random-notes.pdf") == "general"
+
+
+def test_query_detection_uses_word_boundaries():
+    assert sd.detect_service("How do I version an S3 bucket?") == "s3"
+    assert sd.detect_service("Lambdas and their timeouts") == "lambda"
+    # Substrings of other words no longer count
+    assert sd.detect_service("ec2 vs ecsx") == "ec2"
+    assert sd.get_service_filter("cs300 grading") == {}
+    assert sd.get_service_filter("eks node groups") == {"source_topic": "eks"}
+
+
+def test_fuzzy_corrections_are_cached():
+    sd._fuzzy_word.cache_clear()
+    assert sd.fuzzy_match_service("slmabda limits") == "lambda"
+    assert sd.fuzzy_match_service("slmabda timeout") == "lambda"
+    assert sd._fuzzy_word.cache_info().hits >= 1
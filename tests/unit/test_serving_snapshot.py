@@ -0,0 +1,92 @@
+import os
+import numpy as np
+import pytest
+
+from backend.services.retrieval.bm25_search import BM25Index, tokenize
+from backend.services.retrieval.serving_snapshot import ServingSnapshot, ServingSnapshots, write_snapshot
+
+
+def _bm25(tmp_path, topic_docs):
+    index = BM25Index(index_path=str(tmp_path / "bm25.pkl"))
+    index.add_documents(topic_docs("s3", ["bucket timeout settings", "object lock retention", "bucket versioning"]), persist=False)
+    index.add_documents(topic_docs("lambda", ["function timeout is 900 seconds", "layers", "timeout errors in async invokes"]), persist=False)
+    index.add_documents([{"content": "general timeout guidance", "metadata": {"source": "faq.pdf", "chunk_index": 0}}], persist=False)
+    return index
+
+
+def _ranked(results):
+    # Equal scores may come back in either order (rows are grouped by topic in the snapshot)
+    return sorted((-round(r["score"], 6), r["content"]) for r in results)
+
+
+@pytest.mark.parametrize("query,filter", [
+    ("timeout", None),
+    ("bucket timeout", {"source_topic": "s3"}),
+    ("timeout errors", {"source_topic": ["lambda", "general"]}),
+    ("timeout", {"source_topic": "lambda", "chunk_index": 2}),
+])
+def test_bm25_snapshot_matches_in_memory_index(tmp_path, topic_docs, query, filter):
+    index = _bm25(tmp_path, topic_docs)
+    snapshot = ServingSnapshot(write_snapshot(str(tmp_path / "serving"), bm25=index.snapshot_rows()))
+
+    expected = [r for r in index.search(query, filter=filter) if r["score"] > 0]
+    assert _ranked(snapshot.bm25_search(tokenize(query), top_k=20, filter=filter)) == _ranked(expected)
+
+
+@pytest.mark.parametrize("metric", ["l2", "ip"])
+def test_dense_snapshot_is_exact(tmp_path, metric):
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(40, 8)).astype(np.float32)
+    topics = ["s3", "lambda", "ec2", "general"]
+    metadatas = [{"chunk_index": i, "source_topic": topics[i % 4]} for i in range(40)]
+    rows = {"vectors": vectors, "contents": [f"chunk {i}" for i in range(40)], "metadatas": metadatas, "metric": metric}
+    snapshot = ServingSnapshot(write_snapshot(str(tmp_path / "serving"), dense=rows))
+    query = rng.normal(size=8).astype(np.float32)
+
+    def brute_force(candidates):
+        scores = {i: float(((vectors[i] - query) ** 2).sum()) if metric == "l2" else float(vectors[i] @ query) for i in candidates}
+        return [f"chunk {i}" for i in sorted(scores, key=scores.get, reverse=metric == "ip")][:5]
+
+    assert [r["content"] for r in snapshot.dense_search(query, top_k=5)] == brute_force(range(40))
+    lambda_rows = [i for i in range(40) if i % 4 == 1]
+    assert [r["content"] for r in snapshot.dense_search(query, top_k=5, filter={"source_topic": "lambda"})] == brute_force(lambda_rows)
+
+
+def test_readers_follow_the_current_pointer(tmp_path, topic_docs):
+    root = str(tmp_path / "serving")
+    snapshots = ServingSnapshots(root)
+    assert snapshots.refresh() is None
+
+    index = _bm25(tmp_path, topic_docs)
+    write_snapshot(root, bm25=index.snapshot_rows())
+    first = snapshots.refresh(wait=True)
+    assert first is not None and snapshots.refresh() is first
+
+    index.add_documents(topic_docs("ec2", ["spot instance timeout"]), persist=False)
+    write_snapshot(root, bm25=index.snapshot_rows())
+    second = snapshots.refresh(wait=True)
+    assert second.version != first.version
+    assert "spot instance timeout" in [r["content"] for r in second.bm25_search(["timeout"], filter={"source_topic": "ec2"})]
+    # A search already holding the old snapshot keeps working on it
+    assert all(r["metadata"].get("source_topic") != "ec2" for r in first.bm25_search(["timeout"]))
+
+    for _ in range(3):
+        write_snapshot(root, bm25=index.snapshot_rows())
+    assert len([d for d in (tmp_path / "serving").iterdir() if d.is_dir()]) == 2
+
+
+def test_a_snapshot_that_failed_to_open_is_retried(tmp_path, topic_docs):
+    root = str(tmp_path / "serving")
+    directory = write_snapshot(root, bm25=_bm25(tmp_path, topic_docs).snapshot_rows())
+    meta_path = os.path.join(directory, "bm25_meta.json")
+    with open(meta_path) as f:
+        meta = f.read()
+    # CURRENT already points at the directory, but a file is not fully visible yet
+    with open(meta_path, "w") as f:
+        f.write(meta[:10])
+    snapshots = ServingSnapshots(root)
+    assert snapshots.refresh(wait=True) is None
+
+    with open(meta_path, "w") as f:
+        f.write(meta)
+    assert snapshots.refresh(wait=True) is not None
@@ -0,0 +1,88 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.utils import source_validator
+from backend.utils.source_validator import (
+    DocumentRegistry,
+    HARDCODED_FALLBACKS,
+    find_valid_source,
+    is_fake_source,
+    rewrite_fake_citations,
+    validate_source,
+)
+from backend.utils.text_match import compile_literals
+
+
+def test_registry_lookups_and_write_through(tmp_path):
+    path = str(tmp_path / "registry.json")
+    registry = DocumentRegistry(path)
+    start = registry.version
+
+    assert registry.register("glue-dg.pdf", "glue") is True
+    assert registry.register("glue-dg.pdf", "glue") is False
+    assert "glue-dg.pdf" in registry.valid_sources()
+    assert set(HARDCODED_FALLBACKS.values()) <= set(registry.valid_sources())
+    assert registry.source_for_service("glue") == "glue-dg.pdf"
+    assert registry.version > start
+
+    with open(path) as f:
+        assert [d["filename"] for d in json.load(f)["documents"]] == ["glue-dg.pdf"]
+
+    assert registry.remove("glue-dg.pdf") is True
+    assert "glue-dg.pdf" not in registry.valid_sources()
+    assert registry.source_for_service("glue") is None
+
+
+def test_registry_reloads_replaced_file(tmp_path):
+    path = str(tmp_path / "registry.json")
+    registry = DocumentRegistry(path)
+    assert registry.documents() == []
+
+    # e.g. an S3 pull or another process replacing the file
+    with open(path, "w") as f:
+        json.dump({"documents": [{"filename": "athena-ug.pdf", "service": "athena", "active": True}]}, f)
+    assert registry.source_for_service("athena") == "athena-ug.pdf"
+
+
+def test_concurrent_writers_do_not_lose_updates(tmp_path):
+    path = str(tmp_path / "registry.json")
+    # Separate instances stand in for separate worker processes sharing the file
+    registries = [DocumentRegistry(path) for _ in range(4)]
+
+    def register(i):
+        registries[i % 4].register(f"doc-{i}.pdf", "general")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(register, range(40)))
+
+    names = {d["filename"] for d in DocumentRegistry(path).documents()}
+    assert names == {f"doc-{i}.pdf" for i in range(40)}
+    assert not [n for n in os.listdir(tmp_path) if n.endswith(".tmp")]
+
+
+def test_compile_literals_matches_longest_word_anywhere():
+    regex = compile_literals(["s3", "s3-userguide.pdf", "ec2-ug.pdf", "a.b"])
+    assert regex.search("See s3-userguide.pdf for details").group(0) == "s3-userguide.pdf"
+    assert regex.search("bucket in s3 only").group(0) == "s3"
+    # Literals, not regex syntax
+    assert regex.search("axb") is None
+    assert compile_literals([]).search("anything") is None
+
+
+def test_validation_and_rewrite_in_one_pass(tmp_path, monkeypatch):
+    registry = DocumentRegistry(str(tmp_path / "registry.json"))
+    registry.register("Glue-DG.pdf", "glue")
+    monkeypatch.setattr(source_validator, "document_registry", registry)
+
+    assert find_valid_source("per glue-dg.pdf, page 4") == "Glue-DG.pdf"
+    assert find_valid_source("Source: made-up.pdf") is None
+    assert validate_source("Source: S3-USERGUIDE.PDF") == "s3-userguide.pdf"
+    assert validate_source("Source: aws_s3.md", service="glue") == "Glue-DG.pdf"
+    assert validate_source("Source: aws_s3.md", valid_sources=["x.pdf"]) == "lambda-dg.pdf"
+
+    answer = "Per aws_lambda.md and aws_s3.md (see documentation.pdf)"
+    assert rewrite_fake_citations(answer, "lambda-dg.pdf") == (
+        "Per lambda-dg.pdf and lambda-dg.pdf (see lambda-dg.pdf)"
+    )
+    assert is_fake_source("My-Documentation.PDF") and not is_fake_source("lambda-dg.pdf")
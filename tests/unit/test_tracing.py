@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from backend.core.config import settings
+from backend.services import llm_service
+from backend.services.circuit_breaker import CircuitBreakerRegistry
+from backend.services.llm_scheduler import LLMScheduler, FakeLLMBackend
+from backend.services.tracing import JsonLinesSink, Tracer
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_tasks_and_reach_the_sink(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(enabled=True, sinks=[JsonLinesSink(str(path))])
+
+    async def stage(name):
+        with tracer.span(name) as span:
+            await asyncio.sleep(0.01)
+            span.set(results=3)
+
+    with tracer.trace("chat", source="docs") as trace:
+        with tracer.span("route"):
+            await asyncio.gather(stage("bm25"), stage("dense"))
+            with tracer.span("fusion"):
+                pass
+
+    spans = {s["name"]: s for s in trace.to_dict()["spans"]}
+    assert set(spans) == {"chat", "route", "bm25", "dense", "fusion"}
+    assert spans["bm25"]["parent_id"] == spans["dense"]["parent_id"] == spans["route"]["span_id"]
+    assert spans["route"]["parent_id"] == spans["chat"]["span_id"]
+    assert spans["bm25"]["attributes"] == {"results": 3} and spans["bm25"]["duration_ms"] >= 10
+    # Concurrent stages overlap: the parent is shorter than their sum
+    assert spans["route"]["duration_ms"] < spans["bm25"]["duration_ms"] + spans["dense"]["duration_ms"]
+
+    tracer.flush()
+    exported = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(exported) == 1 and exported[0]["trace_id"] == trace.trace_id
+    assert tracer.get_metrics()["bm25"]["count"] == 1
+
+
+def test_json_lines_export_does_not_wait_for_the_file(tmp_path):
+    writing, release = threading.Event(), threading.Event()
+
+    class SlowDiskSink(JsonLinesSink):
+        def _write(self, lines):
+            writing.set()
+            release.wait()
+            super()._write(lines)
+
+    sink = SlowDiskSink(str(tmp_path / "traces.jsonl"), max_pending=2)
+    tracer = Tracer(enabled=True, sinks=[sink])
+    with tracer.trace("chat"):
+        pass
+    assert writing.wait(timeout=2)
+    for _ in range(3):
+        with tracer.trace("chat"):
+            pass
+    # The writer is stuck on the first line; the rest queue up to max_pending and then drop
+    assert sink.dropped == 1
+
+    # A stuck writer cannot hold up shutdown past the flush deadline
+    assert tracer.flush(timeout=0.05) is False
+
+    release.set()
+    assert tracer.flush() is True
+    assert len((tmp_path / "traces.jsonl").read_text().splitlines()) == 3
+
+
+def test_spans_outside_a_trace_and_errors():
+    tracer = Tracer(enabled=True, sinks=[])
+    with tracer.span("bm25") as span:
+        span.set(results=1)  # no-op, nothing recorded
+    assert tracer.get_metrics() == {}
+
+    with pytest.raises(ValueError):
+        with tracer.trace("chat") as trace:
+            with tracer.span("generation"):
+                raise ValueError("model down")
+    generation = trace.to_dict()["spans"][1]
+    assert generation["name"] == "generation" and "model down" in generation["error"]
+    assert trace.root.error is not None
+
+
+@pytest.mark.asyncio
+async def test_generation_judge_and_regeneration_are_traced(monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_LLM_JUDGE", True)
+    tracer = Tracer(enabled=True, sinks=[])
+    monkeypatch.setattr(llm_service, "span", tracer.span)
+    backend = FakeLLMBackend(responses={f"ollama/{settings.OLLAMA_TEXT_MODEL}": "1"})
+    service = llm_service.LLMService()
+    service.scheduler = LLMScheduler(completion_fn=backend, max_concurrency_per_model=4, max_concurrency_total=8)
+    service.breakers = CircuitBreakerRegistry()
+
+    with tracer.trace("chat") as trace:
+        await service.generate_response("lambda timeout", "CONTENT: 15 minutes", ["lambda-dg.pdf"], service="lambda")
+
+    names = [s["name"] for s in trace.to_dict()["spans"]]
+    assert names == ["chat", "prompt_build", "generation", "judge", "regeneration"]
+    judge = next(s for s in trace.to_dict()["spans"] if s["name"] == "judge")
+    assert judge["attributes"]["score"] == 1
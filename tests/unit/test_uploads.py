@@ -0,0 +1,70 @@
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+from backend.utils.uploads import extract_archive, save_upload, is_archive
+
+
+def test_extract_zip_flattens_and_skips_unsafe_members(tmp_path):
+    archive = tmp_path / "guides.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("guides/lambda-dg.pdf", b"%PDF lambda")
+        zf.writestr("../../etc/s3-userguide.pdf", b"%PDF s3")
+        zf.writestr("other/lambda-dg.pdf", b"%PDF lambda")
+        zf.writestr("__MACOSX/guides/._lambda-dg.pdf", b"junk")
+        zf.writestr(".DS_Store", b"junk")
+
+    out = tmp_path / "out"
+    files = extract_archive(str(archive), str(out), max_files=10)
+
+    names = sorted(f["filename"] for f in files)
+    assert names == ["lambda-dg.pdf", "lambda-dg_1.pdf", "s3-userguide.pdf"]
+    assert all(os.path.dirname(f["path"]) == str(out) for f in files)
+    # Identical content hashes identically, so the endpoint can dedupe it
+    lambdas = [f["sha256"] for f in files if f["filename"].startswith("lambda")]
+    assert lambdas[0] == lambdas[1]
+
+
+def test_extract_tar_respects_file_limit(tmp_path):
+    archive = tmp_path / "guides.tar.gz"
+    with tarfile.open(archive, "w:gz") as tf:
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            data = name.encode()
+            info = tarfile.TarInfo(f"docs/{name}")
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+
+    assert is_archive("guides.tar.gz")
+    assert len(extract_archive(str(archive), str(tmp_path / "ok"), max_files=3)) == 3
+    with pytest.raises(ValueError):
+        extract_archive(str(archive), str(tmp_path / "too_many"), max_files=2)
+
+
+def test_extract_rejects_archives_that_decompress_too_far(tmp_path):
+    archive = tmp_path / "bomb.zip"
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("a.pdf", b"\0" * (2 * 1024 * 1024))
+        zf.writestr("b.pdf", b"\0" * (2 * 1024 * 1024))
+    assert os.path.getsize(archive) < 64 * 1024
+
+    with pytest.raises(ValueError):
+        extract_archive(str(archive), str(tmp_path / "member"), max_files=10, max_member_bytes=1024 * 1024)
+    with pytest.raises(ValueError):
+        extract_archive(str(archive), str(tmp_path / "total"), max_files=10, max_total_bytes=3 * 1024 * 1024)
+    assert not (tmp_path / "member").exists() and not (tmp_path / "total").exists()
+    assert len(extract_archive(str(archive), str(tmp_path / "ok"), max_files=10, max_total_bytes=4 * 1024 * 1024)) == 2
+
+
+@pytest.mark.asyncio
+async def test_save_upload_streams_and_enforces_limit(tmp_path):
+    payload = b"x" * (3 * 1024 * 1024 + 7)
+    saved = await save_upload(UploadFile(io.BytesIO(payload), filename="big.pdf"), str(tmp_path / "big.pdf"))
+    assert saved["size"] == len(payload)
+    assert os.path.getsize(tmp_path / "big.pdf") == len(payload)
+
+    with pytest.raises(ValueError):
+        await save_upload(UploadFile(io.BytesIO(payload), filename="big.pdf"), str(tmp_path / "b2.pdf"), max_bytes=1024 * 1024)